@@ -0,0 +1,57 @@
+import glob
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+SAMPLE_FORMS = "samples/forms/*.html"
+
+
+def load_samples(pattern: str = SAMPLE_FORMS) -> List[Dict[str, Any]]:
+    """Saved forms with their expected values (`<form>.expected.json`, identifier → value) if present."""
+    samples = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r") as file:
+            html_form = file.read()
+        expected_path = os.path.splitext(path)[0] + ".expected.json"
+        expected = {}
+        if os.path.exists(expected_path):
+            with open(expected_path, "r") as file:
+                expected = json.load(file)
+        samples.append({"name": os.path.basename(path), "html_form": html_form, "expected": expected})
+    return samples
+
+
+def load_user_meta_data(path: str = "user_metadata.json") -> Dict[str, Any]:
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def find_field(fields: List[Dict[str, Any]], identifier: str) -> Optional[Dict[str, Any]]:
+    for field in fields:
+        if identifier in (field.get("data-ui"), field.get("id"), field.get("name")):
+            return field
+    return None
+
+
+def normalize_value(value: Any) -> str:
+    return " ".join(str(value if value is not None else "").lower().split())
+
+
+def fill_accuracy(fields: List[Dict[str, Any]], expected: Dict[str, Any]) -> float:
+    """Share of expected identifiers whose filled value matches, ignoring case and spacing."""
+    if not expected:
+        return 0.0
+    matched = 0
+    for identifier, value in expected.items():
+        field = find_field(fields, identifier)
+        if field is not None and normalize_value(field.get("value")) == normalize_value(value):
+            matched += 1
+    return matched / len(expected)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
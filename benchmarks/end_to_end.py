@@ -0,0 +1,165 @@
+"""
+End-to-end benchmark of the whole pipeline against a replayed recording, fully offline:
+per-stage p50/p95 latency, LLM tokens and applications per minute at each concurrency level.
+
+    python -m benchmarks.end_to_end recordings/run1 --concurrency 1 4 8 --apps 16
+    python -m benchmarks.end_to_end --forms "samples/forms/*.html" --llm-latency 1.5
+
+Pages come from a local PageServer and LLM calls from a FakeOpenAIServer answering with the
+recorded responses (see benchmarks/replay.py); `--llm-latency` stands in for model time.
+Every concurrency level starts with empty caches. Save the numbers with `--output` and diff
+them before and after a change.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+from typing import Dict, Iterable, List
+
+from benchmarks.common import load_user_meta_data, percentile
+from benchmarks.replay import PageServer, Recording, isolate_caches
+from openaiapp.fake_server import FakeOpenAIServer
+from openaiapp.ledger import UsageLedger, UsageRecord, UsageSink
+from scraping.service import ScrapService
+
+STAGES = [
+    "click_apply_now",
+    "get_form",
+    "prune_form",
+    "get_input_fields",
+    "get_input_values",
+    "fill_values",
+    "submit_form",
+]
+
+
+class MemoryUsageSink(UsageSink):
+    def __init__(self):
+        self.records: List[UsageRecord] = []
+        self._lock = threading.Lock()
+
+    def write(self, record: UsageRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def read(self) -> Iterable[UsageRecord]:
+        return list(self.records)
+
+
+class TimedScrapService(ScrapService):
+    """ScrapService that adds the duration of every STAGES call to `timings`."""
+
+    def __init__(self, timings: Dict[str, List[float]], **kwargs):
+        super().__init__(**kwargs)
+        self.timings = timings
+
+
+def _timed(stage: str):
+    method = getattr(ScrapService, stage)
+
+    async def timed(self, *args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            self.timings[stage].append(time.perf_counter() - started_at)
+
+    timed.__name__ = stage
+    return timed
+
+
+for _stage in STAGES:
+    setattr(TimedScrapService, _stage, _timed(_stage))
+
+
+async def run_level(page_server: PageServer, concurrency: int, apps: int, user_meta_data: dict, stream: bool) -> Dict:
+    from openaiapp.service import AsyncOpenAIService
+    from scraping.runner import ApplicationRunner
+
+    names = sorted(page_server.recording.index)
+    urls = [page_server.url_for(names[run % len(names)], run=run) for run in range(apps)]
+    timings: Dict[str, List[float]] = defaultdict(list)
+    sink = MemoryUsageSink()
+
+    runner = ApplicationRunner(user_meta_data=user_meta_data, concurrency=concurrency, headless=True, stream=stream)
+    runner.openai_service = AsyncOpenAIService(ledger=UsageLedger(sink=sink))
+    runner.scrap_service_class = partial(TimedScrapService, timings)
+    isolate_caches(runner, tempfile.mkdtemp(prefix=f"e2e-{concurrency}-"))
+
+    started_at = time.perf_counter()
+    results = await runner.run(urls)
+    elapsed = time.perf_counter() - started_at
+
+    llm = defaultdict(list)
+    for record in sink.records:
+        llm[record.prompt_type].append(record.latency)
+    tokens = sum(record.total_tokens for record in sink.records)
+    return {
+        "concurrency": concurrency,
+        "apps": len(results),
+        "applied": sum(1 for result in results if result.status == "applied"),
+        "elapsed": elapsed,
+        "apps_per_minute": len(results) / (elapsed / 60) if elapsed else 0.0,
+        "llm_calls": len(sink.records),
+        "tokens": tokens,
+        "tokens_per_app": tokens / len(results) if results else 0.0,
+        "stages": {
+            stage: {"p50": percentile(durations, 0.5), "p95": percentile(durations, 0.95), "calls": len(durations)}
+            for stage, durations in list(timings.items()) + [(f"llm:{prompt}", latencies) for prompt, latencies in llm.items()]
+        },
+    }
+
+
+def print_report(levels: List[Dict]) -> None:
+    for level in levels:
+        print(
+            f"\nconcurrency {level['concurrency']}: {level['applied']}/{level['apps']} applied in {level['elapsed']:.1f}s, "
+            f"{level['apps_per_minute']:.1f} apps/minute, {level['llm_calls']} LLM calls, "
+            f"{level['tokens']} tokens ({level['tokens_per_app']:.0f}/app)"
+        )
+        print(f"{'stage':<32} {'calls':>6} {'p50 ms':>9} {'p95 ms':>9}")
+        for stage, row in level["stages"].items():
+            print(f"{stage:<32} {row['calls']:>6} {row['p50'] * 1000:>9.1f} {row['p95'] * 1000:>9.1f}")
+
+
+async def benchmark(recording: Recording, concurrency_levels: List[int], apps: int, llm_latency: float, stream: bool) -> List[Dict]:
+    fake_server = FakeOpenAIServer(responder=recording.responder, latency=llm_latency).start()
+    page_server = PageServer(recording).start()
+    # Replay must never reach the real API, whatever the .env says.
+    os.environ["OPENAI_BASE_URL"] = fake_server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "replay")
+    os.environ.setdefault("DEFAULT_OPENAI_MODEL_NAME", "GPT_4O_MINI")
+    user_meta_data = load_user_meta_data()
+    try:
+        levels = [await run_level(page_server, concurrency, apps, user_meta_data, stream) for concurrency in concurrency_levels]
+    finally:
+        page_server.stop()
+        fake_server.stop()
+    recording.log_stats()
+    return levels
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline end to end on a replayed recording.")
+    parser.add_argument("recording", nargs="?", help="Recording directory; defaults to the saved sample forms.")
+    parser.add_argument("--forms", default="samples/forms/*.html")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--apps", type=int, default=8, help="Applications per concurrency level.")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds the fake OpenAI server waits per call.")
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--output", help="Write the results as JSON, for comparing runs.")
+    args = parser.parse_args()
+
+    recording = Recording(args.recording) if args.recording else Recording.from_forms(args.forms)
+    levels = asyncio.run(benchmark(recording, args.concurrency, args.apps, args.llm_latency, stream=not args.no_stream))
+    print_report(levels)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(levels, file, indent=2)
@@ -0,0 +1,100 @@
+"""
+Per-field fill latency on a saved 50-field form: the old selector-per-field path against
+fields resolved through the DOM index, plus the one-call bulk fill script for reference.
+
+    python -m benchmarks.fill_latency --runs 5
+
+Runs headless Chromium against the local HTML file; no network or OpenAI access is needed.
+"""
+import argparse
+import asyncio
+import time
+
+from playwright.async_api import async_playwright
+
+from benchmarks.common import percentile
+from scraping.dom_index import DomIndex
+from scraping.extractor import FormFieldExtractor
+from scraping.scripts import BULK_FILL_FIELDS
+from scraping.service import ScrapService
+
+SAMPLE_VALUES = {"email": "jane.doe@example.com", "tel": "+1 555 010 0000", "radio": "true"}
+
+
+def load_fields(path: str):
+    with open(path, "r") as file:
+        html = file.read()
+    fields = FormFieldExtractor().extract(html).fields
+    for field in fields:
+        field["value"] = SAMPLE_VALUES.get(field["type"], f"Answer for {field['label']}")
+    return html, fields
+
+
+async def legacy_fill_field(page, field):
+    """The selector-per-field path fill_values used before the DOM index."""
+    selector = f"[name='{field['name']}']" if "name" in field else f"#{field['id']}"
+    if field["type"] in ["text", "email", "textarea"]:
+        await page.fill(selector, field["value"])
+    elif field["type"] == "radio":
+        locator = page.locator(f"input[name='{field['name']}'][value='{field['value']}']")
+        await locator.wait_for(state="visible", timeout=5000)
+        await locator.click(force=True)
+    elif field["type"] == "tel":
+        await page.fill(selector, field["value"])
+        await page.press(selector, " ")
+
+
+async def time_fields(fill, fields):
+    durations = []
+    for field in fields:
+        started_at = time.perf_counter()
+        await fill(field)
+        durations.append(time.perf_counter() - started_at)
+    return durations
+
+
+async def benchmark(path: str, runs: int):
+    html, fields = load_fields(path)
+    scrap_service = ScrapService()
+    per_field = {"legacy": [], "dom_index": []}
+    per_form = {"legacy": [], "dom_index": [], "bulk_script": []}
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        page = await browser.new_page()
+        scrap_service.page = page
+
+        for _ in range(runs):
+            await page.set_content(html)
+            started_at = time.perf_counter()
+            per_field["legacy"] += await time_fields(lambda field: legacy_fill_field(page, field), fields)
+            per_form["legacy"].append(time.perf_counter() - started_at)
+
+            await page.set_content(html)
+            started_at = time.perf_counter()
+            scrap_service.dom_index = await DomIndex.build(page)
+            per_field["dom_index"] += await time_fields(scrap_service.fill_field, fields)
+            per_form["dom_index"].append(time.perf_counter() - started_at)
+
+            await page.set_content(html)
+            started_at = time.perf_counter()
+            await page.evaluate(BULK_FILL_FIELDS, fields)
+            per_form["bulk_script"].append(time.perf_counter() - started_at)
+
+        await browser.close()
+
+    print(f"{len(fields)} fields, {runs} runs")
+    print(f"{'path':<12} {'field p50 ms':>13} {'field p95 ms':>13} {'form p50 ms':>12}")
+    for path_name, durations in per_form.items():
+        field_durations = per_field.get(path_name)
+        field_p50 = f"{percentile(field_durations, 0.5) * 1000:>13.2f}" if field_durations else f"{'-':>13}"
+        field_p95 = f"{percentile(field_durations, 0.95) * 1000:>13.2f}" if field_durations else f"{'-':>13}"
+        print(f"{path_name:<12} {field_p50} {field_p95} {percentile(durations, 0.5) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-field fill latency.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--form", default="samples/benchmarks/fifty_field_form.html")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.form, args.runs))
@@ -0,0 +1,87 @@
+"""
+Compares the two-call prompt path (EXTRACT_INPUT_FIELDS then FILL_VALUE_IN_FIELD) with the
+single EXTRACT_AND_FILL call on the saved sample forms: latency, tokens and fill accuracy.
+
+    python -m benchmarks.prompt_modes --runs 3
+
+Both paths send the LLM the pruned form, as the pipeline does. Point OPENAI_BASE_URL at
+`python -m openaiapp.fake_server` to check the wiring without spending tokens.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from benchmarks.common import fill_accuracy, load_samples, load_user_meta_data, percentile
+from openaiapp.clients import close_async_clients
+from openaiapp.constants import LlmPromptTypes
+from openaiapp.ledger import NullUsageSink, UsageLedger
+from openaiapp.service import AsyncOpenAIService
+from scraping.html_pruner import prune_form_html
+
+
+def _tokens(*responses) -> int:
+    return sum(response.usage.total_tokens for response in responses if response.usage is not None)
+
+
+async def run_two_call(openai_service, html_form, user_meta_data):
+    extract_response = await openai_service.generate(
+        prompt_type=LlmPromptTypes.EXTRACT_INPUT_FIELDS, prompt_variables={"html_form": html_form}
+    )
+    fill_response = await openai_service.generate(
+        prompt_type=LlmPromptTypes.FILL_VALUE_IN_FIELD,
+        prompt_variables={
+            "input_fields": openai_service.get_response_text_from_response(extract_response),
+            "user_meta_data": json.dumps(user_meta_data),
+        },
+    )
+    fields = json.loads(openai_service.get_response_text_from_response(fill_response))["fields"]
+    return fields, _tokens(extract_response, fill_response)
+
+
+async def run_single_call(openai_service, html_form, user_meta_data):
+    response = await openai_service.generate(
+        prompt_type=LlmPromptTypes.EXTRACT_AND_FILL,
+        prompt_variables={"html_form": html_form, "user_meta_data": json.dumps(user_meta_data)},
+    )
+    fields = json.loads(openai_service.get_response_text_from_response(response))["fields"]
+    return fields, _tokens(response)
+
+
+MODES = {"two_call": run_two_call, "single_call": run_single_call}
+
+
+async def benchmark(runs: int, pattern: str):
+    openai_service = AsyncOpenAIService(ledger=UsageLedger(sink=NullUsageSink()))
+    user_meta_data = load_user_meta_data()
+    results = defaultdict(lambda: {"latency": [], "tokens": [], "accuracy": []})
+
+    for sample in load_samples(pattern):
+        html_form = prune_form_html(sample["html_form"])
+        for _ in range(runs):
+            for mode, run in MODES.items():
+                started_at = time.perf_counter()
+                fields, tokens = await run(openai_service, html_form, user_meta_data)
+                result = results[(sample["name"], mode)]
+                result["latency"].append(time.perf_counter() - started_at)
+                result["tokens"].append(tokens)
+                result["accuracy"].append(fill_accuracy(fields, sample["expected"]))
+
+    await close_async_clients()
+    print(f"{'form':<40} {'mode':<12} {'p50 s':>7} {'p95 s':>7} {'tokens':>8} {'accuracy':>9}")
+    for (name, mode), result in sorted(results.items()):
+        print(
+            f"{name:<40} {mode:<12} {percentile(result['latency'], 0.5):>7.2f} "
+            f"{percentile(result['latency'], 0.95):>7.2f} "
+            f"{sum(result['tokens']) / len(result['tokens']):>8.0f} "
+            f"{sum(result['accuracy']) / len(result['accuracy']):>9.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark two-call vs single-call prompt modes.")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per form and mode.")
+    parser.add_argument("--forms", default="samples/forms/*.html", help="Glob of saved form HTML files.")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.runs, args.forms))
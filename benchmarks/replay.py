@@ -0,0 +1,391 @@
+"""
+Record/replay harness for running the pipeline without a live Workable page or an OpenAI key.
+
+Record real applications once (nothing is submitted while recording):
+
+    python -m benchmarks.replay record https://apply.workable.com/<company>/j/<id>/ --out recordings/run1
+
+This saves, per job, the page as it looked once the form showed up (scripts stripped), the
+form's inner HTML and every LLM request with its answer. Replay serves the pages from a
+local HTTP server and answers LLM calls from a FakeOpenAIServer fed with the recording:
+
+    python -m benchmarks.replay serve recordings/run1
+
+Saved forms (samples/forms/*.html) can be served the same way without a recording; LLM
+calls that were not recorded get an empty `fields` answer.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+from openaiapp.service import AsyncOpenAIService
+from scraping.service import ScrapService
+
+# Added to every served page: "Apply" reveals the form, the submit is kept on the page and
+# shows the consent checkbox ScrapService.submit_form waits for.
+REPLAY_SCRIPT = """
+document.querySelector('[data-ui="overview-apply-now"]').addEventListener("click", (event) => {
+    event.preventDefault();
+    event.target.remove();
+    document.querySelector('form[data-ui="application-form"]').hidden = false;
+});
+document.addEventListener("submit", (event) => {
+    event.preventDefault();
+    if (!document.querySelector("label.cb-lb input[type=checkbox]")) {
+        const label = document.createElement("label");
+        label.className = "cb-lb";
+        label.innerHTML = '<input type="checkbox"> Submitted (replay)';
+        document.body.appendChild(label);
+    }
+});
+"""
+
+
+def job_name(url: str) -> str:
+    """File-safe name for a job URL: apply.workable.com/acme/j/AB12/ → acme-j-AB12."""
+    parts = [part for part in urlparse(url).path.split("/") if part and part != "apply"]
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", "-".join(parts) or urlparse(url).netloc).strip("-")
+
+
+def messages_key(messages: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def build_job_page(form_html: str, snapshot: str = None) -> str:
+    """
+    A self-contained job page: the recorded snapshot (or an empty page) without scripts or
+    external resources, an "Apply" button, and the form, hidden until "Apply" is clicked.
+    """
+    soup = BeautifulSoup(snapshot or "<html><head></head><body></body></html>", "html.parser")
+    for element in soup.find_all(["script", "noscript", "iframe"]):
+        element.decompose()
+    for element in soup.find_all("link"):
+        if str(element.get("href", "")).startswith(("http", "//")):
+            element.decompose()
+
+    form_soup = BeautifulSoup(form_html, "html.parser")
+    inner = form_soup.find("form")
+    form = soup.new_tag("form", attrs={"data-ui": "application-form", "hidden": ""})
+    for child in list((inner or form_soup).contents):
+        form.append(child)
+    apply_button = soup.new_tag("button", attrs={"type": "button", "data-ui": "overview-apply-now"})
+    apply_button.string = "Apply for this job"
+
+    existing = soup.find("form")
+    if existing is not None:
+        existing.replace_with(form)
+    else:
+        (soup.body or soup).append(form)
+    form.insert_before(apply_button)
+    script = soup.new_tag("script")
+    script.string = REPLAY_SCRIPT
+    (soup.body or soup).append(script)
+    return str(soup)
+
+
+class Recording:
+    """
+    A recording directory: `pages/<job>.html` (page snapshots), `forms/<job>.html` (form inner
+    HTML), `llm.jsonl` (one request/answer per line) and `index.json` (job name → URL).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.index: Dict[str, str] = {}
+        self.answers: Dict[str, str] = {}
+        self.answers_by_system: Dict[str, deque] = defaultdict(deque)
+        self.hits = 0
+        self.misses = 0
+        index_path = os.path.join(directory, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path, "r") as file:
+                self.index = json.load(file)
+        llm_path = os.path.join(directory, "llm.jsonl")
+        if os.path.exists(llm_path):
+            with open(llm_path, "r") as file:
+                for line in file:
+                    if line.strip():
+                        call = json.loads(line)
+                        self.answers[call["key"]] = call["content"]
+                        self.answers_by_system[call["system"]].append(call["content"])
+
+    @classmethod
+    def from_forms(cls, pattern: str = "samples/forms/*.html") -> "Recording":
+        """An in-memory-only recording of saved forms, with no LLM answers."""
+        recording = cls(tempfile.mkdtemp(prefix="replay-"))
+        for path in sorted(glob.glob(pattern)):
+            with open(path, "r") as file:
+                recording.add_page(os.path.splitext(os.path.basename(path))[0], url=path, form_html=file.read())
+        return recording
+
+    def _write(self, folder: str, name: str, content: str) -> None:
+        directory = os.path.join(self.directory, folder)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{name}.html"), "w") as file:
+            file.write(content)
+
+    def add_page(self, name: str, url: str, form_html: str, snapshot: str = None) -> None:
+        with self._lock:
+            self._write("forms", name, form_html)
+            if snapshot:
+                self._write("pages", name, snapshot)
+            self.index[name] = url
+            with open(os.path.join(self.directory, "index.json"), "w") as file:
+                json.dump(self.index, file, indent=2)
+
+    def add_llm_call(self, prompt_type: str, messages: List[Dict[str, Any]], content: str) -> None:
+        call = {"prompt_type": prompt_type, "key": messages_key(messages), "system": messages[0]["content"], "content": content}
+        with self._lock:
+            self.answers[call["key"]] = content
+            self.answers_by_system[call["system"]].append(content)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "llm.jsonl"), "a") as file:
+                file.write(json.dumps(call) + "\n")
+
+    def page(self, name: str) -> Optional[str]:
+        """The served job page for `name`, or None when it was not recorded."""
+        form_path = os.path.join(self.directory, "forms", f"{name}.html")
+        if not os.path.exists(form_path):
+            return None
+        with open(form_path, "r") as file:
+            form_html = file.read()
+        snapshot = None
+        page_path = os.path.join(self.directory, "pages", f"{name}.html")
+        if os.path.exists(page_path):
+            with open(page_path, "r") as file:
+                snapshot = file.read()
+        return build_job_page(form_html, snapshot)
+
+    def responder(self, request: Dict) -> str:
+        """
+        FakeOpenAIServer responder: the recorded answer to the same messages, else the next
+        recorded answer to the same prompt (the profile or a cache may have changed the
+        request), else an empty `fields` object.
+        """
+        messages = request.get("messages") or []
+        with self._lock:
+            content = self.answers.get(messages_key(messages))
+            if content is None and messages:
+                answers = self.answers_by_system.get(messages[0].get("content"))
+                if answers:
+                    content = answers[0]
+                    answers.rotate(-1)
+            if content is None:
+                self.misses += 1
+                return json.dumps({"fields": []})
+            self.hits += 1
+            return content
+
+    def log_stats(self) -> None:
+        logging.info(f"Replay: {len(self.index)} pages, {self.hits} LLM answers replayed, {self.misses} not recorded")
+
+
+class RecordingOpenAIService(AsyncOpenAIService):
+    """AsyncOpenAIService that writes every request and its answer to a Recording."""
+
+    def __init__(self, recording: Recording, **kwargs):
+        super().__init__(**kwargs)
+        self.recording = recording
+
+    async def generate(self, prompt_type: str, prompt_variables: dict = {}, model_data_dict: dict = None, image_url: str = None, application_id: str = None, escalate: bool = False):
+        response = await super().generate(
+            prompt_type=prompt_type,
+            prompt_variables=prompt_variables,
+            model_data_dict=model_data_dict,
+            image_url=image_url,
+            application_id=application_id,
+            escalate=escalate,
+        )
+        messages = self._get_message_list(prompt_type=prompt_type, prompt_variables=prompt_variables, image_url=image_url)
+        self.recording.add_llm_call(prompt_type, messages, self.get_response_text_from_response(response))
+        return response
+
+    async def generate_stream(self, prompt_type: str, prompt_variables: dict = {}, model_data_dict: dict = None, application_id: str = None, escalate: bool = False):
+        fields = []
+        async for field in super().generate_stream(
+            prompt_type=prompt_type,
+            prompt_variables=prompt_variables,
+            model_data_dict=model_data_dict,
+            application_id=application_id,
+            escalate=escalate,
+        ):
+            fields.append(field)
+            yield field
+        messages = self._get_message_list(prompt_type=prompt_type, prompt_variables=prompt_variables)
+        self.recording.add_llm_call(prompt_type, messages, json.dumps({"fields": fields}))
+
+
+class RecordingScrapService(ScrapService):
+    """ScrapService that saves the page and form once the form shows up, and never submits."""
+
+    def __init__(self, recording: Recording, **kwargs):
+        super().__init__(**kwargs)
+        self.recording = recording
+
+    async def get_form(self):
+        form = await super().get_form()
+        if form is not None:
+            self.recording.add_page(
+                job_name(self.application_id or self.page.url),
+                url=self.application_id or self.page.url,
+                form_html=await form.inner_html(),
+                snapshot=await self.page.content(),
+            )
+        return form
+
+    async def submit_form(self):
+        logging.info("Recording: not submitting.")
+        return True
+
+
+class PageServer:
+    """
+    Serves a Recording's job pages at `/<job name>/` (any query string is ignored), so the
+    same page can be applied to many times under distinct URLs.
+    """
+
+    def __init__(self, recording: Recording, host: str = "127.0.0.1", port: int = 0):
+        self.recording = recording
+        self.served = 0
+        self._pages: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, name: str, run: int = None) -> str:
+        return f"{self.base_url}/{name}/" + (f"?run={run}" if run is not None else "")
+
+    def urls(self) -> List[str]:
+        return [self.url_for(name) for name in sorted(self.recording.index)]
+
+    def start(self) -> "PageServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _page(self, name: str) -> Optional[str]:
+        with self._lock:
+            if name not in self._pages:
+                self._pages[name] = self.recording.page(name)
+            return self._pages[name]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                name = urlparse(self.path).path.strip("/")
+                page = server._page(name) if name else None
+                if page is None:
+                    self._send(404, "Not recorded")
+                    return
+                with server._lock:
+                    server.served += 1
+                self._send(200, page)
+
+            def _send(self, status: int, body: str):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def isolate_caches(runner, directory: str) -> None:
+    """Points the runner's caches at `directory`, so a run neither reads nor changes .cache/."""
+    from scraping.answer_bank import AnswerBank
+    from scraping.flow import FlowCheckpointStore
+    from scraping.form_cache import FormSchemaCache
+    from scraping.selector_resolver import SelectorResolver
+    from scraping.storage_state import StorageStateCache
+
+    runner.form_cache = FormSchemaCache(path=os.path.join(directory, "form_schema.sqlite3"))
+    runner.storage_state_cache = StorageStateCache(directory=os.path.join(directory, "storage_state"))
+    runner.selector_resolver = SelectorResolver(path=os.path.join(directory, "selectors.json"))
+    runner.answer_bank = AnswerBank(path=os.path.join(directory, "answer_bank.sqlite3"))
+    runner.checkpoints = FlowCheckpointStore(path=os.path.join(directory, "flow_checkpoints.sqlite3"))
+
+
+async def record(urls: List[str], directory: str, user_meta_data: dict, concurrency: int = 1, headless: bool = True):
+    """Applies to `urls` with cold caches, saving pages and LLM calls to `directory`."""
+    from functools import partial
+
+    from scraping.runner import ApplicationRunner
+
+    recording = Recording(directory)
+    runner = ApplicationRunner(user_meta_data=user_meta_data, concurrency=concurrency, headless=headless)
+    runner.openai_service = RecordingOpenAIService(recording)
+    runner.scrap_service_class = partial(RecordingScrapService, recording)
+    isolate_caches(runner, tempfile.mkdtemp(prefix="record-"))
+    results = await runner.run(urls)
+    logging.info(f"Recorded {len(recording.index)} pages and {len(recording.answers)} LLM answers to {directory}")
+    return results
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    from openaiapp.fake_server import FakeOpenAIServer
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Record job applications, or serve a recording offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Apply to live URLs (without submitting) and record them.")
+    record_parser.add_argument("urls", nargs="+")
+    record_parser.add_argument("--out", required=True, help="Recording directory.")
+    record_parser.add_argument("--concurrency", type=int, default=1)
+    record_parser.add_argument("--headed", action="store_true")
+    serve_parser = commands.add_parser("serve", help="Serve a recording's pages and LLM answers locally.")
+    serve_parser.add_argument("recording", nargs="?", help="Recording directory; defaults to the saved sample forms.")
+    serve_parser.add_argument("--forms", default="samples/forms/*.html")
+    serve_parser.add_argument("--port", type=int, default=8098)
+    serve_parser.add_argument("--llm-port", type=int, default=8099)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        with open("user_metadata.json", "r") as file:
+            asyncio.run(record(args.urls, args.out, json.load(file), concurrency=args.concurrency, headless=not args.headed))
+    else:
+        recording = Recording(args.recording) if args.recording else Recording.from_forms(args.forms)
+        page_server = PageServer(recording, port=args.port).start()
+        fake_server = FakeOpenAIServer(responder=recording.responder, port=args.llm_port).start()
+        print(f"Pages: {', '.join(page_server.urls())}")
+        print(f"LLM: OPENAI_BASE_URL={fake_server.base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            page_server.stop()
+            fake_server.stop()
+            recording.log_stats()
@@ -1,36 +1,86 @@
+import argparse
+import asyncio
 import json
 import os
 from dotenv import load_dotenv
+from openaiapp.clients import close_async_clients
+from scraping.job_queue import JobQueue
+from scraping.runner import ApplicationRunner, apply_to_job
 from scraping.service import ScrapService
-from openaiapp.service import OpenAIService
-from openaiapp import constants
+from tracing.tracer import set_job, tracer
 
 load_dotenv()
 
-def main():
+
+def load_urls(args):
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, "r") as file:
+            urls.extend(
+                line.strip() for line in file if line.strip() and not line.strip().startswith("#")
+            )
+    return urls
+
+
+async def run_interactive(user_meta_data, stream=True, single_call=False):
     url = input("Provide workable url: ")
-    scrap_service = ScrapService()
-    openai_service = OpenAIService()
-    
+    set_job(url)
+    scrap_service = await ScrapService().start()
+    await apply_to_job(
+        scrap_service, url=url, user_meta_data=user_meta_data, stream=stream, single_call=single_call
+    )
+
+    input("Press Enter to exit...")  # Keeps browser open until user input
+    await scrap_service.close()
+    await close_async_clients()
+    tracer.export()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply to Workable job postings.")
+    parser.add_argument("urls", nargs="*", help="Workable job URLs to apply to.")
+    parser.add_argument("--file", help="File with one job URL per line.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of applications processed at once.")
+    parser.add_argument("--llm-concurrency", type=int, help="Maximum OpenAI requests in flight (OPENAI_MAX_CONCURRENCY).")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for all values before filling the form.")
+    parser.add_argument(
+        "--single-call",
+        action="store_true",
+        help="Detect and fill unknown forms in one LLM call instead of extracting fields first.",
+    )
+    parser.add_argument("--headed", action="store_true", help="Show the browser windows while applying.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Free the claims of a crashed run and work through the unfinished jobs of the job queue.",
+    )
+    parser.add_argument("--no-queue", action="store_true", help="Apply to the URLs directly, without the job queue.")
+    args = parser.parse_args()
+
     file_path = "user_metadata.json"
     with open(file_path, "r") as file:
         user_meta_data = json.load(file)
-    input_value_dict = constants.fields
-    scrap_service.click_apply_now(url=url)
-    form = scrap_service.get_form()
-    
-    input_fields_response = scrap_service.get_input_fields(form=form.inner_html())
-    input_fields_response_text = openai_service.get_response_text_from_response(response=input_fields_response)
-    print(".....")
-    
-    input_value_response = scrap_service.get_input_values(input_fields=input_fields_response_text,user_meta_data=user_meta_data)
-    input_value_response_text = openai_service.get_response_text_from_response(response=input_value_response)
-    input_value_dict = json.loads(input_value_response_text)
-    print(".....")
-    scrap_service.fill_values(input_fields_and_values=input_value_dict["fields"])
-    
-    input("Press Enter to exit...")  # Keeps browser open until user input
-    scrap_service.close()
+
+    urls = load_urls(args)
+    if not urls and not args.resume:
+        asyncio.run(run_interactive(user_meta_data, stream=not args.no_stream, single_call=args.single_call))
+        return
+
+    runner = ApplicationRunner(
+        user_meta_data=user_meta_data,
+        concurrency=args.concurrency,
+        headless=not args.headed,
+        llm_concurrency=args.llm_concurrency,
+        stream=not args.no_stream,
+        single_call=args.single_call,
+    )
+    if args.no_queue:
+        asyncio.run(runner.run(urls))
+    else:
+        queue = JobQueue()
+        if args.resume:
+            queue.release_claims()
+        asyncio.run(runner.run_queued(queue, urls))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
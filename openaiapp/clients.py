@@ -0,0 +1,52 @@
+import os
+import threading
+from typing import Dict
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+load_dotenv()
+
+# One long-lived client per API key, so HTTP keep-alive connections and TLS sessions
+# are reused across calls instead of being rebuilt for every request.
+_clients: Dict[str, OpenAI] = {}
+_async_clients: Dict[str, AsyncOpenAI] = {}
+_lock = threading.Lock()
+
+
+def get_connection_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+    )
+
+
+def get_client(api_key: str = None) -> OpenAI:
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    with _lock:
+        if api_key not in _clients:
+            _clients[api_key] = OpenAI(
+                api_key=api_key, http_client=DefaultHttpxClient(limits=get_connection_limits())
+            )
+        return _clients[api_key]
+
+
+def get_async_client(api_key: str = None) -> AsyncOpenAI:
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    with _lock:
+        if api_key not in _async_clients:
+            _async_clients[api_key] = AsyncOpenAI(
+                api_key=api_key, http_client=DefaultAsyncHttpxClient(limits=get_connection_limits())
+            )
+        return _async_clients[api_key]
+
+
+async def close_async_clients() -> None:
+    """Closes the pooled async clients; call before the event loop that used them shuts down."""
+    with _lock:
+        clients = list(_async_clients.values())
+        _async_clients.clear()
+    for client in clients:
+        await client.close()
@@ -27,6 +27,8 @@ class LlmModels:
             "model_name": "gpt-4o",
             "input_cost": 5,
             "output_cost": 15,
+            "rpm": 500,
+            "tpm": 30_000,
         }
     )
 
@@ -35,6 +37,8 @@ class LlmModels:
             "model_name": "gpt-4o-mini",
             "input_cost": 0.15,
             "output_cost": 0.6,
+            "rpm": 500,
+            "tpm": 200_000,
         }
     )
 
@@ -43,6 +47,8 @@ class LlmModels:
             "model_name": "gpt-4o-mini-realtime-preview",
             "input_cost": 0.60,
             "output_cost": 2.4,
+            "rpm": 200,
+            "tpm": 40_000,
         }
     )
 
@@ -51,6 +57,8 @@ class LlmModels:
 class LlmPromptTypes:
     EXTRACT_INPUT_FIELDS: str = "EXTRACT_INPUT_FIELDS"
     FILL_VALUE_IN_FIELD: str = "FILL_VALUE_IN_FIELD"
+    EXTRACT_AND_FILL: str = "EXTRACT_AND_FILL"
+    REPAIR_FIELD_VALUES: str = "REPAIR_FIELD_VALUES"
 
 
 @dataclass
@@ -69,11 +77,27 @@ class LlmPrompts:
         ]
     )
 
+    EXTRACT_AND_FILL: List[str] = field(
+        default_factory=lambda: [
+            prompts.EXTRACT_AND_FILL_SYSTEM_ROLE,
+            prompts.EXTRACT_AND_FILL_USER_ROLE,
+        ]
+    )
+
+    REPAIR_FIELD_VALUES: List[str] = field(
+        default_factory=lambda: [
+            prompts.REPAIR_FIELD_VALUES_SYSTEM_ROLE,
+            prompts.REPAIR_FIELD_VALUES_USER_ROLE,
+        ]
+    )
+
 
 @dataclass
 class LlmApiKeys:
     EXTRACT_INPUT_FIELDS: str = os.getenv("OPENAI_API_KEY")
     FILL_VALUE_IN_FIELD: str = os.getenv("OPENAI_API_KEY")
+    EXTRACT_AND_FILL: str = os.getenv("OPENAI_API_KEY")
+    REPAIR_FIELD_VALUES: str = os.getenv("OPENAI_API_KEY")
 
 
 
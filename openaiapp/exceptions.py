@@ -15,5 +15,6 @@ class StatusCodes:
     UNAUTHORIZED = HTTPStatus.UNAUTHORIZED
     FORBIDDEN = HTTPStatus.FORBIDDEN
     NOT_FOUND = HTTPStatus.NOT_FOUND
+    TOO_MANY_REQUESTS = HTTPStatus.TOO_MANY_REQUESTS
     INTERNAL_SERVER_ERROR = HTTPStatus.INTERNAL_SERVER_ERROR
     SERVICE_UNAVAILABLE = HTTPStatus.SERVICE_UNAVAILABLE
@@ -0,0 +1,178 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from openaiapp.tokens import estimate_tokens
+
+
+def echo_fields_responder(request: Dict) -> str:
+    """Default answer: an empty `fields` object, enough for latency and rate limit runs."""
+    return json.dumps({"fields": []})
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the OpenAI chat completions endpoint.
+
+    Point a client at it with `OPENAI_BASE_URL=http://127.0.0.1:<port>/v1`. Every Nth request
+    (`rate_limit_every`) and the first `rate_limit_first` requests are answered with a 429 and a
+    `Retry-After` header, so retry and scheduling behaviour can be exercised offline. Answers come
+    from `responder`, which receives the decoded request body and returns the message content;
+    `stream: true` requests get it back as server-sent event chunks.
+    """
+
+    def __init__(
+        self,
+        responder: Callable[[Dict], str] = echo_fields_responder,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rate_limit_every: int = 0,
+        rate_limit_first: int = 0,
+        retry_after: float = 1.0,
+        latency: float = 0.0,
+    ):
+        self.responder = responder
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_first = rate_limit_first
+        self.retry_after = retry_after
+        self.latency = latency
+        self.requests: List[Dict] = []
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _should_rate_limit(self) -> bool:
+        with self._lock:
+            count = len(self.requests)
+            limited = count <= self.rate_limit_first or (
+                self.rate_limit_every and count % self.rate_limit_every == 0
+            )
+            if limited:
+                self.rate_limited += 1
+            return bool(limited)
+
+    def _completion(self, request: Dict) -> Dict:
+        content = self.responder(request)
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in request.get("messages", []))
+        completion_tokens = estimate_tokens(content)
+        return {
+            "id": f"chatcmpl-fake-{len(self.requests)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests.append(request)
+
+                if server._should_rate_limit():
+                    self._send_json(
+                        429,
+                        {"error": {"message": "Rate limit reached (fake).", "type": "requests", "code": "rate_limit_exceeded"}},
+                        headers={"Retry-After": str(server.retry_after)},
+                    )
+                    return
+
+                if server.latency:
+                    time.sleep(server.latency)
+                completion = server._completion(request)
+                if request.get("stream"):
+                    self._send_stream(completion)
+                else:
+                    self._send_json(200, completion)
+
+            def _send_stream(self, completion: Dict):
+                content = completion["choices"][0]["message"]["content"]
+                base = {key: completion[key] for key in ("id", "created", "model")}
+                base["object"] = "chat.completion.chunk"
+                chunks = [
+                    dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": content[start:start + 16]}, "finish_reason": None}])
+                    for start in range(0, len(content), 16)
+                ]
+                chunks.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+                chunks.append(dict(base, choices=[], usage=completion["usage"]))
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _send_json(self, status: int, body: Dict, headers: Dict[str, str] = None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI chat completions endpoint.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with a 429.")
+    parser.add_argument("--rate-limit-first", type=int, default=0, help="Answer the first N requests with a 429.")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering.")
+    args = parser.parse_args()
+
+    fake_server = FakeOpenAIServer(
+        port=args.port,
+        rate_limit_every=args.rate_limit_every,
+        rate_limit_first=args.rate_limit_first,
+        retry_after=args.retry_after,
+        latency=args.latency,
+    ).start()
+    print(f"Fake OpenAI server listening on {fake_server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake_server.stop()
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@dataclass
+class UsageRecord:
+    timestamp: float
+    prompt_type: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    input_cost: float = 0.0
+    output_cost: float = 0.0
+    total_cost: float = 0.0
+    latency: float = 0.0
+    retries: int = 0
+    application_id: Optional[str] = None
+    status: str = "ok"
+    error: Optional[str] = None
+    route: Optional[str] = None
+
+
+class UsageSink:
+    """Destination for UsageRecords. Subclasses persist records and read them back for reports."""
+
+    def write(self, record: UsageRecord) -> None:
+        raise NotImplementedError
+
+    def read(self) -> Iterable[UsageRecord]:
+        raise NotImplementedError
+
+
+class NullUsageSink(UsageSink):
+    def write(self, record: UsageRecord) -> None:
+        pass
+
+    def read(self) -> Iterable[UsageRecord]:
+        return []
+
+
+class JsonlUsageSink(UsageSink):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, record: UsageRecord) -> None:
+        line = json.dumps(asdict(record))
+        with self._lock, open(self.path, "a") as file:
+            file.write(line + "\n")
+
+    def read(self) -> Iterable[UsageRecord]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as file:
+            for line in file:
+                if line.strip():
+                    yield UsageRecord(**json.loads(line))
+
+
+class SqliteUsageSink(UsageSink):
+    COLUMNS = [f.name for f in fields(UsageRecord)]
+    # Declared type and default of columns added to an older ledger, from the UsageRecord field types.
+    COLUMN_TYPES = {
+        f.name: {int: "INTEGER NOT NULL DEFAULT 0", float: "REAL NOT NULL DEFAULT 0"}.get(f.type, "TEXT")
+        for f in fields(UsageRecord)
+    }
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                timestamp REAL NOT NULL,
+                prompt_type TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                total_tokens INTEGER,
+                input_cost REAL,
+                output_cost REAL,
+                total_cost REAL,
+                latency REAL,
+                retries INTEGER,
+                application_id TEXT,
+                status TEXT,
+                error TEXT,
+                route TEXT
+            )
+            """
+        )
+        existing = {row[1] for row in self._connection.execute("PRAGMA table_info(llm_usage)")}
+        for column in self.COLUMNS:
+            if column not in existing:
+                # Ledgers written before a column existed get it added; numbers are 0 for old rows.
+                self._connection.execute(f"ALTER TABLE llm_usage ADD COLUMN {column} {self.COLUMN_TYPES[column]}")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS llm_usage_application_id ON llm_usage (application_id)"
+        )
+        self._connection.commit()
+
+    def write(self, record: UsageRecord) -> None:
+        values = asdict(record)
+        with self._lock:
+            self._connection.execute(
+                f"INSERT INTO llm_usage ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [values[column] for column in self.COLUMNS],
+            )
+            self._connection.commit()
+
+    def read(self) -> Iterable[UsageRecord]:
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM llm_usage ORDER BY timestamp"
+            ).fetchall()
+        for row in rows:
+            yield UsageRecord(**dict(zip(self.COLUMNS, row)))
+
+
+def get_usage_sink(sink_type: str = None, path: str = None) -> UsageSink:
+    """Builds the sink configured by LLM_USAGE_SINK (jsonl, sqlite or none) and LLM_USAGE_PATH."""
+    sink_type = (sink_type or os.getenv("LLM_USAGE_SINK", "jsonl")).lower()
+    if sink_type == "jsonl":
+        return JsonlUsageSink(path or os.getenv("LLM_USAGE_PATH", ".cache/llm_usage.jsonl"))
+    if sink_type == "sqlite":
+        return SqliteUsageSink(path or os.getenv("LLM_USAGE_PATH", ".cache/llm_usage.sqlite3"))
+    return NullUsageSink()
+
+
+def summarize(records: Iterable[UsageRecord], by: str = "application") -> Dict[str, Dict[str, Any]]:
+    """Rolls records up per application id, per day, per model, per prompt type or per routing reason."""
+    summary: Dict[str, Dict[str, Any]] = defaultdict(
+        lambda: {"calls": 0, "failed": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                 "total_cost": 0.0, "latency": 0.0}
+    )
+    for record in records:
+        if by == "day":
+            key = datetime.fromtimestamp(record.timestamp).strftime("%Y-%m-%d")
+        elif by == "model":
+            key = record.model
+        elif by == "prompt_type":
+            key = record.prompt_type
+        elif by == "route":
+            key = f"{record.model} ({record.route or '-'})"
+        else:
+            key = record.application_id or "-"
+        row = summary[key]
+        row["calls"] += 1
+        row["failed"] += record.status != "ok"
+        row["retries"] += record.retries
+        row["prompt_tokens"] += record.prompt_tokens
+        row["completion_tokens"] += record.completion_tokens
+        row["total_cost"] += record.total_cost
+        row["latency"] += record.latency
+    return dict(summary)
+
+
+def format_report(summary: Dict[str, Dict[str, Any]], by: str) -> str:
+    header = f"{by:<40} {'calls':>6} {'failed':>6} {'retries':>7} {'prompt':>9} {'completion':>10} {'cost $':>10} {'latency s':>10}"
+    lines = [header, "-" * len(header)]
+    totals = defaultdict(float)
+    for key, row in sorted(summary.items()):
+        lines.append(
+            f"{key:<40} {row['calls']:>6} {row['failed']:>6} {row['retries']:>7} {row['prompt_tokens']:>9} "
+            f"{row['completion_tokens']:>10} {row['total_cost']:>10.4f} {row['latency']:>10.2f}"
+        )
+        for column, value in row.items():
+            totals[column] += value
+    lines.append("-" * len(header))
+    lines.append(
+        f"{'total':<40} {int(totals['calls']):>6} {int(totals['failed']):>6} {int(totals['retries']):>7} "
+        f"{int(totals['prompt_tokens']):>9} {int(totals['completion_tokens']):>10} "
+        f"{totals['total_cost']:>10.4f} {totals['latency']:>10.2f}"
+    )
+    return "\n".join(lines)
+
+
+class UsageLedger:
+    """Records one UsageRecord per LLM call into the configured sink."""
+
+    def __init__(self, sink: UsageSink = None):
+        self.sink = sink or get_usage_sink()
+
+    def record(self, **kwargs) -> UsageRecord:
+        record = UsageRecord(timestamp=time.time(), **kwargs)
+        self.sink.write(record)
+        return record
+
+    def report(self, by: str = "application") -> str:
+        return format_report(summarize(self.sink.read(), by=by), by=by)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize LLM token usage, cost and latency.")
+    parser.add_argument("--by", choices=["application", "day", "model", "prompt_type", "route"], default="application")
+    parser.add_argument("--sink", choices=["jsonl", "sqlite"], help="Defaults to LLM_USAGE_SINK.")
+    parser.add_argument("--path", help="Defaults to LLM_USAGE_PATH.")
+    args = parser.parse_args()
+    print(UsageLedger(sink=get_usage_sink(args.sink, args.path)).report(by=args.by))
@@ -114,3 +114,87 @@ fields = [{
     "value": ""
 }]
 """
+
+
+EXTRACT_AND_FILL_USER_ROLE="""
+Here is an HTML job application form and metadata about the applicant. Detect every input field of the form and fill it in one pass.
+
+### **HTML Form:**
+{html_form}
+
+### **Applicant Metadata:**
+{user_meta_data}
+
+Return a structured JSON object with a `fields` array containing every detected field, its unique identifiers and a `"value"` key chosen from the applicant metadata.
+
+"""
+EXTRACT_AND_FILL_SYSTEM_ROLE="""
+You are an AI assistant specialized in analyzing HTML job application forms and filling them based on metadata about the applicant.
+
+### **Task:**
+1. Detect all input fields in the HTML form, including text inputs, dropdowns, file uploads, textareas, checkboxes and radio buttons.
+2. Extract the unique identifiers of each field. If several exist, prioritize in this order: `data-ui` → `id` → `name` → `aria-label` → `placeholder`.
+3. Group **radio buttons** and **checkboxes** by their `name` attribute, include the question text as `label` and list every option with its `value` and `label`.
+4. Add a `"value"` key to every field, chosen from the applicant metadata.
+- Ensure that no fields are duplicated and skip hidden inputs and buttons.
+
+### **Rules for Value Selection:**
+1. **Use the applicant metadata** to make value selections where applicable.
+2. **For text fields**, generate a value based on the field label, name or placeholder (e.g., "Full Name" → "John Doe").
+3. **For dropdowns, radio buttons, checkboxes**, the value must be one of the option `value`s of that field.
+4. **For numeric fields**, ensure the value fits within any range constraints.
+5. **For date fields**, use a valid date in YYYY-MM-DD format.
+6. **For file uploads**, return a placeholder filename with a supported extension.
+7. **For phone number fields (type=tel)**, take the country from the metadata and return dialcode+phonenumber (example +11254521252).
+8. **Ensure logical consistency** across all fields.
+
+### **Output Format:**
+Return output in **JSON format**:
+{"fields": [{
+    "type": "",
+    "data-ui":"",
+    "name": "",
+    "id":"",
+    "label": "",
+    "options": [
+    
+    ],
+    "required": bool,
+    "value": ""
+}]}
+"""
+
+
+REPAIR_FIELD_VALUES_USER_ROLE="""
+Some values you returned for a job application form could not be used. Each field below has a `"problem"` key saying what was wrong with its value.
+
+### **Fields to Fix:**
+{invalid_fields}
+
+### **Applicant Metadata:**
+{user_meta_data}
+
+Return a JSON object with a `fields` array holding exactly these fields, each with a corrected `"value"` key.
+
+"""
+
+REPAIR_FIELD_VALUES_SYSTEM_ROLE="""
+You are an AI assistant correcting the values of job application form fields.
+
+### **Rules:**
+1. Fix only the fields you are given and keep their `type`, `data-ui`, `name`, `id`, `label` and `options` unchanged.
+2. **For dropdowns, radio buttons, checkboxes**, the value must be one of the option `value`s of that field.
+3. **For date fields**, use a valid date in YYYY-MM-DD format.
+4. **For required fields**, never return an empty value.
+5. Use the applicant metadata wherever it applies.
+
+### **Output Format:**
+{"fields": [{
+    "type": "",
+    "data-ui":"",
+    "name": "",
+    "id":"",
+    "label": "",
+    "value": ""
+}]}
+"""
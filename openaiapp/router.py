@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+from openaiapp.constants import LlmModels, LlmPromptTypes
+from openaiapp.tokens import estimate_tokens
+
+load_dotenv()
+
+SMALL = "small"
+LARGE = "large"
+AUTO = "auto"
+DEFAULT_POLICY = {
+    LlmPromptTypes.EXTRACT_INPUT_FIELDS: AUTO,
+    LlmPromptTypes.FILL_VALUE_IN_FIELD: AUTO,
+    LlmPromptTypes.EXTRACT_AND_FILL: AUTO,
+    LlmPromptTypes.REPAIR_FIELD_VALUES: SMALL,
+}
+CONTROL_PATTERN = re.compile(r"<(input|select|textarea)\b(?![^>]*type=[\"']?(hidden|submit|button)\b)", re.IGNORECASE)
+FREE_TEXT_PATTERN = re.compile(r"<textarea\b", re.IGNORECASE)
+
+
+def parse_policy(text: str) -> Dict[str, str]:
+    """ROUTER_POLICY as {prompt type: small|large|auto}, e.g. "EXTRACT_AND_FILL:large,FILL_VALUE_IN_FIELD:auto"."""
+    policy = dict(DEFAULT_POLICY)
+    for item in (text or "").split(","):
+        if ":" not in item:
+            continue
+        prompt_type, choice = (part.strip() for part in item.split(":", 1))
+        if choice.lower() in (SMALL, LARGE, AUTO):
+            policy[prompt_type] = choice.lower()
+        else:
+            logging.error(f"Ignoring router policy '{item}': expected small, large or auto.")
+    return policy
+
+
+def form_complexity(prompt_variables: Dict[str, str]) -> Dict[str, int]:
+    """Controls and free-text questions the prompt carries, from its fields JSON or its form HTML."""
+    fields_text = prompt_variables.get("input_fields") or prompt_variables.get("invalid_fields")
+    if fields_text:
+        try:
+            fields = json.loads(fields_text)["fields"]
+            return {
+                "controls": len(fields),
+                "free_text": sum(1 for field in fields if field.get("type") == "textarea"),
+            }
+        except Exception:
+            pass
+    html_form = prompt_variables.get("html_form") or ""
+    return {"controls": len(CONTROL_PATTERN.findall(html_form)), "free_text": len(FREE_TEXT_PATTERN.findall(html_form))}
+
+
+@dataclass
+class Route:
+    llm_model: Dict[str, Any]
+    reason: str
+
+
+class ModelRouter:
+    """
+    Chooses the model of every LLM call instead of sending everything to DEFAULT_OPENAI_MODEL_NAME.
+
+    Each prompt type has a policy (ROUTER_POLICY): always the small model, always the large one,
+    or `auto`, which keeps small standard forms on the small model and sends prompts over
+    ROUTER_SMALL_MAX_TOKENS estimated tokens, forms with more than ROUTER_SMALL_MAX_FIELDS
+    controls or more than ROUTER_SMALL_MAX_FREE_TEXT free-text questions to the large one.
+    A call made because the small model's answer failed validation is escalated to the large
+    model (ROUTER_ESCALATE). Decisions, cost and latency are counted per model.
+    """
+
+    def __init__(
+        self,
+        small_model: str = None,
+        large_model: str = None,
+        policy: Dict[str, str] = None,
+        enabled: bool = None,
+    ):
+        models = LlmModels()
+        self.default_model = getattr(models, os.getenv("DEFAULT_OPENAI_MODEL_NAME"))
+        self.small_model = getattr(models, small_model or os.getenv("ROUTER_SMALL_MODEL", "GPT_4O_MINI"))
+        self.large_model = getattr(models, large_model or os.getenv("ROUTER_LARGE_MODEL", "GPT_4O"))
+        self.policy = policy or parse_policy(os.getenv("ROUTER_POLICY", ""))
+        self.enabled = os.getenv("MODEL_ROUTER", "true").lower() == "true" if enabled is None else enabled
+        self.escalate = os.getenv("ROUTER_ESCALATE", "true").lower() == "true"
+        self.max_small_tokens = int(os.getenv("ROUTER_SMALL_MAX_TOKENS", "6000"))
+        self.max_small_fields = int(os.getenv("ROUTER_SMALL_MAX_FIELDS", "30"))
+        self.max_small_free_text = int(os.getenv("ROUTER_SMALL_MAX_FREE_TEXT", "3"))
+        self.decisions = defaultdict(int)  # (model name, reason) -> calls
+        self.usage = defaultdict(lambda: {"calls": 0, "cost": 0.0, "latency": 0.0})
+        self._lock = threading.Lock()
+
+    @property
+    def escalates(self) -> bool:
+        """Whether calls retried after a failed validation go to the large model."""
+        return self.enabled and self.escalate
+
+    def escalation_changes_model(self, prompt_type: str, prompt_variables: Dict[str, str] = None) -> bool:
+        """Whether an escalated retry of this call would go to a different (the large) model."""
+        if not self.escalates:
+            return False
+        route = self._choose(prompt_type, prompt_variables or {}, escalate=False)
+        return route.llm_model["model_name"] != self.large_model["model_name"]
+
+    def route(self, prompt_type: str, prompt_variables: Dict[str, str] = None, escalate: bool = False) -> Route:
+        """The model for one call and the reason it was chosen."""
+        route = self._choose(prompt_type, prompt_variables or {}, escalate)
+        with self._lock:
+            self.decisions[(route.llm_model["model_name"], route.reason)] += 1
+        logging.debug(f"Routed {prompt_type} to {route.llm_model['model_name']} ({route.reason}).")
+        return route
+
+    def _choose(self, prompt_type: str, prompt_variables: Dict[str, str], escalate: bool) -> Route:
+        if not self.enabled:
+            return Route(self.default_model, "default")
+        if escalate and self.escalate:
+            return Route(self.large_model, "escalated")
+        choice = self.policy.get(prompt_type, AUTO)
+        if choice == SMALL:
+            return Route(self.small_model, "policy")
+        if choice == LARGE:
+            return Route(self.large_model, "policy")
+
+        tokens = sum(estimate_tokens(str(value), self.small_model["model_name"]) for value in prompt_variables.values())
+        if tokens > self.max_small_tokens:
+            return Route(self.large_model, "large input")
+        complexity = form_complexity(prompt_variables)
+        if complexity["controls"] > self.max_small_fields or complexity["free_text"] > self.max_small_free_text:
+            return Route(self.large_model, "complex form")
+        return Route(self.small_model, "small form")
+
+    def record(self, model_name: str, cost: float, latency: float) -> None:
+        with self._lock:
+            usage = self.usage[model_name]
+            usage["calls"] += 1
+            usage["cost"] += cost
+            usage["latency"] += latency
+
+    def log_stats(self) -> None:
+        with self._lock:
+            decisions = ", ".join(
+                f"{model} {reason}: {calls}" for (model, reason), calls in sorted(self.decisions.items())
+            )
+            usage = ", ".join(
+                f"{model} {row['calls']} calls ${row['cost']:.4f} {row['latency'] / row['calls'] if row['calls'] else 0.0:.2f}s avg"
+                for model, row in sorted(self.usage.items())
+            )
+        logging.info(f"Model router: {decisions or 'no calls'}; {usage or 'no usage'}")
@@ -0,0 +1,186 @@
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import openai
+from dotenv import load_dotenv
+
+from openaiapp.exceptions import LLMException, StatusCodes
+from tracing.tracer import span
+
+load_dotenv()
+
+WINDOW_SECONDS = 60.0
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class ModelBudget:
+    """Sliding one-minute window of requests and tokens sent to one model."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = deque()  # [sent_at, tokens] per request
+        self.blocked_until = 0.0
+
+    def _prune(self, now: float) -> None:
+        while self.window and now - self.window[0][0] >= WINDOW_SECONDS:
+            self.window.popleft()
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a request of `tokens` fits in both budgets, 0 when it fits now."""
+        self._prune(now)
+        wait = max(0.0, self.blocked_until - now)
+        if not self.window:
+            # A request bigger than the whole budget still goes out once the window is empty.
+            return wait
+
+        if len(self.window) >= self.rpm:
+            wait = max(wait, self.window[len(self.window) - self.rpm][0] + WINDOW_SECONDS - now)
+
+        used = sum(entry[1] for entry in self.window)
+        if used + tokens > self.tpm:
+            freed = 0
+            for sent_at, entry_tokens in self.window:
+                freed += entry_tokens
+                if used - freed + tokens <= self.tpm:
+                    wait = max(wait, sent_at + WINDOW_SECONDS - now)
+                    break
+            else:
+                wait = max(wait, self.window[-1][0] + WINDOW_SECONDS - now)
+        return wait
+
+    def reserve(self, tokens: int, now: float) -> list:
+        entry = [now, tokens]
+        self.window.append(entry)
+        return entry
+
+    @staticmethod
+    def settle(entry: list, tokens: int) -> None:
+        """Replaces the estimate with the tokens the API actually billed."""
+        entry[1] = tokens
+
+
+class RateLimitScheduler:
+    """
+    Queues LLM calls per model so they stay within the model's RPM/TPM budget.
+
+    Callers are served first come, first served per model. Each call reserves its estimated
+    tokens before it is sent; the estimate is replaced by the billed usage once the response
+    arrives. Rate limits, timeouts, connection errors and 5xx responses are retried with
+    jittered exponential backoff, and a 429's `Retry-After` pauses the whole model queue.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = None,
+        backoff_base: float = None,
+        backoff_max: float = None,
+        budgets: Dict[str, Tuple[int, int]] = None,
+    ):
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "5"))
+        self.backoff_base = backoff_base or float(os.getenv("LLM_BACKOFF_BASE", "1"))
+        self.backoff_max = backoff_max or float(os.getenv("LLM_BACKOFF_MAX", "60"))
+        self._budget_overrides = budgets or {}
+        self._budgets: Dict[str, ModelBudget] = {}
+        self._queues: Dict[str, asyncio.Lock] = {}
+
+    def _get_budget(self, llm_model: Dict[str, Any]) -> ModelBudget:
+        model_name = llm_model["model_name"]
+        if model_name not in self._budgets:
+            rpm, tpm = self._budget_overrides.get(
+                model_name, (llm_model.get("rpm", 500), llm_model.get("tpm", 30_000))
+            )
+            self._budgets[model_name] = ModelBudget(rpm=rpm, tpm=tpm)
+            self._queues[model_name] = asyncio.Lock()
+        return self._budgets[model_name]
+
+    async def _acquire(self, llm_model: Dict[str, Any], tokens: int) -> list:
+        budget = self._get_budget(llm_model)
+        # asyncio.Lock wakes waiters in arrival order, which keeps the queue fair.
+        async with self._queues[llm_model["model_name"]]:
+            while True:
+                wait = budget.wait_time(tokens, time.monotonic())
+                if wait <= 0:
+                    return budget.reserve(tokens, time.monotonic())
+                logging.debug(f"Waiting {wait:.2f}s for {llm_model['model_name']} rate limit budget...")
+                await asyncio.sleep(wait)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        if headers.get("retry-after-ms"):
+            try:
+                return float(headers["retry-after-ms"]) / 1000
+            except ValueError:
+                pass
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return max(0.0, retry_at.timestamp() - time.time()) if retry_at else None
+
+    async def submit(
+        self, llm_model: Dict[str, Any], estimated_tokens: int, call: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, int]:
+        """
+        Runs `call` once budget allows, retrying retryable failures.
+
+        Returns:
+            Tuple[Any, int]: The call's result and how many retries it took.
+
+        Raises:
+            LLMException: When the call still fails after `max_retries` retries.
+        """
+        budget = self._get_budget(llm_model)
+        attempt = 0
+        while True:
+            with span("llm.queue", model=llm_model["model_name"], attempt=attempt):
+                entry = await self._acquire(llm_model, estimated_tokens)
+            try:
+                result = await call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise LLMException(
+                        status_code=StatusCodes.TOO_MANY_REQUESTS
+                        if isinstance(e, openai.RateLimitError)
+                        else StatusCodes.SERVICE_UNAVAILABLE,
+                        message=f"LLM request failed after {attempt} retries.",
+                        error=str(e),
+                    )
+                retry_after = self._retry_after(e)
+                delay = self._backoff(attempt)
+                if retry_after is not None:
+                    delay = retry_after + delay / 10
+                if isinstance(e, openai.RateLimitError):
+                    budget.blocked_until = max(budget.blocked_until, time.monotonic() + delay)
+                attempt += 1
+                logging.warning(
+                    f"{type(e).__name__} from {llm_model['model_name']}, retry {attempt}/{self.max_retries} in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(result, "usage", None)
+            if usage is not None:
+                budget.settle(entry, int(usage.total_tokens))
+            return result, attempt
@@ -1,45 +1,68 @@
-from typing import Dict
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict
+import asyncio
 import os
+import time
 
 from dotenv import load_dotenv
-from openai import OpenAI
 
 
+from openaiapp.clients import get_async_client, get_client
 from openaiapp.constants import LlmApiKeys, LlmModels, LlmPrompts
+from openaiapp.exceptions import LLMException, StatusCodes
+from openaiapp.ledger import UsageLedger
+from openaiapp.router import ModelRouter, Route
+from openaiapp.scheduler import RateLimitScheduler
+from openaiapp.streaming import FieldStreamParser
+from openaiapp.tokens import estimate_tokens
+from tracing.tracer import annotate, span, traced, traced_stream, traced_sync
 load_dotenv()
 
+
+def _prompt_attributes(self, prompt_type, *args, **kwargs):
+    return {"prompt_type": prompt_type}
+
+
 class OpenAIService:
     """
     A class for handling OpenAI services with methods for generating chat completions and calculating token costs.
 
     Attributes:
-        client: AsyncOpenAI - The client for interacting with OpenAI services.
-        llm_model: Dict[str, int] - The LLM model configuration for token costs.
+        client: OpenAI - The shared, long-lived client for interacting with OpenAI services.
+        llm_model: Dict[str, int] - The DEFAULT_OPENAI_MODEL_NAME configuration, used while the router is off.
+        router: ModelRouter - Chooses the model of every call.
         message: List - A list to store chat messages.
 
     Methods:
         _get_message_list(prompt_type: str, prompt_variables: dict = {}, image_url: str = None) -> list:
             Retrieves a list of messages based on the prompt type, variables, and optional image URL.
 
-        generate(prompt_type: str, prompt_variables: dict = {}, model_data_dict: dict = None, image_url: str = None) -> ChatCompletion:
+        _prepare_request(prompt_type: str, prompt_variables: dict = {}, model_data_dict: dict = None, image_url: str = None, escalate: bool = False) -> tuple:
+            Routes the call to a model, resolves the API key and builds the chat completion request arguments.
+
+        generate(prompt_type: str, prompt_variables: dict = {}, model_data_dict: dict = None, image_url: str = None, escalate: bool = False) -> ChatCompletion:
             Generates a chat completion based on the provided prompt type, variables, model data, and image URL.
 
-        get_request_detail(response: ChatCompletion) -> Dict[str, Any]:
-            Retrieves details of the request including token costs and response text.
+        _record_usage(prompt_type: str, started_at: float, response: ChatCompletion = None, ...) -> None:
+            Writes the token counts, cost, latency and retry count of one call to the usage ledger.
 
-        _get_tokens_and_calculate_cost(response: ChatCompletion) -> Dict[str, float]:
+        _get_tokens_and_calculate_cost(response: ChatCompletion, llm_model: dict = None) -> Dict[str, float]:
             Calculates the token costs based on the response from the chat completion.
     """
 
     def __init__(
         self,
+        ledger: UsageLedger = None,
+        router: ModelRouter = None,
     ):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = self._get_client(os.getenv("OPENAI_API_KEY"))
         self.llm_model: Dict[str, int] = getattr(
             LlmModels(), os.getenv("DEFAULT_OPENAI_MODEL_NAME")
         )
-        # self.db = db_service.get_session()
-        # self.token_usage_app_services = TokenUsageAppServices()
+        self.ledger = ledger or UsageLedger()
+        self.router = router or ModelRouter()
+
+    _get_client = staticmethod(get_client)
 
     @staticmethod
     def _get_message_list(
@@ -89,13 +112,15 @@ class OpenAIService:
                 error=str(e),
             )
 
+    @traced_sync("llm.generate", _prompt_attributes)
     def generate(
         self,
         prompt_type: str,
         prompt_variables: dict = {},
         model_data_dict: dict = None,
         image_url: str = None,
-        # user_id: str = None,
+        application_id: str = None,
+        escalate: bool = False,
     ):
         """
         Generates a chat completion based on the provided prompt type, variables, model data, and image URL.
@@ -103,126 +128,402 @@ class OpenAIService:
         Parameters:
             prompt_type (str): The type of prompt to generate messages for.
             prompt_variables (dict, optional): Variables to replace in the user prompt. Defaults to {}.
-            model_data_dict (dict, optional): Model data dictionary for customizing the LLM model. Defaults to None.
+            model_data_dict (dict, optional): Model for this call only, bypassing the router. Defaults to None.
             image_url (str, optional): The URL of the image to include in the message. Defaults to None.
+            application_id (str, optional): The application the call belongs to, used to roll up usage. Defaults to None.
+            escalate (bool, optional): The call follows an answer that failed validation. Defaults to False.
 
         Returns:
             ChatCompletion: The completion response from the chat generation process.
         """
+        started_at = time.perf_counter()
+        route = None
         try:
-            if model_data_dict:
-                self.llm_model = model_data_dict
-
-            openai_api_key = getattr(LlmApiKeys, prompt_type)
-            if openai_api_key:
-                self.client = OpenAI(api_key=openai_api_key)
-
-            messages = self._get_message_list(
+            openai_api_key, request, route = self._prepare_request(
                 prompt_type=prompt_type,
                 prompt_variables=prompt_variables,
+                model_data_dict=model_data_dict,
                 image_url=image_url,
+                escalate=escalate,
             )
+            self.client = self._get_client(openai_api_key)
 
-            response = self.client.chat.completions.create(
-                model=self.llm_model["model_name"],
-                messages=messages,
-                response_format={"type": "json_object"},
-                temperature=0.5,
-            )
-
-            # if user_id:
-            #     await self.get_request_data_and_save_into_db(
-            #         response=response, user_id=user_id, prompt_type=prompt_type
-            #     )
+            raw_response = self.client.chat.completions.with_raw_response.create(**request)
+            response = raw_response.parse()
 
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                response=response,
+                retries=raw_response.retries_taken,
+                application_id=application_id,
+                route=route,
+            )
             return response
+        except LLMException as e:
+            print("ERROR in generating llm response: ", str(e))
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                application_id=application_id,
+                error=str(e),
+                route=route,
+            )
+            raise
         except Exception as e:
             print("ERROR in generating llm response: ", str(e))
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                application_id=application_id,
+                error=str(e),
+                route=route,
+            )
             raise LLMException(
                 status_code=StatusCodes.INTERNAL_SERVER_ERROR,
                 message="Something went wrong while generating llm response.",
                 error=str(e),
             )
 
+    def _prepare_request(
+        self,
+        prompt_type: str,
+        prompt_variables: dict = {},
+        model_data_dict: dict = None,
+        image_url: str = None,
+        escalate: bool = False,
+    ) -> tuple:
+        """
+        Routes the call to a model, resolves the API key and builds the chat completion request arguments.
+        A `model_data_dict` applies to this call only; the service's default model is left as it is.
+
+        Returns:
+            tuple: The API key for the prompt type, the keyword arguments for `chat.completions.create` and the Route.
+        """
+        if model_data_dict:
+            route = Route(model_data_dict, "explicit")
+        else:
+            route = self.router.route(prompt_type, prompt_variables, escalate=escalate)
+
+        openai_api_key = getattr(LlmApiKeys, prompt_type) or os.getenv("OPENAI_API_KEY")
+
+        messages = self._get_message_list(
+            prompt_type=prompt_type,
+            prompt_variables=prompt_variables,
+            image_url=image_url,
+        )
+        return openai_api_key, {
+            "model": route.llm_model["model_name"],
+            "messages": messages,
+            "response_format": {"type": "json_object"},
+            "temperature": 0.5,
+        }, route
+
     @staticmethod
     def get_response_text_from_response(response) -> str:
         try:
             return response.choices[0].message.content
         except Exception as e:
-            LLMException(
+            raise LLMException(
+                status_code=StatusCodes.INTERNAL_SERVER_ERROR,
+                message="Something went wrong while reading llm response.",
+                error=str(e),
+            )
+
+    def _record_usage(
+        self,
+        prompt_type: str,
+        started_at: float,
+        response=None,
+        retries: int = 0,
+        application_id: str = None,
+        error: str = None,
+        route: Route = None,
+    ) -> None:
+        """
+        Writes the token counts, cost, latency and retry count of one call to the usage ledger.
+
+        Parameters:
+            prompt_type (str): The type of prompt the call was made for.
+            started_at (float): `time.perf_counter()` value taken before the call.
+            response (ChatCompletion, optional): The completion, absent when the call failed.
+            retries (int, optional): How many times the client retried the request. Defaults to 0.
+            application_id (str, optional): The application the call belongs to. Defaults to None.
+            error (str, optional): The error message of a failed call. Defaults to None.
+            route (Route, optional): The model the call was routed to; the default model when absent.
+        """
+        try:
+            llm_model = route.llm_model if route is not None else self.llm_model
+            token_cost_dict = self._get_tokens_and_calculate_cost(response, llm_model) if response is not None else {}
+            latency = time.perf_counter() - started_at
+            annotate(
+                model=llm_model["model_name"],
+                prompt_tokens=token_cost_dict.get("input_tokens", 0),
+                completion_tokens=token_cost_dict.get("output_tokens", 0),
+                retries=retries,
+            )
+            self.router.record(llm_model["model_name"], token_cost_dict.get("total_cost", 0.0), latency)
+            self.ledger.record(
+                prompt_type=prompt_type,
+                model=llm_model["model_name"],
+                prompt_tokens=token_cost_dict.get("input_tokens", 0),
+                completion_tokens=token_cost_dict.get("output_tokens", 0),
+                total_tokens=token_cost_dict.get("total_tokens", 0),
+                input_cost=token_cost_dict.get("input_cost", 0.0),
+                output_cost=token_cost_dict.get("output_cost", 0.0),
+                total_cost=token_cost_dict.get("total_cost", 0.0),
+                latency=latency,
+                retries=retries,
+                application_id=application_id,
+                status="ok" if error is None else "failed",
+                error=error,
+                route=route.reason if route is not None else None,
+            )
+        except Exception as e:
+            # Usage accounting must never fail the LLM call itself.
+            print("ERROR in recording llm usage: ", str(e))
+
+    def _get_tokens_and_calculate_cost(self, response, llm_model: dict = None) -> Dict[str, float]:
+        """
+        Calculates the token costs based on the response from the chat completion.
+
+        Parameters:
+            response (ChatCompletion): The response object from the chat completion.
+            llm_model (dict, optional): The model that answered. Defaults to the service's default model.
+
+        Returns:
+            Dict[str, float]: A dictionary containing input tokens, output tokens, total tokens, input cost, output cost, and total cost.
+        """
+        try:
+            input_tokens = int(response.usage.prompt_tokens)
+            output_tokens = int(response.usage.completion_tokens)
+            total_tokens = int(response.usage.total_tokens)
+            llm_model = llm_model or self.llm_model
+
+            input_cost = input_tokens * (llm_model["input_cost"] / 1_000_000)
+            output_cost = output_tokens * (llm_model["output_cost"] / 1_000_000)
+            total_cost = input_cost + output_cost
+
+            return {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": total_tokens,
+                "input_cost": input_cost,
+                "output_cost": output_cost,
+                "total_cost": total_cost,
+            }
+        except Exception as e:
+            raise LLMException(
+                status_code=StatusCodes.INTERNAL_SERVER_ERROR,
+                message="Something went wrong while calculating llm token cost.",
+                error=str(e),
+            )
+
+
+class AsyncOpenAIService(OpenAIService):
+    """
+    Async variant of OpenAIService for running many applications in one event loop.
+
+    Every call goes through the pooled `AsyncOpenAI` client of its API key, and at most
+    `max_concurrency` requests are in flight at once across all callers sharing the service.
+    Calls are queued by the RateLimitScheduler, which keeps each model within its RPM/TPM
+    budget and owns retries, so the client's own retries are turned off.
+
+    Attributes:
+        semaphore: asyncio.Semaphore - Bounds concurrent requests to OpenAI.
+        scheduler: RateLimitScheduler - Budgets, queues and retries requests per model.
+    """
+
+    _get_client = staticmethod(get_async_client)
+
+    def __init__(
+        self,
+        ledger: UsageLedger = None,
+        max_concurrency: int = None,
+        scheduler: RateLimitScheduler = None,
+        router: ModelRouter = None,
+    ):
+        super().__init__(ledger=ledger, router=router)
+        self.semaphore = asyncio.Semaphore(
+            max_concurrency or int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        )
+        self.scheduler = scheduler or RateLimitScheduler()
+
+    @staticmethod
+    def _estimate_request_tokens(request: dict) -> int:
+        prompt_tokens = sum(
+            estimate_tokens(str(message["content"]), request["model"]) for message in request["messages"]
+        )
+        return prompt_tokens + int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "1000"))
+
+    @traced("llm.generate", _prompt_attributes)
+    async def generate(
+        self,
+        prompt_type: str,
+        prompt_variables: dict = {},
+        model_data_dict: dict = None,
+        image_url: str = None,
+        application_id: str = None,
+        escalate: bool = False,
+    ):
+        """
+        Generates a chat completion without blocking the event loop. See OpenAIService.generate.
+
+        Returns:
+            ChatCompletion: The completion response from the chat generation process.
+        """
+        started_at = time.perf_counter()
+        route = None
+        try:
+            openai_api_key, request, route = self._prepare_request(
+                prompt_type=prompt_type,
+                prompt_variables=prompt_variables,
+                model_data_dict=model_data_dict,
+                image_url=image_url,
+                escalate=escalate,
+            )
+            client = self._get_client(openai_api_key).with_options(max_retries=0)
+
+            async def send():
+                async with self.semaphore:
+                    with span("llm.request", model=request["model"]):
+                        return await client.chat.completions.create(**request)
+
+            response, retries = await self.scheduler.submit(
+                llm_model=route.llm_model,
+                estimated_tokens=self._estimate_request_tokens(request),
+                call=send,
+            )
+
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                response=response,
+                retries=retries,
+                application_id=application_id,
+                route=route,
+            )
+            return response
+        except LLMException as e:
+            # Already carries its status (e.g. 429 or 503 from the scheduler); keep it.
+            print("ERROR in generating llm response: ", str(e))
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                application_id=application_id,
+                error=str(e),
+                route=route,
+            )
+            raise
+        except Exception as e:
+            print("ERROR in generating llm response: ", str(e))
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                application_id=application_id,
+                error=str(e),
+                route=route,
+            )
+            raise LLMException(
                 status_code=StatusCodes.INTERNAL_SERVER_ERROR,
                 message="Something went wrong while generating llm response.",
                 error=str(e),
             )
 
-    # async def get_request_data_and_save_into_db(
-    #     self, response: ChatCompletion, user_id: str = None, prompt_type: str = ""
-    # ) -> bool:
-    #     """
-    #     Retrieves details of the request including token costs, response text, and current datetime.
-
-    #     Parameters:
-    #         response (ChatCompletion): The response object from the chat completion.
-
-    #     Returns:
-    #         Dict[str, Any]: A dictionary containing model name, input tokens, output tokens, total tokens, input cost, output cost, total cost, response text, and datetime.
-    #     """
-    #     try:
-    #         token_cost_dict = await self._get_tokens_and_calculate_cost(response)
-
-    #         token_data_dict = {
-    #             "usage_type": prompt_type,
-    #             "model": self.llm_model["model_name"],
-    #             "input_token": token_cost_dict.get("input_tokens"),
-    #             "output_token": token_cost_dict.get("output_tokens"),
-    #             "total_token": token_cost_dict.get("total_tokens"),
-    #             "total_cost": token_cost_dict.get("total_cost"),
-    #         }
-
-    #         self.token_usage_app_services.create_token_usage(
-    #             user_id=user_id, token_data=token_data_dict
-    #         )
-
-    #     except Exception as e:
-    #         raise LLMException(
-    #             status_code=StatusCodes.INTERNAL_SERVER_ERROR,
-    #             message="Something went wrong while saving llm response.",
-    #             error=str(e),
-    #         )
-
-    # async def _get_tokens_and_calculate_cost(
-    #     self, response: ChatCompletion
-    # ) -> Dict[str, float]:
-    #     """
-    #     Calculates the token costs based on the response from the chat completion.
-
-    #     Parameters:
-    #         response (ChatCompletion): The response object from the chat completion.
-
-    #     Returns:
-    #         Dict[str, float]: A dictionary containing input tokens, output tokens, total tokens, input cost, output cost, and total cost.
-    #     """
-    #     try:
-    #         input_tokens = int(response.usage.prompt_tokens)
-    #         output_tokens = int(response.usage.completion_tokens)
-    #         total_tokens = int(response.usage.total_tokens)
-
-    #         input_cost = input_tokens * (self.llm_model["input_cost"] / 1_000_000)
-    #         output_cost = output_tokens * (self.llm_model["output_cost"] / 1_000_000)
-    #         total_cost = input_cost + output_cost
-
-    #         return {
-    #             "input_tokens": input_tokens,
-    #             "output_tokens": output_tokens,
-    #             "total_tokens": total_tokens,
-    #             "input_cost": input_cost,
-    #             "output_cost": output_cost,
-    #             "total_cost": total_cost,
-    #         }
-    #     except Exception as e:
-    #         raise LLMException(
-    #             status_code=StatusCodes.INTERNAL_SERVER_ERROR,
-    #             message="Something went wrong while calculating llm token cost.",
-    #             error=str(e),
-    #         )
+    @traced_stream("llm.generate_stream", _prompt_attributes)
+    async def generate_stream(
+        self,
+        prompt_type: str,
+        prompt_variables: dict = {},
+        model_data_dict: dict = None,
+        application_id: str = None,
+        escalate: bool = False,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streams the completion and yields each object of its `fields` array as soon as it is complete.
+
+        Parameters:
+            prompt_type (str): The type of prompt to generate messages for.
+            prompt_variables (dict, optional): Variables to replace in the user prompt. Defaults to {}.
+            model_data_dict (dict, optional): Model for this call only, bypassing the router. Defaults to None.
+            application_id (str, optional): The application the call belongs to, used to roll up usage. Defaults to None.
+            escalate (bool, optional): The call follows an answer that failed validation. Defaults to False.
 
+        Yields:
+            Dict[str, Any]: One field object at a time, in the order the model writes them.
+        """
+        started_at = time.perf_counter()
+        parser = FieldStreamParser()
+        usage = None
+        retries = 0
+        route = None
+        try:
+            openai_api_key, request, route = self._prepare_request(
+                prompt_type=prompt_type,
+                prompt_variables=prompt_variables,
+                model_data_dict=model_data_dict,
+                escalate=escalate,
+            )
+            client = self._get_client(openai_api_key).with_options(max_retries=0)
+
+            async def send():
+                # The slot stays taken until the stream is fully read, not just opened.
+                await self.semaphore.acquire()
+                try:
+                    return await client.chat.completions.create(
+                        **request, stream=True, stream_options={"include_usage": True}
+                    )
+                except BaseException:
+                    self.semaphore.release()
+                    raise
+
+            stream, retries = await self.scheduler.submit(
+                llm_model=route.llm_model,
+                estimated_tokens=self._estimate_request_tokens(request),
+                call=send,
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        for field in parser.feed(chunk.choices[0].delta.content):
+                            yield field
+            finally:
+                self.semaphore.release()
+
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                response=SimpleNamespace(usage=usage) if usage is not None else None,
+                retries=retries,
+                application_id=application_id,
+                route=route,
+            )
+        except LLMException as e:
+            # Already carries its status (e.g. 429 or 503 from the scheduler); keep it.
+            print("ERROR in streaming llm response: ", str(e))
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                retries=retries,
+                application_id=application_id,
+                error=str(e),
+                route=route,
+            )
+            raise
+        except Exception as e:
+            print("ERROR in streaming llm response: ", str(e))
+            self._record_usage(
+                prompt_type=prompt_type,
+                started_at=started_at,
+                retries=retries,
+                application_id=application_id,
+                error=str(e),
+                route=route,
+            )
+            raise LLMException(
+                status_code=StatusCodes.INTERNAL_SERVER_ERROR,
+                message="Something went wrong while streaming llm response.",
+                error=str(e),
+            )
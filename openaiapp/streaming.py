@@ -0,0 +1,78 @@
+import json
+import logging
+from typing import Any, Dict, List
+
+
+class FieldStreamParser:
+    """
+    Incremental JSON parser that yields each object of the `fields` array as soon as it closes.
+
+    Feed it the streamed completion text chunk by chunk; `feed` returns the field objects that
+    were completed by that chunk. Both `{"fields": [...]}` and a bare top-level array are accepted.
+    """
+
+    def __init__(self, array_key: str = "fields"):
+        self.array_key = array_key
+        self.text = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key_buffer = []
+        self._last_key = None
+        self._array_depth = None
+        self._object_buffer = []
+        self._capturing = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        completed = []
+        self.text.append(chunk)
+        for char in chunk:
+            if self._capturing:
+                self._object_buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = "".join(self._key_buffer)
+                elif self._depth == 1:
+                    self._key_buffer.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._key_buffer = []
+            elif char in "{[":
+                if char == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._capturing = True
+                    self._object_buffer = [char]
+                self._depth += 1
+                if char == "[" and self._array_depth is None and (
+                    self._depth == 1 or (self._depth == 2 and self._last_key == self.array_key)
+                ):
+                    self._array_depth = self._depth
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._capturing and self._depth == self._array_depth:
+                    self._capturing = False
+                    field = self._load("".join(self._object_buffer))
+                    if field is not None:
+                        completed.append(field)
+                elif char == "]" and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_depth = None
+        return completed
+
+    @staticmethod
+    def _load(text: str):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            logging.warning(f"Skipping malformed streamed field: {e}")
+            return None
+
+    def get_text(self) -> str:
+        return "".join(self.text)
@@ -0,0 +1,27 @@
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to the ~4 characters per token rule of thumb
+    tiktoken = None
+
+CHARACTERS_PER_TOKEN = 4
+_encodings = {}
+
+
+def estimate_tokens(text: str, model_name: str = "gpt-4o") -> int:
+    """
+    Estimates how many tokens `text` costs for `model_name`.
+
+    Uses the model's tiktoken encoding when tiktoken is installed, otherwise approximates
+    from the character count.
+    """
+    if not text:
+        return 0
+    if tiktoken is None:
+        return max(1, len(text) // CHARACTERS_PER_TOKEN)
+
+    if model_name not in _encodings:
+        try:
+            _encodings[model_name] = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            _encodings[model_name] = tiktoken.get_encoding("o200k_base")
+    return len(_encodings[model_name].encode(text))
@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from scraping.field_validator import is_date_field
+from scraping.profile_rules import match_option, normalize_key
+
+COMPANY_PLACEHOLDER = "{company}"
+# Only choices carry over between forms; free text (cover letters, "why us?", dates) belongs to
+# one application.
+CHOICE_TYPES = ("radio", "select", "checkbox")
+# Words that change a question's meaning while barely changing its n-grams: "authorized to work in
+# the U.S." vs "in the UK", "are you" vs "are you NOT". Aliases map to one canonical token.
+NEGATIONS = {"not", "no", "never", "non", "cannot", "without", "neither", "nor"}
+PLACES = {
+    "usa": "us", "america": "us", "american": "us", "united states": "us",
+    "uk": "uk", "britain": "uk", "british": "uk", "england": "uk", "united kingdom": "uk",
+    "eu": "eu", "europe": "eu", "european": "eu", "european union": "eu", "eea": "eu",
+    "canada": "canada", "canadian": "canada", "australia": "australia", "australian": "australia",
+    "new zealand": "new zealand", "ireland": "ireland", "irish": "ireland", "germany": "germany",
+    "german": "germany", "france": "france", "french": "france", "spain": "spain", "italy": "italy",
+    "netherlands": "netherlands", "dutch": "netherlands", "switzerland": "switzerland", "sweden": "sweden",
+    "poland": "poland", "portugal": "portugal", "greece": "greece", "israel": "israel", "india": "india",
+    "indian": "india", "mexico": "mexico", "brazil": "brazil", "japan": "japan", "china": "china",
+    "singapore": "singapore", "philippines": "philippines", "south africa": "south africa",
+}
+
+
+def company_from_url(url: str) -> Optional[str]:
+    """Company name from a Workable URL: apply.workable.com/millennium-health/j/... → "Millennium Health"."""
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    if not parts or parts[0] in ("j", "api"):
+        return None
+    return " ".join(word.capitalize() for word in re.split(r"[-_]+", parts[0]) if word)
+
+
+def template_company(text: str, company: Optional[str]) -> str:
+    """Replaces the company name (any case, spaces or hyphens) with {company}."""
+    if not text or not company:
+        return text or ""
+    words = [re.escape(word) for word in re.split(r"[\s\-_]+", company) if word]
+    if not words:
+        return text
+    return re.sub(r"\b" + r"[\s\-_]+".join(words) + r"\b", COMPANY_PLACEHOLDER, text, flags=re.IGNORECASE)
+
+
+def render_company(text: str, company: Optional[str]) -> str:
+    return text.replace(COMPANY_PLACEHOLDER, company or "the company")
+
+
+def bankable(field: Dict[str, Any]) -> bool:
+    """Whether a field's answer may be stored in or read from the bank."""
+    return (
+        field.get("type") in CHOICE_TYPES
+        and bool(field.get("options"))
+        and bool(field.get("label"))
+        and not is_date_field(field)
+    )
+
+
+def discriminators(question: str) -> frozenset:
+    """Negations, places and numbers in a question; a stored answer is reused only when they are the same."""
+    # "U.S." becomes "usa" rather than "us", which would be the pronoun.
+    text = re.sub(r"\bu\.s\.(a\.)?", " usa ", question.lower())
+    text = re.sub(r"\bu\.k\.", " uk ", text)
+    text = re.sub(r"n't\b", " not", text)
+    words = re.findall(r"[a-z0-9]+", text)
+    found = {word for word in words if word in NEGATIONS or word.isdigit()}
+    for size in (2, 1):
+        for start in range(len(words) - size + 1):
+            place = PLACES.get(" ".join(words[start:start + size]))
+            if place:
+                found.add(place)
+    return frozenset(found)
+
+
+class CharNgramVectorizer:
+    """Hashed character n-gram counts; stable across runs (crc32) so stored rows stay valid."""
+
+    def __init__(self, dimensions: int = 4096, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def transform(self, text: str) -> np.ndarray:
+        text = re.sub(r"[^a-z0-9{}]+", " ", text.lower().replace(".", ""))
+        text = " " + " ".join(text.split()) + " "
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        low, high = self.ngram_range
+        for size in range(low, high + 1):
+            for start in range(0, max(0, len(text) - size + 1)):
+                vector[zlib.crc32(text[start:start + size].encode("utf-8")) % self.dimensions] += 1.0
+        return vector
+
+
+class AnswerBank:
+    """
+    Past answers to custom questions, looked up by TF-IDF weighted char n-gram cosine similarity.
+
+    Each entry is a question label with the company name templated out, its option set and the
+    chosen value. Rows are kept in one NumPy matrix that grows as answers arrive; document
+    frequencies are updated per row, so the index never needs a full rebuild. A field is answered
+    locally only when the best match reaches `min_similarity`, asks about the same places, numbers
+    and negations (see `discriminators`) and its value fits the field's options. Only choice
+    fields are banked (see `bankable`).
+    """
+
+    def __init__(self, path: str = None, min_similarity: float = None, dimensions: int = 4096):
+        self.path = path or os.getenv("ANSWER_BANK_PATH", ".cache/answer_bank.sqlite3")
+        self.min_similarity = min_similarity or float(os.getenv("ANSWER_BANK_MIN_SIMILARITY", "0.85"))
+        self.vectorizer = CharNgramVectorizer(dimensions=dimensions)
+        self.hits = 0
+        self.misses = 0
+        self.added = 0
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._counts = np.zeros((0, dimensions), dtype=np.float32)
+        self._document_frequency = np.zeros(dimensions, dtype=np.float32)
+        self._weighted = None
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                field_type TEXT NOT NULL,
+                options TEXT NOT NULL,
+                value TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+        self._load()
+
+    def _load(self) -> None:
+        rows = self._connection.execute("SELECT id, question, field_type, options, value FROM answers ORDER BY id").fetchall()
+        for row_id, question, field_type, options, value in rows:
+            self._append({"id": row_id, "question": question, "type": field_type, "options": json.loads(options), "value": value})
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        entry["discriminators"] = discriminators(entry["question"])
+        counts = self.vectorizer.transform(entry["question"])
+        if len(self._entries) == self._counts.shape[0]:
+            grown = np.zeros((max(16, 2 * self._counts.shape[0]), self._counts.shape[1]), dtype=np.float32)
+            grown[: self._counts.shape[0]] = self._counts
+            self._counts = grown
+        self._counts[len(self._entries)] = counts
+        self._document_frequency += counts > 0
+        self._entries.append(entry)
+        self._weighted = None
+
+    def _idf(self) -> np.ndarray:
+        documents = len(self._entries)
+        return np.log((1.0 + documents) / (1.0 + self._document_frequency)) + 1.0
+
+    def _matrix(self) -> np.ndarray:
+        if self._weighted is None:
+            weighted = self._counts[: len(self._entries)] * self._idf()
+            norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+            self._weighted = weighted / np.where(norms == 0, 1.0, norms)
+        return self._weighted
+
+    def _query(self, question: str) -> Tuple[Optional[int], float]:
+        """The most similar stored question with the same discriminators, and its similarity."""
+        if not self._entries:
+            return None, 0.0
+        vector = self.vectorizer.transform(question) * self._idf()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None, 0.0
+        similarities = self._matrix() @ (vector / norm)
+        wanted = discriminators(question)
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.min_similarity:
+                break
+            if self._entries[index]["discriminators"] == wanted:
+                return int(index), float(similarities[index])
+        return None, 0.0
+
+    @staticmethod
+    def _options_key(field: Dict[str, Any]) -> List[str]:
+        return sorted(normalize_key(option.get("label") or option.get("value")) for option in field.get("options") or [])
+
+    def lookup(self, field: Dict[str, Any], company: Optional[str] = None) -> Optional[str]:
+        """The stored answer for a similar question, rendered for this field, or None."""
+        if not bankable(field):
+            return None
+        question = template_company(field["label"], company)
+        with self._lock:
+            index, similarity = self._query(question)
+            if index is None or similarity < self.min_similarity:
+                self.misses += 1
+                return None
+            entry = self._entries[index]
+
+        value = None
+        if entry["options"]:
+            value = match_option(render_company(entry["value"], company), field["options"])
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        logging.info(f"Answer bank hit ({similarity:.2f}) for '{field['label']}': {value}")
+        with self._lock:
+            self._connection.execute("UPDATE answers SET hits = hits + 1 WHERE id = ?", (entry["id"],))
+            self._connection.commit()
+        return value
+
+    def add(self, field: Dict[str, Any], company: Optional[str] = None) -> None:
+        """Stores an answered field; a near-identical question with the same options is updated instead."""
+        if not bankable(field) or field.get("value") in (None, ""):
+            return
+        question = template_company(field["label"], company)
+        options = self._options_key(field)
+        value = str(field["value"])
+        # Store the chosen option's label: option values differ between forms ("true" vs "Yes").
+        for option in field.get("options") or []:
+            if str(option.get("value")) == value and option.get("label"):
+                value = str(option["label"])
+                break
+        value = template_company(value, company)
+        with self._lock:
+            index, similarity = self._query(question)
+            if index is not None and similarity >= 0.98 and self._entries[index]["options"] == options:
+                entry = self._entries[index]
+                entry["value"] = value
+                self._connection.execute(
+                    "UPDATE answers SET value = ?, updated_at = ? WHERE id = ?", (value, time.time(), entry["id"])
+                )
+            else:
+                cursor = self._connection.execute(
+                    "INSERT INTO answers (question, field_type, options, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (question, field.get("type", ""), json.dumps(options), value, time.time()),
+                )
+                self._append({"id": cursor.lastrowid, "question": question, "type": field.get("type", ""), "options": options, "value": value})
+                self.added += 1
+            self._connection.commit()
+
+    def apply(self, fields: List[Dict[str, Any]], company: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Splits fields into (answered from the bank, left for the LLM)."""
+        answered, remaining = [], []
+        for field in fields:
+            value = self.lookup(field, company)
+            if value is None:
+                remaining.append(field)
+            else:
+                answered.append({**field, "value": value})
+        return answered, remaining
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def log_stats(self) -> None:
+        lookups = self.hits + self.misses
+        logging.info(
+            f"Answer bank: {len(self)} answers, {self.hits} hits, {self.misses} misses "
+            f"(hit rate {self.hits / lookups if lookups else 0.0:.0%}), {self.added} added"
+        )
+
+    def close(self) -> None:
+        self._connection.close()
+
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import psutil
+from playwright.async_api import async_playwright
+
+from scraping.network import NetworkFilter
+
+# Everything a site can leave behind for the next job on a reused context, besides cookies.
+ORIGIN_STORAGE_TYPES = "local_storage,indexeddb,websql,cache_storage,service_workers,file_systems"
+
+
+@dataclass(eq=False)
+class BrowserSlot:
+    browser: object
+    launched_at: float = field(default_factory=time.monotonic)
+    jobs: int = 0
+    active: int = 0
+    retiring: bool = False
+
+
+@dataclass(eq=False)
+class ContextLease:
+    context: object
+    slot: BrowserSlot
+    jobs: int = 0
+    leased_at: float = 0.0
+    # Created from a saved storage state for one job; closed on release instead of idled.
+    single_use: bool = False
+
+
+class BrowserPool:
+    """
+    Launches `size` Chromium browsers once and hands out pre-warmed contexts.
+
+    Every lease gets a context no other job is using. On return, its pages are closed, its cookies
+    and per-origin storage are wiped, and the context is put back for the next job until it has
+    served `max_jobs_per_context` jobs. When
+    the browsers' resident memory crosses `memory_watermark_mb`, the browser that has served the
+    most jobs stops taking leases and is relaunched once its last context comes back.
+    """
+
+    def __init__(
+        self,
+        size: int = None,
+        warm_contexts: int = None,
+        max_jobs_per_context: int = None,
+        memory_watermark_mb: int = None,
+        headless: bool = True,
+        network_filter: Optional[NetworkFilter] = None,
+        context_options: dict = None,
+    ):
+        self.size = max(1, size or int(os.getenv("BROWSER_POOL_SIZE", 1)))
+        self.warm_contexts = warm_contexts if warm_contexts is not None else int(os.getenv("BROWSER_POOL_WARM_CONTEXTS", 2))
+        self.max_jobs_per_context = max_jobs_per_context or int(os.getenv("CONTEXT_MAX_JOBS", 20))
+        self.memory_watermark_mb = memory_watermark_mb or int(os.getenv("BROWSER_MEMORY_WATERMARK_MB", 2048))
+        self.memory_check_interval = float(os.getenv("BROWSER_MEMORY_CHECK_SECONDS", 5))
+        self.headless = headless
+        self.network_filter = network_filter
+        self.context_options = context_options or {"bypass_csp": True}
+
+        self.playwright = None
+        self.slots: List[BrowserSlot] = []
+        self._idle: List[ContextLease] = []
+        self._lock = asyncio.Lock()
+        self._last_memory_check = 0.0
+        self.memory_mb = 0.0
+
+        self.leases = 0
+        self.returns = 0
+        self.contexts_created = 0
+        self.contexts_recycled = 0
+        self.browsers_launched = 0
+        self.browsers_recycled = 0
+        self.lease_wait_total = 0.0
+        self.lease_wait_max = 0.0
+
+    async def start(self) -> "BrowserPool":
+        logging.info(f"Starting browser pool ({self.size} browsers, {self.warm_contexts} warm contexts)...")
+        self.playwright = await async_playwright().start()
+        self.slots = list(await asyncio.gather(*(self._launch() for _ in range(self.size))))
+        await self._warm(self.warm_contexts)
+        return self
+
+    async def close(self) -> None:
+        for lease in self._idle:
+            await self._close_context(lease)
+        self._idle.clear()
+        for slot in self.slots:
+            try:
+                await slot.browser.close()
+            except Exception as e:
+                logging.error(f"Error closing browser: {e}")
+        self.slots.clear()
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+    async def lease(self, storage_state: dict = None) -> ContextLease:
+        """
+        Returns an idle context, or creates one on the least busy healthy browser. A context that
+        should start from a saved `storage_state` is always created fresh with it, and closed
+        when it comes back.
+        """
+        started_at = time.perf_counter()
+        stale = []
+        async with self._lock:
+            lease = None
+            while self._idle and storage_state is None:
+                candidate = self._idle.pop()
+                if not candidate.slot.retiring and candidate.slot.browser.is_connected():
+                    lease = candidate
+                    break
+                stale.append(candidate)
+            slot = lease.slot if lease is not None else self._pick_slot()
+            if slot is not None:
+                # Counted before any await, so the browser is not relaunched under this lease.
+                slot.active += 1
+            self.leases += 1
+
+        # Closing contexts, launching browsers and creating contexts happen outside the lock.
+        for candidate in stale:
+            await self._close_context(candidate)
+            await self._maybe_relaunch(candidate.slot)
+        if lease is None:
+            if slot is None:
+                slot = await self._launch()
+                slot.active += 1
+                async with self._lock:
+                    self.slots.append(slot)
+            try:
+                lease = await self._new_context(slot, storage_state)
+            except Exception:
+                slot.active -= 1
+                raise
+            lease.single_use = storage_state is not None
+        lease.leased_at = time.monotonic()
+
+        waited = time.perf_counter() - started_at
+        self.lease_wait_total += waited
+        self.lease_wait_max = max(self.lease_wait_max, waited)
+        return lease
+
+    async def release(self, lease: ContextLease, discard: bool = False) -> None:
+        """Takes a context back; it is reused unless it is worn out, discarded or its browser is retiring."""
+        async with self._lock:
+            self.returns += 1
+            lease.jobs += 1
+            lease.slot.jobs += 1
+            self._check_memory()
+            reuse = not (
+                discard
+                or lease.single_use
+                or lease.jobs >= self.max_jobs_per_context
+                or lease.slot.retiring
+                or not lease.slot.browser.is_connected()
+            )
+
+        # The reset talks to the browser, so other leases and returns go ahead meanwhile. The
+        # lease still counts as active, which keeps its browser from being relaunched under it.
+        if reuse:
+            try:
+                await self._reset(lease.context)
+            except Exception as e:
+                logging.error(f"Error resetting pooled context, dropping it: {e}")
+                reuse = False
+
+        async with self._lock:
+            lease.slot.active -= 1
+            # The browser may have started retiring while the context was being reset.
+            if reuse and not lease.slot.retiring and lease.slot.browser.is_connected():
+                self._idle.append(lease)
+                return
+        await self._close_context(lease)
+        self.contexts_recycled += 1
+        await self._maybe_relaunch(lease.slot)
+
+    @staticmethod
+    async def _reset(context) -> None:
+        """
+        Leaves a context as clean as a new one: sessionStorage goes with its pages, cookies are
+        cleared, and localStorage, IndexedDB and caches of every origin the job touched are wiped.
+        """
+        origins = {origin["origin"] for origin in (await context.storage_state()).get("origins", [])}
+        for page in context.pages:
+            for frame in page.frames:
+                url = urlparse(frame.url)
+                if url.scheme in ("http", "https"):
+                    origins.add(f"{url.scheme}://{url.netloc}")
+            await page.close()
+        await context.clear_cookies()
+        if not origins:
+            return
+        page = await context.new_page()
+        try:
+            session = await context.new_cdp_session(page)
+            for origin in origins:
+                await session.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": ORIGIN_STORAGE_TYPES})
+            await session.detach()
+        finally:
+            await page.close()
+
+    async def _launch(self) -> BrowserSlot:
+        browser = await self.playwright.chromium.launch(headless=self.headless)
+        self.browsers_launched += 1
+        return BrowserSlot(browser=browser)
+
+    async def _warm(self, count: int) -> None:
+        slots = [slot for slot in self.slots if not slot.retiring]
+        if not slots:
+            return
+        leases = await asyncio.gather(*(self._new_context(slots[index % len(slots)]) for index in range(count)))
+        async with self._lock:
+            self._idle.extend(leases)
+
+    async def _new_context(self, slot: BrowserSlot, storage_state: dict = None) -> ContextLease:
+        options = dict(self.context_options, storage_state=storage_state) if storage_state else self.context_options
+        context = await slot.browser.new_context(**options)
+        if self.network_filter is not None:
+            await self.network_filter.attach(context)
+        self.contexts_created += 1
+        return ContextLease(context=context, slot=slot)
+
+    def _pick_slot(self) -> Optional[BrowserSlot]:
+        """The least busy healthy browser, or None when one has to be launched; call with the lock held."""
+        healthy = [slot for slot in self.slots if not slot.retiring and slot.browser.is_connected()]
+        if not healthy:
+            return None
+        return min(healthy, key=lambda slot: slot.active)
+
+    async def _maybe_relaunch(self, slot: BrowserSlot) -> None:
+        """
+        Replaces a retiring or crashed browser once none of its contexts are leased. The slot is
+        taken out of the pool under the lock; closing and launching browsers happen outside it.
+        """
+        async with self._lock:
+            if slot not in self.slots or slot.active > 0:
+                return
+            if not slot.retiring and slot.browser.is_connected():
+                return
+            self.slots.remove(slot)
+            self._idle = [lease for lease in self._idle if lease.slot is not slot]
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            logging.error(f"Error closing retired browser: {e}")
+        self.browsers_recycled += 1
+        logging.info(f"Recycled a browser after {slot.jobs} jobs ({self.memory_mb:.0f} MB in use).")
+        replacement = await self._launch()
+        async with self._lock:
+            self.slots.append(replacement)
+        await self._warm(max(0, self.warm_contexts - len(self._idle)))
+
+    def _check_memory(self) -> None:
+        now = time.monotonic()
+        if now - self._last_memory_check < self.memory_check_interval:
+            return
+        self._last_memory_check = now
+        self.memory_mb = self._browser_memory_mb()
+        if self.memory_mb < self.memory_watermark_mb:
+            return
+        candidates = [slot for slot in self.slots if not slot.retiring]
+        if candidates:
+            busiest = max(candidates, key=lambda slot: slot.jobs)
+            busiest.retiring = True
+            logging.info(f"Browser memory {self.memory_mb:.0f} MB above watermark, retiring a browser.")
+
+    @staticmethod
+    def _browser_memory_mb() -> float:
+        """Resident memory of every child process (the Playwright driver and the browsers it started)."""
+        total = 0
+        try:
+            for child in psutil.Process(os.getpid()).children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+        except psutil.Error as e:
+            logging.error(f"Error reading browser memory: {e}")
+        return total / (1024 * 1024)
+
+    @staticmethod
+    async def _close_context(lease: ContextLease) -> None:
+        try:
+            await lease.context.close()
+        except Exception as e:
+            logging.error(f"Error closing pooled context: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "browsers": len(self.slots),
+            "in_use": sum(slot.active for slot in self.slots),
+            "idle": len(self._idle),
+            "leases": self.leases,
+            "returns": self.returns,
+            "contexts_created": self.contexts_created,
+            "contexts_recycled": self.contexts_recycled,
+            "browsers_launched": self.browsers_launched,
+            "browsers_recycled": self.browsers_recycled,
+            "lease_wait_avg": self.lease_wait_total / self.leases if self.leases else 0.0,
+            "lease_wait_max": self.lease_wait_max,
+            "memory_mb": self.memory_mb,
+        }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logging.info(
+            f"Browser pool: {stats['leases']} leases, {stats['contexts_created']} contexts created, "
+            f"{stats['contexts_recycled']} recycled, {stats['browsers_launched']} browsers launched, "
+            f"{stats['browsers_recycled']} recycled, lease wait avg {stats['lease_wait_avg'] * 1000:.0f} ms "
+            f"/ max {stats['lease_wait_max'] * 1000:.0f} ms, {stats['memory_mb']:.0f} MB"
+        )
@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+from openaiapp.tokens import estimate_tokens
+
+# Elements that are never cut: a question and all of its options stay in one chunk.
+SECTION_TAGS = {"fieldset", "section"}
+SECTION_ROLES = {"group", "radiogroup"}
+CONTROL_TAGS = ["input", "select", "textarea"]
+
+
+def _is_section(element: Tag) -> bool:
+    return element.name in SECTION_TAGS or element.get("role") in SECTION_ROLES
+
+
+def _blocks(element: Tag, max_tokens: int) -> List[str]:
+    """
+    The element's children as HTML blocks no larger than `max_tokens`, descending into
+    oversized wrappers. Sections are kept whole even when they are larger.
+    """
+    blocks = []
+    for child in element.children:
+        if isinstance(child, NavigableString):
+            if child.strip():
+                blocks.append(str(child))
+            continue
+        if not isinstance(child, Tag):
+            continue
+        html = str(child)
+        if estimate_tokens(html) <= max_tokens or _is_section(child) or not child.find(CONTROL_TAGS):
+            if estimate_tokens(html) > max_tokens and _is_section(child):
+                logging.info(f"Keeping an oversized <{child.name}> section whole ({estimate_tokens(html)} tokens).")
+            blocks.append(html)
+        else:
+            blocks.extend(_blocks(child, max_tokens))
+    return _glue_labels(blocks)
+
+
+def _glue_labels(blocks: List[str]) -> List[str]:
+    """Joins a block holding only a label (or a heading) to the block after it, so no control loses its question."""
+    glued = []
+    carry = ""
+    for block in blocks:
+        soup = BeautifulSoup(block, "html.parser")
+        if not soup.find(CONTROL_TAGS):
+            carry += block
+            continue
+        glued.append(carry + block)
+        carry = ""
+    if carry:
+        if glued:
+            glued[-1] += carry
+        else:
+            glued.append(carry)
+    return glued
+
+
+def split_form_html(html_form: str, max_tokens: int = None) -> List[str]:
+    """
+    Splits form HTML at fieldset/section boundaries into chunks of about `max_tokens`.
+
+    Consecutive blocks are packed greedily in document order, every chunk is wrapped in a
+    <form> tag, and text without controls travels with the block that follows it.
+    """
+    max_tokens = max_tokens or int(os.getenv("EXTRACT_CHUNK_TOKENS", "3000"))
+    soup = BeautifulSoup(html_form, "html.parser")
+    root = soup.find("form") or soup
+    chunks, current, current_tokens = [], [], 0
+    for block in _blocks(root, max_tokens):
+        tokens = estimate_tokens(block)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return [f"<form>{''.join(chunk)}</form>" for chunk in chunks]
+
+
+def field_key(field: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Radio/checkbox groups are one field per name; other fields are keyed by data-ui, id or name."""
+    if field.get("type") in ("radio", "checkbox") and field.get("name"):
+        return ("group", field["name"])
+    for attribute in ("data-ui", "id", "name"):
+        if field.get(attribute):
+            return (attribute, str(field[attribute]))
+    return None
+
+
+def merge_fields(chunk_fields: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merges per-chunk field lists, in chunk order, into one list in document order.
+
+    A field seen in two chunks (for instance a radio group cut by a boundary) is kept once,
+    at its first position: its options are united, `required` is true if either part says so,
+    and empty attributes are taken from the later part.
+    """
+    merged: List[Dict[str, Any]] = []
+    positions: Dict[Tuple[str, str], int] = {}
+    for fields in chunk_fields:
+        for field in fields:
+            key = field_key(field)
+            if key is None or key not in positions:
+                if key is not None:
+                    positions[key] = len(merged)
+                merged.append(dict(field))
+                continue
+            existing = merged[positions[key]]
+            for attribute, value in field.items():
+                if attribute == "options":
+                    known = {json.dumps(option, sort_keys=True) for option in existing.get("options") or []}
+                    existing["options"] = list(existing.get("options") or []) + [
+                        option for option in value or [] if json.dumps(option, sort_keys=True) not in known
+                    ]
+                elif attribute == "required":
+                    existing["required"] = bool(existing.get("required")) or bool(value)
+                elif not existing.get(attribute) and value:
+                    existing[attribute] = value
+    return merged
+
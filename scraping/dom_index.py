@@ -0,0 +1,71 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+# Collects every form control once and returns them with the keys they can be looked up by.
+SCAN_CONTROLS = """
+() => {
+    const keys = {};
+    const elements = Array.from(document.querySelectorAll("input, select, textarea"));
+    elements.forEach((element, position) => {
+        const add = (key) => { if (!(key in keys)) keys[key] = position; };
+        if (element.type === "radio" || element.type === "checkbox") {
+            if (element.name) add(`option:${element.name}=${element.value}`);
+        }
+        if (element.getAttribute("data-ui")) add(`data-ui:${element.getAttribute("data-ui")}`);
+        if (element.id) add(`id:${element.id}`);
+        if (element.name) add(`name:${element.name}`);
+    });
+    return { keys, elements };
+}
+"""
+
+
+class DomIndex:
+    """
+    Map from `data-ui` / `id` / `name` / radio value to the element handle of each form control.
+
+    Built with one scan of the page, after which every field is resolved with a dict lookup
+    instead of a new selector query per field. Fields that are not in the index are missing
+    without waiting on them; fill_values rescans once earlier answers may have revealed them.
+    """
+
+    def __init__(self, handles: Dict[str, Any]):
+        self.handles = handles
+
+    @classmethod
+    async def build(cls, page) -> "DomIndex":
+        scan = await page.evaluate_handle(SCAN_CONTROLS)
+        try:
+            keys = await (await scan.get_property("keys")).json_value()
+            elements = await (await scan.get_property("elements")).get_properties()
+            handles = {}
+            for key, position in keys.items():
+                element = elements.get(str(position))
+                if element is not None and element.as_element() is not None:
+                    handles[key] = element.as_element()
+            return cls(handles)
+        finally:
+            await scan.dispose()
+
+    @staticmethod
+    def keys_for(field: Dict[str, Any]) -> List[str]:
+        if field.get("type") == "radio":
+            return [f"option:{field.get('name')}={field.get('value')}"]
+        option = [f"option:{field['name']}={field.get('value')}"] if field.get("type") == "checkbox" and field.get("name") else []
+        return option + [f"{attribute}:{field[attribute]}" for attribute in ("data-ui", "id", "name") if field.get(attribute)]
+
+    def resolve(self, field: Dict[str, Any]) -> Optional[Any]:
+        for key in self.keys_for(field):
+            handle = self.handles.get(key)
+            if handle is not None:
+                return handle
+        return None
+
+    def missing(self, fields: List[Dict[str, Any]], log: bool = True) -> List[Dict[str, Any]]:
+        missing = [field for field in fields if self.resolve(field) is None]
+        for field in missing if log else []:
+            logging.warning(f"Field '{field.get('label')}' ({', '.join(self.keys_for(field))}) is not on the page, skipping it.")
+        return missing
+
+    def __len__(self) -> int:
+        return len(self.handles)
@@ -0,0 +1,6 @@
+class ScrapException(Exception):
+    def __init__(self, stage: str, message: str, error: str = None):
+        self.stage = stage
+        self.message = message
+        self.error = error
+        super().__init__(f"[{stage}] {message} (Error: {error})" if error else f"[{stage}] {message}")
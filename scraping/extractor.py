@@ -0,0 +1,240 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from bs4 import BeautifulSoup, Tag
+
+SKIPPED_INPUT_TYPES = {"hidden", "submit", "button", "reset", "image"}
+GROUPED_INPUT_TYPES = {"radio", "checkbox"}
+REQUIRED_MARKER = re.compile(r"\s*\*\s*$")
+OPTIONAL_MARKER = re.compile(r"\s*\(optional\)\s*$", re.IGNORECASE)
+
+
+@dataclass
+class ExtractionResult:
+    fields: List[Dict[str, Any]] = field(default_factory=list)
+    confidence: float = 0.0
+    issues: List[str] = field(default_factory=list)
+
+
+class FormFieldExtractor:
+    """
+    Extracts form input fields from form HTML without an LLM call.
+
+    Produces the same `fields` schema that EXTRACT_INPUT_FIELDS asks the model for:
+    identifiers (`data-ui`, `id`, `name`), resolved label text, required flag and, for
+    radio/checkbox/select fields, the option list. Radio buttons and checkboxes are
+    grouped by `name` and labelled with their question text.
+
+    The confidence score is the share of fields that got both an identifier and a label;
+    callers should fall back to the LLM when it is below `min_confidence`.
+    """
+
+    def __init__(self, min_confidence: float = None):
+        self.min_confidence = (
+            min_confidence
+            if min_confidence is not None
+            else float(os.getenv("EXTRACTOR_MIN_CONFIDENCE", "0.9"))
+        )
+
+    def extract(self, html_form: str) -> ExtractionResult:
+        soup = BeautifulSoup(html_form, "html.parser")
+        fields: List[Dict[str, Any]] = []
+        seen = set()
+        issues: List[str] = []
+
+        for element in soup.find_all(["input", "textarea", "select"]):
+            field_type = self._get_type(element)
+            if field_type is None:
+                continue
+
+            if field_type in GROUPED_INPUT_TYPES and element.get("name"):
+                key = ("group", element["name"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                field_data = self._build_group(soup, element, field_type)
+            else:
+                field_data = self._build_field(soup, element, field_type)
+                key = ("field", self.get_identifier(field_data))
+                if key in seen:
+                    continue
+                seen.add(key)
+
+            if not self.get_identifier(field_data):
+                issues.append(f"{field_type} field without identifier")
+            if not field_data["label"]:
+                issues.append(f"no label for {self.get_identifier(field_data) or field_type}")
+            fields.append(field_data)
+
+        if not fields:
+            return ExtractionResult(fields=[], confidence=0.0, issues=["no input fields found"])
+
+        complete = sum(1 for f in fields if f["label"] and self.get_identifier(f))
+        return ExtractionResult(fields=fields, confidence=complete / len(fields), issues=issues)
+
+    def is_confident(self, result: ExtractionResult) -> bool:
+        return result.confidence >= self.min_confidence
+
+    @staticmethod
+    def get_identifier(field_data: Dict[str, Any]) -> Optional[str]:
+        for key in ("data-ui", "id", "name"):
+            if field_data.get(key):
+                return field_data[key]
+        return None
+
+    @staticmethod
+    def _get_type(element: Tag) -> Optional[str]:
+        if element.name == "textarea":
+            return "textarea"
+        if element.name == "select":
+            return "select"
+        input_type = (element.get("type") or "text").lower()
+        if input_type in SKIPPED_INPUT_TYPES:
+            return None
+        return input_type
+
+    def _build_field(self, soup: BeautifulSoup, element: Tag, field_type: str) -> Dict[str, Any]:
+        label, marked_required = self._split_required_marker(self._resolve_label(soup, element))
+        field_data = self._identifiers(element)
+        field_data.update(
+            {
+                "type": field_type,
+                "label": label,
+                "required": self._is_required(element) or marked_required,
+            }
+        )
+        if field_type == "select":
+            field_data["options"] = [
+                {"value": option.get("value", self._text(option)), "label": self._text(option)}
+                for option in element.find_all("option")
+                if option.get("value", self._text(option))
+            ]
+        return self._ordered(field_data)
+
+    def _build_group(self, soup: BeautifulSoup, element: Tag, field_type: str) -> Dict[str, Any]:
+        name = element["name"]
+        members = [
+            member
+            for member in soup.find_all("input", attrs={"name": name})
+            if (member.get("type") or "").lower() == field_type
+        ]
+        container = self._group_container(element, members)
+
+        label, marked_required = self._split_required_marker(self._group_label(soup, container, members))
+        options = [
+            {"value": member.get("value", "on"), "label": self._option_label(soup, member)}
+            for member in members
+        ]
+        group_data_ui = container.get("data-ui") if container is not None and len(members) > 1 else None
+        data_ui = element.get("data-ui") or group_data_ui or name
+        field_data = {
+            "type": field_type,
+            "data-ui": data_ui,
+            "name": name,
+            "label": label,
+            "options": options,
+            "required": marked_required
+            or any(self._is_required(member) for member in members)
+            or (container is not None and container.get("aria-required") == "true"),
+        }
+        return self._ordered(field_data)
+
+    @staticmethod
+    def _identifiers(element: Tag) -> Dict[str, Any]:
+        return {key: element.get(key) for key in ("data-ui", "name", "id") if element.get(key)}
+
+    @staticmethod
+    def _ordered(field_data: Dict[str, Any]) -> Dict[str, Any]:
+        order = ("type", "data-ui", "name", "id", "label", "options", "required")
+        return {key: field_data[key] for key in order if key in field_data}
+
+    @staticmethod
+    def _is_required(element: Tag) -> bool:
+        return element.has_attr("required") or element.get("aria-required") == "true"
+
+    @staticmethod
+    def _text(element: Optional[Tag]) -> str:
+        if element is None:
+            return ""
+        return " ".join(element.get_text(" ", strip=True).split())
+
+    @staticmethod
+    def _split_required_marker(label: str):
+        label = OPTIONAL_MARKER.sub("", label)
+        if REQUIRED_MARKER.search(label):
+            return REQUIRED_MARKER.sub("", label), True
+        return label, False
+
+    def _labelled_by(self, soup: BeautifulSoup, element: Tag) -> str:
+        ids = (element.get("aria-labelledby") or "").split()
+        texts = [self._text(soup.find(id=label_id)) for label_id in ids]
+        return " ".join(text for text in texts if text)
+
+    def _resolve_label(self, soup: BeautifulSoup, element: Tag) -> str:
+        element_id = element.get("id")
+        if element_id:
+            label = soup.find("label", attrs={"for": element_id})
+            if label is not None and self._text(label):
+                return self._text(label)
+
+        labelled_by = self._labelled_by(soup, element)
+        if labelled_by:
+            return labelled_by
+        if element.get("aria-label"):
+            return element["aria-label"].strip()
+
+        ancestor_label = element.find_parent("label")
+        if ancestor_label is not None and self._text(ancestor_label):
+            return self._text(ancestor_label)
+
+        return (element.get("placeholder") or "").strip()
+
+    @staticmethod
+    def _group_container(element: Tag, members: List[Tag]) -> Optional[Tag]:
+        """Closest ancestor that wraps every member of the group, e.g. a fieldset or radiogroup."""
+        for parent in element.parents:
+            if parent.name in ("form", "[document]"):
+                return None
+            if all(any(ancestor is parent for ancestor in member.parents) for member in members) and (
+                parent.name == "fieldset"
+                or parent.get("role") in ("radiogroup", "group")
+                or parent.get("data-ui")
+            ):
+                return parent
+        return None
+
+    def _group_label(self, soup: BeautifulSoup, container: Optional[Tag], members: List[Tag]) -> str:
+        if container is not None:
+            labelled_by = self._labelled_by(soup, container)
+            if labelled_by:
+                return labelled_by
+            if container.get("aria-label"):
+                return container["aria-label"].strip()
+            legend = container.find("legend")
+            if legend is not None and self._text(legend):
+                return self._text(legend)
+
+        # A lone checkbox (e.g. a consent box) is its own question.
+        if len(members) == 1:
+            return self._option_label(soup, members[0])
+        if container is None:
+            return ""
+
+        # Question text usually sits in a sibling element ahead of the options wrapper.
+        for candidate in (container, container.parent):
+            if candidate is None or candidate.name in ("form", "[document]"):
+                break
+            for sibling in candidate.find_previous_siblings():
+                text = self._text(sibling)
+                if text:
+                    return text
+        return ""
+
+    def _option_label(self, soup: BeautifulSoup, member: Tag) -> str:
+        label = self._resolve_label(soup, member)
+        if label:
+            return label
+        sibling = member.find_next_sibling()
+        return self._text(sibling) if sibling is not None else member.get("value", "")
@@ -0,0 +1,513 @@
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field as dataclass_field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from openaiapp.constants import LlmPromptTypes
+from openaiapp.tokens import estimate_tokens
+from scraping.profile_rules import match_option
+
+# Field types fill_values knows how to fill (fill_field handlers and the BULK_FILL_FIELDS script).
+HANDLED_TYPES = {"text", "email", "textarea", "tel", "radio", "checkbox", "file", "select", "number", "url", "date"}
+TYPE_ALIASES = {
+    "select-one": "select",
+    "select-multiple": "select",
+    "dropdown": "select",
+    "phone": "tel",
+    "telephone": "tel",
+    "string": "text",
+    "input": "text",
+    "upload": "file",
+}
+CHOICE_TYPES = {"radio", "select"}
+# Keys extraction owns; the fill call only adds "value", so these are restored from the request.
+STRUCTURE_KEYS = ("type", "data-ui", "name", "id", "label", "options", "required")
+IDENTIFIER_KEYS = ("data-ui", "id", "name")
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y")
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    fenced = re.match(r"^```[a-zA-Z]*\s*(.*?)\s*(```)?$", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    return text[min(starts):] if starts else text
+
+
+def _drop_trailing_commas(text: str) -> str:
+    """Removes commas directly followed by a closing bracket, outside strings."""
+    kept = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            rest = text[index + 1:].lstrip()
+            if rest[:1] in ("}", "]"):
+                continue
+        kept.append(char)
+    return "".join(kept)
+
+
+def _close_truncated(text: str, max_attempts: int = 50) -> Optional[Any]:
+    """
+    Parses a cut-off document by dropping everything after the last complete object and
+    closing the brackets still open at that point.
+    """
+    cuts = []
+    stack = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+            if char == "}":
+                cuts.append((index, "".join(reversed(stack))))
+    for index, closing in reversed(cuts[-max_attempts:]):
+        try:
+            return json.loads(_drop_trailing_commas(text[: index + 1] + closing))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def repair_json(text: str) -> Tuple[Optional[Any], bool]:
+    """
+    Parses LLM output, repairing code fences, trailing commas and truncation on the way.
+    Returns the data (None when nothing could be recovered) and whether a repair was needed.
+    """
+    if not text:
+        return None, False
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+    cleaned = _drop_trailing_commas(_strip_fences(text))
+    try:
+        return json.loads(cleaned), True
+    except json.JSONDecodeError:
+        pass
+    data = _close_truncated(cleaned)
+    return data, data is not None
+
+
+def fields_of(data: Any) -> Optional[List[Any]]:
+    """The `fields` array of a parsed response; a bare array or a single other array key also count."""
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get("fields"), list):
+        return data["fields"]
+    arrays = [value for value in data.values() if isinstance(value, list)]
+    return arrays[0] if len(arrays) == 1 else None
+
+
+def field_key(field: Dict[str, Any]) -> Optional[str]:
+    for key in IDENTIFIER_KEYS:
+        if field.get(key):
+            return str(field[key])
+    return None
+
+
+def is_date_field(field: Dict[str, Any]) -> bool:
+    return field.get("type") == "date" or bool(re.search(r"\bdate\b", str(field.get("label") or "").lower()))
+
+
+def normalize_date(value: str) -> Optional[str]:
+    """`value` as YYYY-MM-DD, or None when it is not a recognizable date."""
+    value = value.strip()
+    if re.match(r"^\d{4}-\d{2}-\d{2}T", value):
+        value = value[:10]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+@dataclass
+class FieldCheck:
+    field: Any
+    problems: List[str] = dataclass_field(default_factory=list)
+    repaired: bool = False
+
+    @property
+    def valid(self) -> bool:
+        return not self.problems
+
+
+def validate_field(field: Any, expected: Dict[str, Any] = None, require_value: bool = True) -> FieldCheck:
+    """
+    Checks one field against the `fields` schema and repairs what can be fixed without the LLM.
+
+    With `expected` (the field as it was sent to the fill prompt), the structural keys are taken
+    from it so only the value is judged. Without `require_value`, only the schema extraction
+    produces is checked.
+    """
+    if not isinstance(field, dict):
+        return FieldCheck(field, [f"not an object: {field!r}"])
+    check = FieldCheck(dict(field))
+    field = check.field
+
+    if expected is not None:
+        for key in STRUCTURE_KEYS:
+            if key in expected and field.get(key) != expected[key]:
+                field[key] = expected[key]
+                check.repaired = True
+
+    if field_key(field) is None:
+        check.problems.append("no data-ui, id or name")
+
+    field_type = str(field.get("type") or "").strip().lower()
+    field_type = TYPE_ALIASES.get(field_type, field_type)
+    if field_type != field.get("type"):
+        field["type"] = field_type
+        check.repaired = True
+    if field_type not in HANDLED_TYPES:
+        check.problems.append(f"unsupported type {field_type!r}")
+
+    if not isinstance(field.get("label"), str):
+        field["label"] = str(field.get("label") or field.get("name") or field.get("id") or "")
+        check.repaired = True
+
+    options = field.get("options")
+    if options is not None:
+        if not isinstance(options, list):
+            check.problems.append("options is not a list")
+            options = []
+        elif any(not isinstance(option, dict) for option in options):
+            field["options"] = options = [
+                option if isinstance(option, dict) else {"value": str(option), "label": str(option)} for option in options
+            ]
+            check.repaired = True
+
+    if require_value:
+        _validate_value(check, field_type, options or [])
+    return check
+
+
+def _validate_value(check: FieldCheck, field_type: str, options: List[Dict[str, Any]]) -> None:
+    field = check.field
+    if "value" not in field:
+        check.problems.append("missing value")
+        return
+
+    value = field["value"]
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    elif isinstance(value, (int, float)):
+        value = str(value)
+    elif isinstance(value, list) and field_type == "checkbox":
+        value = ",".join(str(item) for item in value)
+    elif value is None:
+        value = ""
+    if not isinstance(value, str):
+        check.problems.append(f"value is not text: {value!r}")
+        return
+    if value != field["value"]:
+        field["value"] = value
+        check.repaired = True
+
+    if not value:
+        if field.get("required") and field_type != "file":
+            check.problems.append("required value is empty")
+        return
+
+    if field_type in CHOICE_TYPES and options:
+        if value not in [str(option.get("value")) for option in options]:
+            matched = match_option(value, options)
+            if matched is None:
+                check.problems.append(f"value {value!r} is not one of the options")
+            else:
+                field["value"] = str(matched)
+                check.repaired = True
+    elif field_type == "checkbox" and len(options) > 1:
+        values = []
+        for item in value.split(","):
+            matched = match_option(item.strip(), options)
+            if matched is None:
+                check.problems.append(f"value {item.strip()!r} is not one of the options")
+                return
+            values.append(str(matched))
+        if ",".join(values) != value:
+            field["value"] = ",".join(values)
+            check.repaired = True
+    elif is_date_field(field):
+        date = normalize_date(value)
+        if date is None:
+            check.problems.append(f"date {value!r} is not in YYYY-MM-DD format")
+        elif date != value:
+            field["value"] = date
+            check.repaired = True
+    elif field_type == "email" and "@" not in value:
+        check.problems.append(f"{value!r} is not an email address")
+
+
+class FieldValidator:
+    """
+    Validates the `fields` the LLM returns instead of letting one malformed answer fail the
+    whole application.
+
+    Broken JSON (code fences, trailing commas, a truncated response) and fixable fields (option
+    labels instead of values, dates in another format, mangled structural keys) are repaired
+    locally. Fields that are still invalid, or that the answer left out, are re-asked in one
+    small REPAIR_FIELD_VALUES call carrying only those fields, escalated to the router's large
+    model; what is still unusable after that is dropped. The counters measure how often repair worked and how many tokens it saved over
+    rerunning the whole call.
+    """
+
+    def __init__(self, reask: bool = None):
+        self.reask = os.getenv("LLM_REPAIR_REASK", "true").lower() == "true" if reask is None else reask
+        self.responses = 0
+        self.json_repaired = 0
+        self.unparseable = 0
+        self.fields_checked = 0
+        self.fields_repaired = 0
+        self.fields_reasked = 0
+        self.fields_recovered = 0
+        self.fields_dropped = 0
+        self.reasks = 0
+        self.reask_tokens = 0
+        self.tokens_saved = 0
+
+    def _load(self, text: str) -> Tuple[Optional[List[Any]], bool]:
+        data, repaired = repair_json(text)
+        fields = fields_of(data)
+        if fields is None:
+            self.unparseable += 1
+            logging.error(f"Unusable LLM response ({len(text or '')} characters), no fields recovered.")
+            return None, False
+        if repaired:
+            self.json_repaired += 1
+            logging.info(f"Repaired malformed JSON in the LLM response ({len(fields)} fields recovered).")
+        return fields, repaired
+
+    def _count(self, check: FieldCheck) -> None:
+        self.fields_checked += 1
+        if check.valid and check.repaired:
+            self.fields_repaired += 1
+
+    def parse_fields(self, text: str, prompt: str = "") -> Optional[List[Dict[str, Any]]]:
+        """
+        The extracted fields of an EXTRACT_INPUT_FIELDS response with the schema checked, or None
+        when the response is unusable. Invalid fields are dropped: re-asking would mean sending the
+        form again, and a field the form does not get is cheaper than failing the application.
+        """
+        self.responses += 1
+        fields, repaired = self._load(text)
+        if fields is None:
+            return None
+        valid = []
+        for field in fields:
+            check = validate_field(field, require_value=False)
+            self._count(check)
+            repaired = repaired or (check.valid and check.repaired)
+            if check.valid:
+                valid.append(check.field)
+            else:
+                self.fields_dropped += 1
+                logging.warning(f"Dropping extracted field '{check.field}': {'; '.join(check.problems)}")
+        # Only a repair that kept fields usable avoided a rerun; dropping invalid ones did not.
+        if repaired and valid:
+            self.tokens_saved += estimate_tokens(prompt) + estimate_tokens(text)
+        return valid
+
+    async def parse_values(
+        self,
+        openai_service,
+        text: str,
+        expected_fields: List[Dict[str, Any]] = None,
+        user_meta_data: str = "{}",
+        application_id: str = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        The filled fields of a FILL_VALUE_IN_FIELD (or EXTRACT_AND_FILL) response, validated and
+        repaired. `expected_fields` are the fields the prompt asked for, so the ones the answer
+        left out can be re-asked too.
+        """
+        self.responses += 1
+        fields, repaired = self._load(text)
+        expected = _index(expected_fields)
+        valid, invalid, seen = [], [], set()
+        for field in fields or []:
+            target = _lookup(expected, field)
+            if expected and target is None:
+                self.fields_dropped += 1
+                logging.warning(f"Dropping field '{field}' the form did not ask for.")
+                continue
+            check = validate_field(field, target)
+            self._count(check)
+            repaired = repaired or (check.valid and check.repaired)
+            if target is not None:
+                seen.add(id(target))
+            (valid if check.valid else invalid).append(check)
+        missing = _missing(expected, seen)
+        recovered = []
+        if invalid or missing:
+            recovered = await self._reask(openai_service, invalid, missing, user_meta_data, application_id)
+        if repaired or recovered:
+            self._saved(expected_fields, user_meta_data, text)
+        return [check.field for check in valid] + recovered
+
+    async def validate_stream(
+        self,
+        openai_service,
+        fields: AsyncIterator[Dict[str, Any]],
+        expected_fields: List[Dict[str, Any]] = None,
+        user_meta_data: str = "{}",
+        application_id: str = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Passes streamed fields through as they are validated. Invalid ones are held back and,
+        with the fields the stream never delivered (malformed objects, a dropped connection), are
+        re-asked once the stream ends.
+        """
+        self.responses += 1
+        expected = _index(expected_fields)
+        invalid, seen, received = [], set(), []
+        repaired = False
+        try:
+            async for field in fields:
+                received.append(field)
+                target = _lookup(expected, field)
+                if expected and target is None:
+                    self.fields_dropped += 1
+                    logging.warning(f"Dropping streamed field '{field}' the form did not ask for.")
+                    continue
+                check = validate_field(field, target)
+                self._count(check)
+                if target is not None:
+                    seen.add(id(target))
+                if check.valid:
+                    repaired = repaired or check.repaired
+                    yield check.field
+                else:
+                    invalid.append(check)
+        except Exception as e:
+            logging.error(f"Error streaming input values, re-asking the fields not received: {e}")
+
+        missing = _missing(expected, seen)
+        recovered = []
+        if invalid or missing:
+            recovered = await self._reask(openai_service, invalid, missing, user_meta_data, application_id)
+            for field in recovered:
+                yield field
+        if repaired or recovered:
+            self._saved(expected_fields, user_meta_data, json.dumps(received))
+
+    def _saved(self, expected_fields: Optional[List[Dict[str, Any]]], user_meta_data: str, text: str) -> None:
+        """
+        Adds what rerunning the whole call would have cost, once a local repair or the re-ask
+        recovered fields; _reask subtracts what the re-ask cost either way.
+        """
+        self.tokens_saved += (
+            estimate_tokens(json.dumps(expected_fields or [])) + estimate_tokens(user_meta_data) + estimate_tokens(text)
+        )
+
+    async def _reask(
+        self,
+        openai_service,
+        invalid: List[FieldCheck],
+        missing: List[Dict[str, Any]],
+        user_meta_data: str,
+        application_id: str = None,
+    ) -> List[Dict[str, Any]]:
+        """Asks the LLM again for just the invalid and missing fields; returns the ones it fixed."""
+        asked = [dict(check.field, problem="; ".join(check.problems)) for check in invalid if isinstance(check.field, dict)]
+        asked += [dict(field, problem="missing from your answer") for field in missing]
+        dropped = len(invalid) - len(asked) + len(missing)
+        if not asked or not self.reask or openai_service is None:
+            self.fields_dropped += len(invalid) + len(missing)
+            return []
+
+        self.reasks += 1
+        self.fields_reasked += len(asked)
+        logging.info(f"Re-asking the LLM for {len(asked)} invalid or missing fields...")
+        recovered = []
+        try:
+            response = await openai_service.generate(
+                prompt_type=LlmPromptTypes.REPAIR_FIELD_VALUES,
+                prompt_variables={"invalid_fields": json.dumps({"fields": asked}), "user_meta_data": user_meta_data},
+                application_id=application_id,
+                escalate=True,
+            )
+            tokens = getattr(getattr(response, "usage", None), "total_tokens", 0) or 0
+            self.reask_tokens += tokens
+            self.tokens_saved -= tokens
+            expected = _index([{key: value for key, value in field.items() if key not in ("problem", "value")} for field in asked])
+            for field in fields_of(repair_json(openai_service.get_response_text_from_response(response=response))[0]) or []:
+                target = _lookup(expected, field)
+                if target is None:
+                    continue
+                check = validate_field({key: value for key, value in field.items() if key != "problem"}, target)
+                if check.valid:
+                    recovered.append(check.field)
+                    expected = {key: other for key, other in expected.items() if other is not target}
+        except Exception as e:
+            logging.error(f"Error re-asking invalid fields: {e}")
+
+        self.fields_recovered += len(recovered)
+        self.fields_dropped += dropped + len(asked) - len(recovered)
+        if len(recovered) < len(asked):
+            logging.warning(f"Dropping {len(asked) - len(recovered)} fields still invalid after the re-ask.")
+        return recovered
+
+    def log_stats(self) -> None:
+        logging.info(
+            f"Field validator: {self.responses} responses ({self.json_repaired} JSON repaired, {self.unparseable} unusable), "
+            f"{self.fields_repaired} of {self.fields_checked} fields repaired locally "
+            f"({self.fields_repaired / self.fields_checked if self.fields_checked else 0.0:.0%}), "
+            f"{self.fields_reasked} re-asked in {self.reasks} calls ({self.fields_recovered} recovered), "
+            f"{self.fields_dropped} dropped, ~{self.tokens_saved} tokens saved over whole reruns"
+        )
+
+
+def _index(fields: Optional[List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Expected fields by each of their identifiers."""
+    index = {}
+    for field in fields or []:
+        for key in IDENTIFIER_KEYS:
+            if field.get(key):
+                index.setdefault(str(field[key]), field)
+    return index
+
+
+def _lookup(index: Dict[str, Dict[str, Any]], field: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(field, dict):
+        return None
+    for key in IDENTIFIER_KEYS:
+        if field.get(key) and str(field[key]) in index:
+            return index[str(field[key])]
+    return None
+
+
+def _missing(index: Dict[str, Dict[str, Any]], seen: set) -> List[Dict[str, Any]]:
+    missing = {}
+    for field in index.values():
+        if id(field) not in seen:
+            missing[id(field)] = field
+    return list(missing.values())
+
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from scraping.exceptions import ScrapException
+from scraping.job_queue import EXTRACTED, FILLED, SUBMITTING
+from tracing.tracer import traced
+
+# Snapshot of the form's current step: the HTML with the hidden step blocks removed, the hidden
+# blocks that come after the current step (later steps already in the DOM) and the names of the
+# current step's controls. Only a hidden container holding several controls counts as a step;
+# an individually hidden control (a styled file input, radio or checkbox) stays in the step.
+STEP_SNAPSHOT = """
+(form) => {
+    const rendered = (element) => {
+        const style = window.getComputedStyle(element);
+        return !element.hidden && style.display !== "none" && style.visibility !== "hidden";
+    };
+    const controls = "input:not([type=hidden]):not([type=submit]):not([type=button]), select, textarea";
+    const isStep = (element) => {
+        const names = new Set(
+            Array.from(element.querySelectorAll(controls)).map((control) => control.name || control.id || control)
+        );
+        return names.size > 1;
+    };
+    const hidden = [];
+    const paths = [];
+    let current = false;
+    const walk = (element, path) => {
+        Array.from(element.children).forEach((child, index) => {
+            if (child.matches(controls)) {
+                current = true;
+                return;
+            }
+            if (!child.querySelector(controls)) return;
+            if (!rendered(child) && isStep(child)) {
+                // Steps before the current one are dropped too, but are not later steps.
+                if (current) hidden.push(child.outerHTML);
+                paths.push(path.concat(index));
+            } else {
+                walk(child, path.concat(index));
+            }
+        });
+    };
+    walk(form, []);
+
+    const clone = form.cloneNode(true);
+    for (const path of paths.reverse()) {
+        let node = clone;
+        for (const index of path) node = node.children[index];
+        node.remove();
+    }
+    const signature = Array.from(clone.querySelectorAll(controls))
+        .map((element) => element.name || element.id)
+        .filter(Boolean);
+    return { html: clone.innerHTML, hidden, signature: Array.from(new Set(signature)).sort() };
+}
+"""
+
+
+async def chain_fields(fields: List[dict], stream: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    """Yields the locally filled fields first, then the ones streamed from the LLM."""
+    for field in fields:
+        yield field
+    async for field in stream:
+        yield field
+
+
+async def collect_fields(fields: AsyncIterator[dict], into: List[dict]) -> AsyncIterator[dict]:
+    """Passes fields through, keeping a copy so the step can be checkpointed once filled."""
+    async for field in fields:
+        into.append(field)
+        yield field
+
+
+async def prepare_input_values(scrap_service, html_form: str, user_meta_data: dict, stream: bool = True, single_call: bool = False):
+    """
+    Turns a step's form HTML into filled fields: a list, or an async iterator with `stream`.
+
+    Standard profile fields (name, email, phone...) and custom questions answered on earlier
+    applications are filled locally; only the rest is sent to the LLM, and its answers are
+    added to the answer bank. With `single_call`, a form that is neither cached nor extractable
+    locally is detected and filled in one EXTRACT_AND_FILL call instead of two. LLM answers are
+    validated and repaired field by field (see FieldValidator), so a malformed answer costs a
+    small re-ask rather than the application.
+
+    Raises:
+        ScrapException: When a stage returns nothing usable.
+    """
+    openai_service = scrap_service.openai_service
+    html_form = await scrap_service.prune_form(html_form)
+    input_fields_response_text = await scrap_service.get_input_fields(form=html_form, allow_llm=not single_call)
+
+    if input_fields_response_text is None and single_call:
+        if stream:
+            return scrap_service.remember_answers_stream(
+                scrap_service.extract_and_fill_values_stream(form=html_form, user_meta_data=user_meta_data)
+            )
+        input_value_response_text = await scrap_service.extract_and_fill_values(form=html_form, user_meta_data=user_meta_data)
+        if not input_value_response_text:
+            raise ScrapException(stage="extract_and_fill_values", message="No input values generated.")
+        input_values = json.loads(input_value_response_text)["fields"]
+        scrap_service.remember_answers(input_values)
+        return input_values
+
+    if not input_fields_response_text:
+        raise ScrapException(stage="get_input_fields", message="No input fields extracted.")
+
+    local_values, input_fields_response_text = scrap_service.fill_locally(
+        input_fields=input_fields_response_text, user_meta_data=user_meta_data
+    )
+    if input_fields_response_text is None:
+        return local_values
+    if stream:
+        return chain_fields(
+            local_values,
+            scrap_service.remember_answers_stream(
+                scrap_service.validate_input_values_stream(
+                    scrap_service.get_input_values_stream(input_fields=input_fields_response_text, user_meta_data=user_meta_data),
+                    input_fields=input_fields_response_text,
+                    user_meta_data=user_meta_data,
+                )
+            ),
+        )
+
+    input_value_response = await scrap_service.get_input_values(
+        input_fields=input_fields_response_text, user_meta_data=user_meta_data
+    )
+    if input_value_response is None:
+        raise ScrapException(stage="get_input_values", message="No input values generated.")
+    llm_values = await scrap_service.validate_input_values(
+        openai_service.get_response_text_from_response(response=input_value_response),
+        input_fields=input_fields_response_text,
+        user_meta_data=user_meta_data,
+    )
+    scrap_service.remember_answers(llm_values)
+    return local_values + llm_values
+
+
+class FlowCheckpointStore:
+    """
+    Filled values of every completed step, per application, in SQLite.
+
+    A retried application replays its checkpointed steps from the stored values (no LLM call)
+    and picks up the real work at the step that failed. Checkpoints are cleared on submission.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("FLOW_CHECKPOINT_PATH", ".cache/flow_checkpoints.sqlite3")
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS flow_checkpoints (
+                application_id TEXT NOT NULL,
+                step INTEGER NOT NULL,
+                signature TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (application_id, step)
+            )
+            """
+        )
+        self._connection.commit()
+
+    def load(self, application_id: str) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT step, signature, fields FROM flow_checkpoints WHERE application_id = ? ORDER BY step",
+                (application_id,),
+            ).fetchall()
+        return {step: {"signature": json.loads(signature), "fields": json.loads(fields)} for step, signature, fields in rows}
+
+    def save(self, application_id: str, step: int, signature: List[str], fields: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO flow_checkpoints (application_id, step, signature, fields, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (application_id, step, json.dumps(signature), json.dumps(fields), time.time()),
+            )
+            self._connection.commit()
+
+    def clear(self, application_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM flow_checkpoints WHERE application_id = ?", (application_id,))
+            self._connection.commit()
+
+    def advance(self, application_id: str, state: str) -> None:
+        """Called as the application reaches a stage; the JobQueue, also a checkpoint store, records it."""
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class ApplicationFlow:
+    """
+    Runs extract → fill → advance for every step of an application form.
+
+    A step ends at a "next" button inside the form (see the `next_step` selectors); the last
+    step is submitted.
+    When the next step is already in the DOM, hidden, its extraction and filling are started
+    while the current step is being typed, and used if the step that shows up has the same
+    controls. Each filled step is checkpointed in a FlowCheckpointStore (or the JobQueue).
+    """
+
+    def __init__(self, scrap_service, user_meta_data: dict, stream: bool = True, single_call: bool = False, checkpoints: FlowCheckpointStore = None):
+        self.scrap_service = scrap_service
+        self.user_meta_data = user_meta_data
+        self.stream = stream
+        self.single_call = single_call
+        self.checkpoints = checkpoints or FlowCheckpointStore()
+        self.max_steps = int(os.getenv("FLOW_MAX_STEPS", "10"))
+        self.step_timeout = float(os.getenv("FLOW_STEP_TIMEOUT", "15"))
+        self.prefetch_hits = 0
+
+    async def run(self, form) -> None:
+        """Fills and advances through every step, then submits. Raises ScrapException on a stuck step."""
+        scrap_service = self.scrap_service
+        application_id = scrap_service.application_id
+        checkpoints = self.checkpoints.load(application_id) if application_id else {}
+        prefetch = None
+
+        try:
+            for step in range(self.max_steps):
+                snapshot = await form.evaluate(STEP_SNAPSHOT)
+                signature = snapshot["signature"]
+                # Only the form's own buttons count; a "Continue" in a banner or modal is not a step.
+                next_step_selector = await scrap_service.selector_resolver.resolve(
+                    scrap_service.page, scrap_service.domain, "next_step", root=form
+                )
+
+                if signature:
+                    input_values = await self._input_values(step, snapshot, checkpoints.get(step), prefetch)
+                    prefetch = None
+                    if application_id:
+                        self.checkpoints.advance(application_id, EXTRACTED)
+                    if next_step_selector and snapshot["hidden"]:
+                        prefetch = asyncio.create_task(self._prefetch(f"<form>{snapshot['hidden'][0]}</form>"))
+
+                    filled = []
+                    if hasattr(input_values, "__aiter__"):
+                        input_values = collect_fields(input_values, filled)
+                    else:
+                        filled = list(input_values)
+                    if not await scrap_service.fill_values(input_fields_and_values=input_values, submit=False):
+                        raise ScrapException(stage="fill_values", message=f"Step {step + 1} could not be filled.")
+                    if application_id:
+                        self.checkpoints.save(application_id, step, signature, filled)
+
+                if next_step_selector is None:
+                    if application_id:
+                        self.checkpoints.advance(application_id, FILLED)
+                        # Recorded before the click: a failure from here on is not retried.
+                        self.checkpoints.advance(application_id, SUBMITTING)
+                    if not await scrap_service.submit_form():
+                        raise ScrapException(stage="submit_form", message="Form could not be submitted.")
+                    if application_id:
+                        self.checkpoints.clear(application_id)
+                    logging.info(f"Submitted after {step + 1} step(s) ({self.prefetch_hits} prefetched).")
+                    return
+
+                await self._advance(form, next_step_selector, signature)
+        finally:
+            if prefetch is not None and not prefetch.done():
+                prefetch.cancel()
+
+        raise ScrapException(stage="advance", message=f"Gave up after {self.max_steps} steps.")
+
+    @traced("flow.input_values", lambda self, step, *args: {"step": step + 1})
+    async def _input_values(self, step: int, snapshot: dict, checkpoint: Optional[dict], prefetch: Optional[asyncio.Task]):
+        signature = snapshot["signature"]
+        if checkpoint and checkpoint["signature"] == signature:
+            logging.info(f"Step {step + 1}: replaying checkpointed values.")
+            if prefetch:
+                prefetch.cancel()
+            return checkpoint["fields"]
+        if prefetch:
+            try:
+                fields = await prefetch
+            except Exception as e:
+                logging.error(f"Error prefetching step {step + 1}: {e}")
+                fields = None
+            if fields and self._covers(fields, signature):
+                self.prefetch_hits += 1
+                logging.info(f"Step {step + 1}: using prefetched values.")
+                return fields
+        return await prepare_input_values(
+            self.scrap_service, snapshot["html"], self.user_meta_data, stream=self.stream, single_call=self.single_call
+        )
+
+    @traced("flow.prefetch")
+    async def _prefetch(self, html_form: str) -> List[dict]:
+        """Prepares the next step's values as a list; streaming only helps once the fields can be typed."""
+        return await prepare_input_values(
+            self.scrap_service, html_form, self.user_meta_data, stream=False, single_call=self.single_call
+        )
+
+    @staticmethod
+    def _covers(fields: List[dict], signature: List[str]) -> bool:
+        names = {field.get("name") or field.get("id") for field in fields}
+        return set(signature) == names
+
+    @traced("flow.advance")
+    async def _advance(self, form, next_step_selector: str, signature: List[str]) -> None:
+        """Clicks "next" and waits until the form shows different controls."""
+        await form.locator(next_step_selector).first.click()
+        deadline = time.monotonic() + self.step_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            snapshot = await form.evaluate(STEP_SNAPSHOT)
+            if snapshot["signature"] != signature:
+                return
+        raise ScrapException(stage="advance", message="The form did not move to the next step (validation error?).")
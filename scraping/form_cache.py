@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+# Generated ids such as `input_files_input_sEkka66gsNk57aIo` change on every page load.
+VOLATILE_TOKEN = re.compile(r"(?=[A-Za-z0-9]*\d)(?=[A-Za-z0-9]*[A-Za-z])[A-Za-z0-9]{12,}")
+FINGERPRINT_TAGS = ["form", "fieldset", "input", "select", "option", "textarea", "label", "legend", "button"]
+FINGERPRINT_ATTRIBUTES = ("type", "name", "data-ui", "value", "role", "required", "aria-required")
+
+
+def _normalize(value: str) -> str:
+    return VOLATILE_TOKEN.sub("*", value)
+
+
+def form_fingerprint(html_form: str) -> str:
+    """
+    Structural hash of a form: the tag/attribute skeleton of its controls, field names
+    and option values. Text, classes, styles and generated ids are left out so the same
+    layout rendered twice hashes to the same key.
+    """
+    soup = BeautifulSoup(html_form, "html.parser")
+    skeleton = []
+    for element in soup.find_all(FINGERPRINT_TAGS):
+        attributes = []
+        for attribute in FINGERPRINT_ATTRIBUTES:
+            if not element.has_attr(attribute):
+                continue
+            # Typed-in values differ per visit; only option values describe the layout.
+            if attribute == "value" and element.name != "option" and element.get("type") not in ("radio", "checkbox"):
+                continue
+            value = element.get(attribute)
+            value = " ".join(value) if isinstance(value, list) else value
+            attributes.append(f"{attribute}={_normalize(value)}")
+        skeleton.append(f"{element.name}[{','.join(attributes)}]")
+    return hashlib.sha256("|".join(skeleton).encode("utf-8")).hexdigest()
+
+
+class FormSchemaCache:
+    """
+    Persistent cache of extracted form fields, keyed by `form_fingerprint`.
+
+    Entries live in SQLite, expire after `ttl_seconds` and the least recently used
+    ones are evicted once more than `max_entries` are stored.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None, ttl_seconds: float = None):
+        self.path = path or os.getenv("FORM_CACHE_PATH", ".cache/form_schema.sqlite3")
+        self.max_entries = max_entries or int(os.getenv("FORM_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("FORM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS form_schema (
+                fingerprint TEXT PRIMARY KEY,
+                fields TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS form_schema_last_used_at ON form_schema (last_used_at)"
+        )
+        self._connection.commit()
+
+    def get(self, fingerprint: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fields, created_at FROM form_schema WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._connection.execute("DELETE FROM form_schema WHERE fingerprint = ?", (fingerprint,))
+                    self._connection.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE form_schema SET last_used_at = ?, hit_count = hit_count + 1 WHERE fingerprint = ?",
+                (now, fingerprint),
+            )
+            self._connection.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, fingerprint: str, fields: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        # Only the schema is cached; values belong to a single application.
+        schema = [{key: value for key, value in field.items() if key != "value"} for field in fields]
+        with self._lock:
+            self._connection.execute(
+                """
+                INSERT INTO form_schema (fingerprint, fields, created_at, last_used_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    fields = excluded.fields, created_at = excluded.created_at, last_used_at = excluded.last_used_at
+                """,
+                (fingerprint, json.dumps(schema), now, now),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        expired = self._connection.execute(
+            "DELETE FROM form_schema WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        overflow = self._connection.execute(
+            """
+            DELETE FROM form_schema WHERE fingerprint IN (
+                SELECT fingerprint FROM form_schema ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        ).rowcount
+        self.evictions += expired + overflow
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._connection.execute("SELECT COUNT(*) FROM form_schema").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": size,
+        }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logging.info(
+            f"Form schema cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['size']} entries, {stats['evictions']} evicted"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
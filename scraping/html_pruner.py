@@ -0,0 +1,75 @@
+import logging
+import re
+
+from bs4 import BeautifulSoup, Comment, NavigableString
+
+from openaiapp.tokens import estimate_tokens
+
+DROPPED_TAGS = [
+    "script", "style", "svg", "noscript", "template", "iframe", "img", "picture",
+    "video", "audio", "canvas", "link", "meta",
+]
+FORM_CONTROL_TAGS = ["input", "select", "textarea", "option", "button"]
+KEPT_ATTRIBUTES = {
+    "id", "name", "type", "value", "for", "data-ui", "role", "required", "aria-required",
+    "aria-label", "aria-labelledby", "placeholder", "checked", "selected", "multiple", "accept",
+}
+HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+
+
+def _is_hidden(element) -> bool:
+    return element.has_attr("hidden") or bool(HIDDEN_STYLE.search(element.get("style", "")))
+
+
+def prune_form_html(html_form: str) -> str:
+    """
+    Strips form HTML down to what field detection needs.
+
+    Scripts, styles, SVG icons and media are removed, hidden scaffolding without form
+    controls is dropped, every attribute except identifiers and form semantics is
+    stripped, attribute-less wrapper divs are unwrapped and whitespace is collapsed.
+    Form controls and label/legend text are always kept.
+    """
+    soup = BeautifulSoup(html_form, "html.parser")
+
+    for element in soup.find_all(DROPPED_TAGS):
+        element.decompose()
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+
+    for element in soup.find_all(True):
+        if element.decomposed:
+            continue
+        if element.name not in FORM_CONTROL_TAGS and _is_hidden(element) and not element.find(FORM_CONTROL_TAGS):
+            element.decompose()
+
+    for element in soup.find_all(True):
+        element.attrs = {key: value for key, value in element.attrs.items() if key in KEPT_ATTRIBUTES}
+
+    for element in soup.find_all("div"):
+        if not element.attrs:
+            element.unwrap()
+
+    for text in soup.find_all(string=True):
+        collapsed = " ".join(text.split())
+        if collapsed:
+            text.replace_with(NavigableString(collapsed))
+        else:
+            text.extract()
+
+    for element in soup.find_all(True):
+        if element.name not in FORM_CONTROL_TAGS and not element.attrs and not element.find(True) and not element.get_text(strip=True):
+            element.decompose()
+
+    return str(soup)
+
+
+def log_pruning(original: str, pruned: str) -> None:
+    original_bytes, pruned_bytes = len(original.encode("utf-8")), len(pruned.encode("utf-8"))
+    original_tokens, pruned_tokens = estimate_tokens(original), estimate_tokens(pruned)
+    logging.info(
+        f"Pruned form HTML from {original_bytes} to {pruned_bytes} bytes, "
+        f"{original_tokens} to {pruned_tokens} tokens "
+        f"({1 - pruned_tokens / original_tokens if original_tokens else 0:.0%} fewer tokens)"
+    )
+
@@ -0,0 +1,346 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+# Job states, in the order an application goes through them.
+QUEUED = "queued"
+NAVIGATING = "navigating"
+EXTRACTED = "extracted"
+FILLED = "filled"
+# Set right before the submit click: from here on a failure may follow a real submission.
+SUBMITTING = "submitting"
+SUBMITTED = "submitted"
+# Failed or interrupted after SUBMITTING; never retried automatically, someone has to check.
+REVIEW = "review"
+FAILED = "failed"
+STATES = [QUEUED, NAVIGATING, EXTRACTED, FILLED, SUBMITTING, SUBMITTED, REVIEW, FAILED]
+FINISHED_STATES = (SUBMITTED, REVIEW, FAILED)
+
+
+def normalize_url(url: str) -> str:
+    """Dedup key of a job URL: case-insensitive host, no query, fragment, trailing slash or `/apply`."""
+    parsed = urlparse(url.strip())
+    path = parsed.path.rstrip("/")
+    if path.endswith("/apply"):
+        path = path[: -len("/apply")]
+    return f"{parsed.scheme.lower()}://{parsed.netloc.lower()}{path}"
+
+
+@dataclass
+class Job:
+    id: int
+    url: str
+    state: str
+    attempts: int
+    last_error: Optional[str] = None
+
+
+class JobQueue:
+    """
+    Durable queue of applications in SQLite, safe to share between worker processes.
+
+    A job is claimed atomically (BEGIN IMMEDIATE) and carries its state, attempt count and
+    last error. A failed attempt is retried after a jittered exponential backoff until
+    `max_attempts`; a claim that is not finished within `lease_seconds` (the worker died) can
+    be claimed again. Submitted URLs go into an `applied` table with the normalized URL as
+    primary key, so a URL already applied to is never queued again. A job that fails (or whose
+    worker dies) after reaching SUBMITTING may already have been submitted, so it is never
+    retried: it goes to REVIEW, and its URL counts as applied until someone checks it.
+
+    Stage artifacts are kept per job until it is submitted: the fields extracted for each
+    form layout and the values filled into each step (the queue is the ApplicationFlow's
+    checkpoint store), so a retry resumes without paying for the LLM calls again.
+    """
+
+    def __init__(self, path: str = None, max_attempts: int = None, backoff_base: float = None, backoff_max: float = None, lease_seconds: float = None):
+        self.path = path or os.getenv("JOB_QUEUE_PATH", ".cache/job_queue.sqlite3")
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.backoff_base = backoff_base or float(os.getenv("JOB_BACKOFF_BASE", "30"))
+        self.backoff_max = backoff_max or float(os.getenv("JOB_BACKOFF_MAX", "900"))
+        self.lease_seconds = lease_seconds or float(os.getenv("JOB_LEASE_SECONDS", "900"))
+        self.duplicates = 0
+        self.retries = 0
+        self.reviews = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit; claims open their own IMMEDIATE transaction.
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                url_key TEXT NOT NULL UNIQUE,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (state, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS applied (
+                url_key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                applied_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS artifacts (
+                application_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                content TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (application_id, name)
+            );
+            """
+        )
+
+    def enqueue(self, urls: Iterable[str]) -> int:
+        """Queues URLs not applied to or queued yet; returns how many were added."""
+        added = 0
+        now = time.time()
+        with self._lock:
+            for url in urls:
+                url_key = normalize_url(url)
+                if self._is_applied(url_key):
+                    self.duplicates += 1
+                    logging.info(f"Already applied to {url}, not queueing it.")
+                    continue
+                cursor = self._connection.execute(
+                    "INSERT OR IGNORE INTO jobs (url, url_key, state, next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, url_key, QUEUED, now, now, now),
+                )
+                added += cursor.rowcount
+        return added
+
+    def _is_applied(self, url_key: str) -> bool:
+        return self._connection.execute("SELECT 1 FROM applied WHERE url_key = ?", (url_key,)).fetchone() is not None
+
+    def is_applied(self, url: str) -> bool:
+        with self._lock:
+            return self._is_applied(normalize_url(url))
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """Takes the next due job for `worker_id`, or returns None when none is due."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._connection.execute(
+                        f"""
+                        SELECT id, url, url_key, state, attempts, last_error FROM jobs
+                        WHERE state NOT IN ({", ".join("?" * len(FINISHED_STATES))}) AND next_attempt_at <= ?
+                          AND (claimed_by IS NULL OR claimed_at < ?)
+                        ORDER BY next_attempt_at, id LIMIT 1
+                        """,
+                        (*FINISHED_STATES, now, now - self.lease_seconds),
+                    ).fetchone()
+                    if row is None:
+                        self._connection.execute("COMMIT")
+                        return None
+                    job_id, url, url_key, state, attempts, last_error = row
+                    if state == SUBMITTING:
+                        # Its worker died mid-submit; the application may have gone through.
+                        self._mark_for_review(job_id, url, last_error or "interrupted while submitting", now)
+                        continue
+                    if not self._is_applied(url_key):
+                        break
+                    # Applied to by another process since it was queued.
+                    self._connection.execute(
+                        "UPDATE jobs SET state = ?, claimed_by = NULL, updated_at = ? WHERE id = ?", (SUBMITTED, now, job_id)
+                    )
+                    self.duplicates += 1
+                state = NAVIGATING if state == QUEUED else state
+                self._connection.execute(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, claimed_by = ?, claimed_at = ?, updated_at = ? WHERE id = ?",
+                    (state, worker_id, now, now, job_id),
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return Job(id=job_id, url=url, state=state, attempts=attempts + 1, last_error=last_error)
+
+    def next_retry_in(self) -> Optional[float]:
+        """
+        Seconds until the next unclaimed unfinished job is due (0 if one is due now), or None
+        when there is none. Jobs claimed by a live worker are that worker's to retry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                f"""
+                SELECT MIN(next_attempt_at) FROM jobs
+                WHERE state NOT IN ({", ".join("?" * len(FINISHED_STATES))}) AND (claimed_by IS NULL OR claimed_at < ?)
+                """,
+                (*FINISHED_STATES, now - self.lease_seconds),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return max(0.0, row[0] - now)
+
+    def _set_state(self, url: str, state: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                f"UPDATE jobs SET state = ?, updated_at = ? WHERE url = ? AND state NOT IN ({', '.join('?' * len(FINISHED_STATES))})",
+                (state, time.time(), url, *FINISHED_STATES),
+            )
+
+    def complete(self, job: Job) -> None:
+        """Marks the job submitted, records the URL as applied and drops its artifacts."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.execute(
+                "UPDATE jobs SET state = ?, claimed_by = NULL, last_error = NULL, updated_at = ? WHERE id = ?", (SUBMITTED, now, job.id)
+            )
+            self._connection.execute(
+                "INSERT OR IGNORE INTO applied (url_key, url, applied_at) VALUES (?, ?, ?)", (normalize_url(job.url), job.url, now)
+            )
+            self._connection.execute("DELETE FROM artifacts WHERE application_id = ?", (job.url,))
+            self._connection.execute("COMMIT")
+
+    def _mark_for_review(self, job_id: int, url: str, error: str, now: float) -> None:
+        """Moves a job that may have been submitted to REVIEW; call with the lock held."""
+        self._connection.execute(
+            "UPDATE jobs SET state = ?, last_error = ?, claimed_by = NULL, updated_at = ? WHERE id = ?",
+            (REVIEW, error, now, job_id),
+        )
+        self._connection.execute(
+            "INSERT OR IGNORE INTO applied (url_key, url, applied_at) VALUES (?, ?, ?)", (normalize_url(url), url, now)
+        )
+        self.reviews += 1
+        logging.error(f"{url} failed after the submit click, not retrying; check it by hand: {error}")
+
+    def fail(self, job: Job, error: str) -> None:
+        """
+        Schedules a retry with backoff, or marks the job failed after `max_attempts`. A job that
+        had reached SUBMITTING goes to REVIEW instead: retrying could submit it a second time.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT state FROM jobs WHERE id = ?", (job.id,)).fetchone()
+            if row is not None and row[0] == SUBMITTING:
+                self._mark_for_review(job.id, job.url, error, now)
+                return
+        if job.attempts >= self.max_attempts:
+            state, next_attempt_at = FAILED, now
+            logging.error(f"Giving up on {job.url} after {job.attempts} attempts: {error}")
+        else:
+            delay = random.uniform(0.5, 1.0) * min(self.backoff_max, self.backoff_base * 2 ** (job.attempts - 1))
+            state, next_attempt_at = None, now + delay
+            self.retries += 1
+            logging.warning(f"Attempt {job.attempts}/{self.max_attempts} for {job.url} failed, retrying in {delay:.0f}s: {error}")
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET state = COALESCE(?, state), last_error = ?, next_attempt_at = ?, claimed_by = NULL, updated_at = ? WHERE id = ?",
+                (state, error, next_attempt_at, now, job.id),
+            )
+
+    def release_claims(self) -> int:
+        """Frees every claim, for restarting after a crash when no other worker is running."""
+        with self._lock:
+            return self._connection.execute("UPDATE jobs SET claimed_by = NULL WHERE claimed_by IS NOT NULL").rowcount
+
+    def retry_failed(self) -> int:
+        """Queues failed jobs again with a fresh attempt count."""
+        with self._lock:
+            return self._connection.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, next_attempt_at = ?, updated_at = ? WHERE state = ?",
+                (QUEUED, time.time(), time.time(), FAILED),
+            ).rowcount
+
+    # Artifacts
+
+    def save_artifact(self, application_id: str, name: str, content: Any) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO artifacts (application_id, name, content, updated_at) VALUES (?, ?, ?, ?)",
+                (application_id, name, json.dumps(content), time.time()),
+            )
+
+    def load_artifact(self, application_id: str, name: str) -> Any:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT content FROM artifacts WHERE application_id = ? AND name = ?", (application_id, name)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ApplicationFlow checkpoint store interface (see scraping/flow.py FlowCheckpointStore).
+
+    def load(self, application_id: str) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT name, content FROM artifacts WHERE application_id = ? AND name LIKE 'step:%'", (application_id,)
+            ).fetchall()
+        return {int(name.split(":", 1)[1]): json.loads(content) for name, content in rows}
+
+    def save(self, application_id: str, step: int, signature: List[str], fields: List[Dict[str, Any]]) -> None:
+        self.save_artifact(application_id, f"step:{step}", {"signature": signature, "fields": fields})
+
+    def clear(self, application_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM artifacts WHERE application_id = ? AND name LIKE 'step:%'", (application_id,))
+
+    def advance(self, application_id: str, state: str) -> None:
+        self._set_state(application_id, state)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def failed_jobs(self, state: str = FAILED) -> List[Job]:
+        """Jobs in `state`: FAILED, or REVIEW for the ones that failed after the submit click."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, url, state, attempts, last_error FROM jobs WHERE state = ? ORDER BY updated_at", (state,)
+            ).fetchall()
+        return [Job(*row) for row in rows]
+
+    def log_stats(self) -> None:
+        counts = self.counts()
+        logging.info(
+            "Job queue: " + ", ".join(f"{count} {state}" for state, count in counts.items())
+            + f"; {self.retries} retries scheduled, {self.reviews} sent to review, {self.duplicates} duplicate URLs skipped"
+        )
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Inspect or repair the application job queue.")
+    parser.add_argument("--path", help="Defaults to JOB_QUEUE_PATH.")
+    parser.add_argument("--release", action="store_true", help="Free claims left by a crashed run.")
+    parser.add_argument("--retry-failed", action="store_true", help="Queue failed jobs again.")
+    args = parser.parse_args()
+
+    queue = JobQueue(path=args.path)
+    if args.release:
+        print(f"Released {queue.release_claims()} claims.")
+    if args.retry_failed:
+        print(f"Queued {queue.retry_failed()} failed jobs again.")
+    for state, count in queue.counts().items():
+        print(f"{state:<12} {count:>6}")
+    for job in queue.failed_jobs():
+        print(f"failed after {job.attempts} attempts: {job.url}: {job.last_error}")
+    for job in queue.failed_jobs(REVIEW):
+        print(f"check by hand, may have been submitted: {job.url}: {job.last_error}")
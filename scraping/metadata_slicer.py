@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sys
+from typing import Any, Dict, List, Set
+
+from openaiapp.tokens import estimate_tokens
+
+# Words in a field's label, name or options that make a profile section relevant to it.
+SECTION_KEYWORDS = {
+    "name": ["name", "signature", "sign", "first", "last", "preferred"],
+    "contact_information": [
+        "email", "phone", "mobile", "address", "city", "state", "country", "zip", "postal", "location",
+        "linkedin", "relocat", "office", "commut", "authoriz", "authoris", "visa", "sponsor", "reside",
+        "based", "onsite", "on-site", "hybrid", "remote", "timezone", "time zone", "citizen",
+    ],
+    "years_of_experience": ["year", "experience", "senior"],
+    "experience": [
+        "experience", "employer", "company", "worked", "previous", "current", "title", "role",
+        "responsibilit", "manag", "lead", "summary", "background", "achievement", "notice",
+    ],
+    "skills": ["skill", "tool", "proficien", "familiar", "technolog", "knowledge", "software", "stack", "expert"],
+    "education": ["degree", "education", "university", "college", "school", "gpa", "graduat", "study", "major", "bachelor", "master", "phd"],
+    "certifications": ["certif", "licen", "credential"],
+    "projects": ["project", "portfolio", "github", "website"],
+    "languages": ["language", "speak", "fluen", "english"],
+    "industries": ["industr", "sector", "domain", "saas", "b2b", "e-commerce"],
+    "relevant_job_titles": ["title", "role", "seniority", "level"],
+    "user_salary": ["salary", "compensation", "pay", "expect", "rate", "ctc", "remuneration", "usd", "eur"],
+}
+# Open questions ("Summary", "Why do you want to join us?") draw on the whole career.
+FREE_TEXT_SECTIONS = ["name", "experience", "skills", "education", "certifications", "industries", "years_of_experience"]
+FREE_TEXT_TYPES = ("textarea",)
+
+
+def _field_text(field: Dict[str, Any]) -> str:
+    parts = [field.get("label"), field.get("name"), field.get("data-ui"), field.get("id")]
+    parts += [option.get("label") for option in field.get("options") or []]
+    return " ".join(str(part) for part in parts if part).lower().replace("_", " ")
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+class MetadataSlicer:
+    """
+    Sends the fill prompt only the parts of user_metadata.json that the fields can need.
+
+    The profile is indexed once by top-level section: each section is keyed by the words in
+    SECTION_KEYWORDS plus the words of its own (and its nested) key names. A field pulls in
+    every section with a keyword in its label, name or options; textareas pull in the whole
+    career. Sections without an entry in SECTION_KEYWORDS are always kept, so a profile key
+    added later is never silently dropped.
+    """
+
+    def __init__(self, user_meta_data: Dict[str, Any]):
+        self.user_meta_data = user_meta_data
+        self.full_tokens = estimate_tokens(json.dumps(user_meta_data))
+        self.sections = {key: value for key, value in user_meta_data.items() if not _is_empty(value)}
+        self.keywords = {key: self._keywords_for(key, value) for key, value in self.sections.items()}
+        self.always = {key for key in self.sections if key not in SECTION_KEYWORDS}
+        self.tokens_sent = 0
+        self.tokens_full = 0
+
+    @staticmethod
+    def _keywords_for(key: str, value: Any) -> Set[str]:
+        keywords = set(SECTION_KEYWORDS.get(key, []))
+        names = [key] + (list(value.keys()) if isinstance(value, dict) else [])
+        for name in names:
+            keywords.update(word for word in re.split(r"[_\W]+", name.lower()) if len(word) > 2)
+        return keywords
+
+    def sections_for(self, fields: List[Dict[str, Any]]) -> List[str]:
+        needed = set(self.always)
+        for field in fields:
+            if field.get("type") in FREE_TEXT_TYPES:
+                needed.update(section for section in FREE_TEXT_SECTIONS if section in self.sections)
+            text = _field_text(field)
+            needed.update(key for key, keywords in self.keywords.items() if any(keyword in text for keyword in keywords))
+        # Keep the profile's own key order so the prompt reads the same as the full dump.
+        return [key for key in self.sections if key in needed]
+
+    def slice(self, fields: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {key: self.sections[key] for key in self.sections_for(fields)}
+
+    def dumps(self, fields: List[Dict[str, Any]]) -> str:
+        """JSON of the sliced profile, counting the tokens saved against the full dump."""
+        sliced = json.dumps(self.slice(fields))
+        self.tokens_sent += estimate_tokens(sliced)
+        self.tokens_full += self.full_tokens
+        return sliced
+
+    def log_stats(self) -> None:
+        saved = self.tokens_full - self.tokens_sent
+        logging.info(
+            f"Metadata slicer: {self.tokens_sent} profile tokens sent instead of {self.tokens_full} "
+            f"({saved} saved, {saved / self.tokens_full if self.tokens_full else 0.0:.0%})"
+        )
+
+
+def _leaves(value: Any) -> List[str]:
+    if isinstance(value, dict):
+        return [leaf for item in value.values() for leaf in _leaves(item)]
+    if isinstance(value, list):
+        return [leaf for item in value for leaf in _leaves(item)]
+    return [] if value is None else [" ".join(str(value).lower().split())]
+
+
+async def compare_fills(paths, user_meta_data_path: str = "user_metadata.json") -> bool:
+    """Runs FILL_VALUE_IN_FIELD with the full and the sliced profile and compares the values."""
+    from benchmarks.common import load_samples, normalize_value
+    from openaiapp.clients import close_async_clients
+    from openaiapp.constants import LlmPromptTypes
+    from openaiapp.service import AsyncOpenAIService
+    from scraping.extractor import FormFieldExtractor
+
+    with open(user_meta_data_path, "r") as file:
+        user_meta_data = json.load(file)
+    slicer = MetadataSlicer(user_meta_data)
+    openai_service = AsyncOpenAIService()
+    same = True
+    for path in paths:
+        for sample in load_samples(path):
+            fields = FormFieldExtractor().extract(sample["html_form"]).fields
+            values = {}
+            for variant, profile in (("full", json.dumps(user_meta_data)), ("sliced", slicer.dumps(fields))):
+                response = await openai_service.generate(
+                    prompt_type=LlmPromptTypes.FILL_VALUE_IN_FIELD,
+                    prompt_variables={"input_fields": json.dumps({"fields": fields}), "user_meta_data": profile},
+                )
+                filled = json.loads(openai_service.get_response_text_from_response(response))["fields"]
+                values[variant] = [normalize_value(field.get("value")) for field in filled]
+            if values["full"] != values["sliced"]:
+                same = False
+                logging.error(f"{sample['name']}: fill differs\nfull: {values['full']}\nsliced: {values['sliced']}")
+            else:
+                logging.info(f"{sample['name']}: same {len(values['full'])} values with the sliced profile.")
+    slicer.log_stats()
+    await close_async_clients()
+    return same
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Compare real fills with the full and the sliced profile.")
+    parser.add_argument("paths", nargs="+", help="Saved form HTML files, e.g. samples/forms/*.html")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(compare_fills(args.paths)) else 1)
@@ -0,0 +1,124 @@
+import fnmatch
+import logging
+import os
+from collections import Counter
+from typing import Iterable, List, Optional
+
+# Rough transfer sizes per blocked resource type, used to estimate bytes saved: a blocked
+# request never reaches the server, so its real size is unknown.
+ESTIMATED_BYTES = {
+    "image": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 80_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+    "other": 5_000,
+}
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = "image,media,font"
+DEFAULT_BLOCKED_URL_PATTERNS = ",".join(
+    [
+        "*google-analytics.com*",
+        "*googletagmanager.com*",
+        "*doubleclick.net*",
+        "*facebook.net*",
+        "*connect.facebook.com*",
+        "*hotjar.com*",
+        "*segment.io*",
+        "*cdn.segment.com*",
+        "*intercom.io*",
+        "*linkedin.com/px*",
+        "*bat.bing.com*",
+        "*clarity.ms*",
+    ]
+)
+# Never block these, whatever the rules above say: the application cannot be submitted without them.
+DEFAULT_ALLOWED_URL_PATTERNS = "*recaptcha*,*hcaptcha*,*challenges.cloudflare.com*"
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class NetworkFilter:
+    """
+    Request interception for a BrowserContext: aborts requests whose resource type or URL is
+    denied, unless the URL matches an allow pattern, and counts what was blocked.
+
+    One instance can be attached to many contexts; counters are shared, so the runner reports
+    totals for a whole run.
+    """
+
+    def __init__(
+        self,
+        blocked_resource_types: Optional[Iterable[str]] = None,
+        blocked_url_patterns: Optional[Iterable[str]] = None,
+        allowed_url_patterns: Optional[Iterable[str]] = None,
+        wait_until: Optional[str] = None,
+        enabled: Optional[bool] = None,
+    ):
+        if blocked_resource_types is None:
+            blocked_resource_types = _split(os.getenv("BLOCK_RESOURCE_TYPES", DEFAULT_BLOCKED_RESOURCE_TYPES))
+        if blocked_url_patterns is None:
+            blocked_url_patterns = _split(os.getenv("BLOCK_URL_PATTERNS", DEFAULT_BLOCKED_URL_PATTERNS))
+        if allowed_url_patterns is None:
+            allowed_url_patterns = _split(os.getenv("ALLOW_URL_PATTERNS", DEFAULT_ALLOWED_URL_PATTERNS))
+        if enabled is None:
+            enabled = os.getenv("NETWORK_FILTER", "true").lower() == "true"
+
+        self.blocked_resource_types = set(blocked_resource_types)
+        self.blocked_url_patterns = list(blocked_url_patterns)
+        self.allowed_url_patterns = list(allowed_url_patterns)
+        # "domcontentloaded" returns as soon as the document is parsed; the service then waits
+        # for the selector it actually needs instead of every image and beacon ("load").
+        self.wait_until = wait_until or os.getenv("NAVIGATION_WAIT_UNTIL", "domcontentloaded")
+        self.enabled = enabled
+        self.allowed = 0
+        self.blocked = Counter()
+        self.bytes_saved = 0
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if any(fnmatch.fnmatch(url, pattern) for pattern in self.allowed_url_patterns):
+            return False
+        if resource_type in self.blocked_resource_types:
+            return True
+        return any(fnmatch.fnmatch(url, pattern) for pattern in self.blocked_url_patterns)
+
+    async def attach(self, context) -> None:
+        """Installs the route handler on a BrowserContext, covering every page opened in it."""
+        if self.enabled:
+            await context.route("**/*", self._handle_route)
+
+    async def _handle_route(self, route) -> None:
+        request = route.request
+        try:
+            if self.should_block(request.resource_type, request.url):
+                self.blocked[request.resource_type] += 1
+                self.bytes_saved += ESTIMATED_BYTES.get(request.resource_type, ESTIMATED_BYTES["other"])
+                await route.abort("blockedbyclient")
+            else:
+                self.allowed += 1
+                await route.continue_()
+        except Exception as e:
+            # The page may have navigated or closed while the request was pending.
+            logging.debug(f"Error routing {request.url}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "blocked": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "estimated_bytes_saved": self.bytes_saved,
+        }
+
+    def log_stats(self) -> None:
+        if not self.enabled:
+            return
+        stats = self.stats()
+        by_type = ", ".join(f"{resource_type}={count}" for resource_type, count in stats["blocked_by_type"].items())
+        logging.info(
+            f"Network filter: {stats['blocked']} requests blocked ({by_type or 'none'}), "
+            f"{stats['allowed']} allowed, ~{stats['estimated_bytes_saved'] / 1_000_000:.1f} MB saved"
+        )
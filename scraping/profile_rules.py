@@ -0,0 +1,200 @@
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+COUNTRY_DIAL_CODES = {
+    "usa": "1",
+    "us": "1",
+    "unitedstates": "1",
+    "unitedstatesofamerica": "1",
+    "canada": "1",
+    "uk": "44",
+    "unitedkingdom": "44",
+    "greatbritain": "44",
+    "ireland": "353",
+    "germany": "49",
+    "france": "33",
+    "spain": "34",
+    "italy": "39",
+    "netherlands": "31",
+    "portugal": "351",
+    "greece": "30",
+    "poland": "48",
+    "sweden": "46",
+    "switzerland": "41",
+    "india": "91",
+    "australia": "61",
+    "newzealand": "64",
+    "singapore": "65",
+    "uae": "971",
+    "unitedarabemirates": "971",
+    "brazil": "55",
+    "mexico": "52",
+}
+
+# Field types the rules may fill. Radios, selects and checkboxes only when a rule value matches an option.
+TEXT_TYPES = ("text", "email", "tel", "textarea", "url", "number")
+
+
+def normalize_key(value: Any) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(value or "").lower())
+
+
+def format_phone(phone: str, country: str) -> Optional[str]:
+    """`dialcode+phonenumber` as the fill prompt asks for, e.g. +15173014578."""
+    if not phone:
+        return None
+    phone = str(phone).strip()
+    digits = re.sub(r"\D", "", phone)
+    if phone.startswith("+"):
+        return f"+{digits}"
+    dial_code = COUNTRY_DIAL_CODES.get(normalize_key(country))
+    if dial_code is None:
+        return digits
+    if digits.startswith("00" + dial_code):
+        return f"+{digits[2:]}"
+    if dial_code != "1":
+        digits = digits.lstrip("0")
+    elif len(digits) == 11 and digits.startswith("1"):
+        return f"+{digits}"
+    return f"+{dial_code}{digits}"
+
+
+def _get(data: Dict[str, Any], path: str) -> Any:
+    for key in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(re.sub(r"[^\d.]", "", str(value)))
+    except ValueError:
+        return None
+
+
+def match_option(value: Any, options: List[Dict[str, Any]]) -> Optional[str]:
+    """Option value equal to `value` (by value or label), or the numeric range containing it ("3-5", "10+")."""
+    wanted = normalize_key(value)
+    for option in options:
+        if wanted in (normalize_key(option.get("value")), normalize_key(option.get("label"))):
+            return option.get("value")
+
+    number = _number(value)
+    if number is None:
+        return None
+    for option in options:
+        text = str(option.get("label") or option.get("value") or "")
+        bounds = re.findall(r"\d+(?:\.\d+)?", text.replace(",", ""))
+        if not bounds:
+            continue
+        low = float(bounds[0])
+        if "+" in text or "more" in text.lower() or "above" in text.lower():
+            if number >= low:
+                return option.get("value")
+        elif len(bounds) >= 2 and low <= number <= float(bounds[1]):
+            return option.get("value")
+        elif ("less" in text.lower() or "under" in text.lower()) and number < low:
+            return option.get("value")
+    return None
+
+
+class ProfileRules:
+    """
+    Deterministic answers for standard profile fields (name, email, phone, address, headline,
+    LinkedIn, resume...) so only custom questions are left for FILL_VALUE_IN_FIELD.
+
+    The alias table is compiled once per profile; a field matches a rule when its normalized
+    `data-ui`, `name`, `id` or label equals one of the rule's aliases.
+    """
+
+    def __init__(self, user_meta_data: Dict[str, Any], resume_path: str = None):
+        self.user_meta_data = user_meta_data
+        self.resume_path = resume_path or os.getenv("RESUME_PATH", "/home/tejas/Desktop/job-apply-bot/resume.pdf")
+        self.filled = 0
+        self.sent_to_llm = 0
+        self._rules: Dict[str, Callable[[], Any]] = {}
+        self._compile()
+
+    def _compile(self) -> None:
+        data = self.user_meta_data
+        name = str(data.get("name") or "").split()
+        address = _get(data, "contact_information.current_address") or {}
+        experience = data.get("experience") or [{}]
+        rules = {
+            ("firstname", "first name", "given name", "forename"): lambda: name[0] if name else None,
+            ("lastname", "last name", "surname", "family name"): lambda: name[-1] if len(name) > 1 else None,
+            ("name", "full name", "fullname", "your name", "legal name", "full legal name"): lambda: data.get("name"),
+            ("email", "email address", "e-mail", "your email"): lambda: _get(data, "contact_information.email"),
+            ("phone", "phone number", "mobile", "mobile number", "telephone", "contact number"): lambda: format_phone(
+                _get(data, "contact_information.phone"), address.get("country")
+            ),
+            ("address", "current address", "location", "current location", "city, state"): lambda: ", ".join(
+                str(part) for part in (address.get("city"), address.get("state"), address.get("country")) if part
+            ) or None,
+            ("city",): lambda: address.get("city"),
+            ("state", "province", "region"): lambda: address.get("state"),
+            ("country", "country of residence"): lambda: address.get("country"),
+            ("zip", "zip code", "zipcode", "postal code", "postcode"): lambda: address.get("zip_code"),
+            ("headline", "current title", "current job title", "job title"): lambda: experience[0].get("job_title"),
+            ("current company", "current employer", "company"): lambda: experience[0].get("company"),
+            ("linkedin", "linkedin profile", "linkedin url", "linkedin profile url"): lambda: _get(
+                data, "contact_information.linkedin"
+            ),
+            ("years of experience", "total years of experience", "how many years of experience do you have"): lambda: data.get(
+                "years_of_experience"
+            ),
+            ("salary", "expected salary", "desired salary", "salary expectations"): lambda: data.get("user_salary"),
+            ("resume", "cv", "resume/cv", "upload resume", "upload your resume"): lambda: self.resume_path,
+        }
+        for aliases, rule in rules.items():
+            for alias in aliases:
+                self._rules.setdefault(normalize_key(alias), rule)
+
+    def rule_for(self, field: Dict[str, Any]) -> Optional[Callable[[], Any]]:
+        for candidate in (field.get("data-ui"), field.get("name"), field.get("id"), field.get("label")):
+            rule = self._rules.get(normalize_key(candidate))
+            if rule is not None:
+                return rule
+        return None
+
+    def value_for(self, field: Dict[str, Any]) -> Optional[str]:
+        rule = self.rule_for(field)
+        if rule is None:
+            return None
+        value = rule()
+        if value in (None, ""):
+            return None
+
+        field_type = field.get("type")
+        if field_type == "file":
+            return value if value == self.resume_path else None
+        if field.get("options"):
+            return match_option(value, field["options"])
+        if field_type in TEXT_TYPES:
+            return str(value)
+        return None
+
+    def apply(self, fields: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Splits fields into (filled locally with a `value`, left for the LLM)."""
+        filled, remaining = [], []
+        for field in fields:
+            value = self.value_for(field)
+            if value is None:
+                remaining.append(field)
+            else:
+                filled.append({**field, "value": value})
+        self.filled += len(filled)
+        self.sent_to_llm += len(remaining)
+        logging.info(f"Profile rules filled {len(filled)} of {len(fields)} fields locally.")
+        return filled, remaining
+
+    def log_stats(self) -> None:
+        total = self.filled + self.sent_to_llm
+        logging.info(
+            f"Profile rules: {self.filled} of {total} fields filled locally "
+            f"({self.filled / total if total else 0.0:.0%}), {self.sent_to_llm} sent to the LLM"
+        )
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from openaiapp.clients import close_async_clients
+from openaiapp.service import AsyncOpenAIService
+from scraping.answer_bank import AnswerBank
+from scraping.browser_pool import BrowserPool
+from scraping.exceptions import ScrapException
+from scraping.field_validator import FieldValidator
+from scraping.flow import ApplicationFlow, FlowCheckpointStore
+from scraping.form_cache import FormSchemaCache
+from scraping.job_queue import Job, JobQueue
+from scraping.metadata_slicer import MetadataSlicer
+from scraping.network import NetworkFilter
+from scraping.profile_rules import ProfileRules
+from scraping.selector_resolver import SelectorResolver
+from scraping.service import ScrapService
+from scraping.storage_state import StorageStateCache
+from tracing.tracer import set_job, span, tracer
+
+
+@dataclass
+class JobResult:
+    url: str
+    status: str
+    duration: float
+    error: Optional[str] = None
+
+
+async def apply_to_job(
+    scrap_service: ScrapService,
+    url: str,
+    user_meta_data: dict,
+    stream: bool = True,
+    single_call: bool = False,
+    checkpoints: FlowCheckpointStore = None,
+) -> None:
+    """
+    Runs one application end to end through the ScrapService stages.
+
+    The form is filled step by step by an ApplicationFlow (see scraping/flow.py): single-page
+    forms are one step followed by the submit. With `stream`, filled values are streamed from
+    the LLM and typed into the page while later fields are still being generated. With
+    `single_call`, a form that is neither cached nor extractable locally is detected and filled
+    in one EXTRACT_AND_FILL call instead of two.
+
+    Raises:
+        ScrapException: When a stage returns nothing usable, so the caller can mark the job failed.
+    """
+    scrap_service.application_id = url
+
+    if not await scrap_service.click_apply_now(url=url):
+        raise ScrapException(stage="click_apply_now", message="'Apply Now' could not be clicked.")
+    form = await scrap_service.get_form()
+    if form is None:
+        raise ScrapException(stage="get_form", message="Application form not found.")
+
+    flow = ApplicationFlow(
+        scrap_service, user_meta_data=user_meta_data, stream=stream, single_call=single_call, checkpoints=checkpoints
+    )
+    await flow.run(form)
+
+
+class ApplicationRunner:
+    """
+    Applies to many job URLs concurrently over a bounded pool of browser contexts.
+
+    Browsers are launched once per run by a BrowserPool; every job leases a context no other
+    job is using, and at most `concurrency` contexts are leased at the same time.
+    """
+
+    def __init__(
+        self,
+        user_meta_data: dict,
+        concurrency: int = 4,
+        headless: bool = True,
+        llm_concurrency: int = None,
+        stream: bool = True,
+        single_call: bool = False,
+    ):
+        self.user_meta_data = user_meta_data
+        self.stream = stream
+        self.single_call = single_call
+        self.concurrency = max(1, concurrency)
+        self.headless = headless
+        self.openai_service = AsyncOpenAIService(max_concurrency=llm_concurrency)
+        self.form_cache = FormSchemaCache()
+        self.network_filter = NetworkFilter()
+        self.storage_state_cache = StorageStateCache()
+        self.selector_resolver = SelectorResolver()
+        self.profile_rules = ProfileRules(user_meta_data)
+        self.answer_bank = AnswerBank()
+        self.metadata_slicer = MetadataSlicer(user_meta_data)
+        self.field_validator = FieldValidator()
+        self.checkpoints = FlowCheckpointStore()
+        # Swapped by the record/replay harness (benchmarks/replay.py) to capture or time stages.
+        self.scrap_service_class = ScrapService
+
+    async def run(self, urls: Iterable[str]) -> List[JobResult]:
+        urls = list(urls)
+        logging.info(f"Starting {len(urls)} applications with concurrency {self.concurrency}...")
+        started_at = time.perf_counter()
+
+        pool = BrowserPool(
+            warm_contexts=min(self.concurrency, len(urls)), headless=self.headless, network_filter=self.network_filter
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            await pool.start()
+            results = await asyncio.gather(*(self._run_job(pool, semaphore, url) for url in urls))
+        finally:
+            await pool.close()
+            await close_async_clients()
+
+        self.report(results, elapsed=time.perf_counter() - started_at)
+        self.log_stats(pool)
+        tracer.export()
+        return list(results)
+
+    async def run_queued(self, queue: JobQueue, urls: Iterable[str] = ()) -> List[JobResult]:
+        """
+        Queues `urls` (skipping URLs already applied to) and works through every unfinished job
+        in `queue`, including jobs left over from an earlier run. `concurrency` workers claim jobs
+        one at a time; failed attempts are retried with backoff and resume from the job's
+        artifacts, so a crash or a failure loses at most the stage that was running.
+        """
+        added = queue.enqueue(urls)
+        logging.info(f"Queued {added} new applications; working through the queue with concurrency {self.concurrency}...")
+        started_at = time.perf_counter()
+
+        pool = BrowserPool(warm_contexts=self.concurrency, headless=self.headless, network_filter=self.network_filter)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: List[JobResult] = []
+        try:
+            await pool.start()
+            await asyncio.gather(
+                *(self._work(pool, semaphore, queue, f"{os.getpid()}-{worker}", results) for worker in range(self.concurrency))
+            )
+        finally:
+            await pool.close()
+            await close_async_clients()
+
+        self.report(results, elapsed=time.perf_counter() - started_at)
+        queue.log_stats()
+        self.log_stats(pool)
+        tracer.export()
+        return results
+
+    async def _work(self, pool: BrowserPool, semaphore: asyncio.Semaphore, queue: JobQueue, worker_id: str, results: List[JobResult]) -> None:
+        """Claims and runs jobs until none is left; sleeps while the only jobs left are backing off."""
+        while True:
+            job: Optional[Job] = queue.claim(worker_id)
+            if job is None:
+                wait = queue.next_retry_in()
+                if wait is None:
+                    return
+                await asyncio.sleep(max(1.0, wait))
+                continue
+
+            result = await self._run_job(pool, semaphore, job.url, checkpoints=queue, artifacts=queue)
+            if result.status == "applied":
+                queue.complete(job)
+            else:
+                queue.fail(job, result.error)
+            results.append(result)
+
+    async def _run_job(
+        self,
+        pool: BrowserPool,
+        semaphore: asyncio.Semaphore,
+        url: str,
+        checkpoints: FlowCheckpointStore = None,
+        artifacts: JobQueue = None,
+    ) -> JobResult:
+        set_job(url)
+        async with semaphore:
+            started_at = time.perf_counter()
+            scrap_service = self.scrap_service_class(
+                pool=pool,
+                openai_service=self.openai_service,
+                form_cache=self.form_cache,
+                network_filter=self.network_filter,
+                storage_state_cache=self.storage_state_cache,
+                selector_resolver=self.selector_resolver,
+                profile_rules=self.profile_rules,
+                answer_bank=self.answer_bank,
+                metadata_slicer=self.metadata_slicer,
+                artifacts=artifacts,
+                field_validator=self.field_validator,
+            )
+            try:
+                with span("runner.job", url=url) as job_span:
+                    await scrap_service.start()
+                    await apply_to_job(
+                        scrap_service,
+                        url=url,
+                        user_meta_data=self.user_meta_data,
+                        stream=self.stream,
+                        single_call=self.single_call,
+                        checkpoints=checkpoints or self.checkpoints,
+                    )
+                    job_span.set(status="applied")
+                result = JobResult(url=url, status="applied", duration=time.perf_counter() - started_at)
+            except Exception as e:
+                result = JobResult(
+                    url=url, status="failed", duration=time.perf_counter() - started_at, error=str(e)
+                )
+            finally:
+                await scrap_service.close()
+
+        logging.info(f"[{result.status}] {url} in {result.duration:.1f}s" + (f": {result.error}" if result.error else ""))
+        return result
+
+    def log_stats(self, pool: BrowserPool) -> None:
+        self.form_cache.log_stats()
+        self.network_filter.log_stats()
+        self.storage_state_cache.log_stats()
+        self.selector_resolver.log_stats()
+        self.profile_rules.log_stats()
+        self.answer_bank.log_stats()
+        self.metadata_slicer.log_stats()
+        self.field_validator.log_stats()
+        self.openai_service.router.log_stats()
+        pool.log_stats()
+
+    @staticmethod
+    def report(results: List[JobResult], elapsed: float) -> None:
+        applied = sum(1 for result in results if result.status == "applied")
+        failed = len(results) - applied
+        throughput = len(results) / (elapsed / 60) if elapsed else 0.0
+        logging.info(
+            f"Processed {len(results)} applications in {elapsed:.1f}s "
+            f"({applied} applied, {failed} failed, {throughput:.2f} apps/minute)"
+        )
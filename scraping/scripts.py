@@ -0,0 +1,64 @@
+# JavaScript evaluated inside the page with `page.evaluate(SCRIPT, argument)`.
+
+# Fills a list of fields in one round trip and returns one {status, error} per field.
+# Values are written through the native value setter and followed by input/change/blur
+# events, which is what React-controlled inputs listen to. Radios and checkboxes are clicked
+# so their onChange handlers run. File inputs and date pickers are reported as "skipped"
+# because they need real user input (set_input_files, keyboard) from Playwright.
+BULK_FILL_FIELDS = """
+(fields) => {
+    const escape = (value) => CSS.escape(String(value));
+    const find = (field) => {
+        for (const [attribute, key] of [["data-ui", "data-ui"], ["id", "id"], ["name", "name"]]) {
+            if (!field[key]) continue;
+            const element = document.querySelector(`[${attribute}="${escape(field[key])}"]`);
+            if (element && ["INPUT", "TEXTAREA", "SELECT"].includes(element.tagName)) return element;
+        }
+        return null;
+    };
+    const setValue = (element, value) => {
+        const prototype = Object.getPrototypeOf(element);
+        const setter = Object.getOwnPropertyDescriptor(prototype, "value").set;
+        element.focus();
+        setter.call(element, value);
+        element.dispatchEvent(new Event("input", { bubbles: true }));
+        element.dispatchEvent(new Event("change", { bubbles: true }));
+        element.dispatchEvent(new Event("blur", { bubbles: true }));
+    };
+    const isTruthy = (value) => ["true", "yes", "on", "1"].includes(String(value).toLowerCase());
+
+    return fields.map((field) => {
+        try {
+            const type = field.type;
+            const value = field.value === undefined || field.value === null ? "" : String(field.value);
+            if (type === "file" || field.label === "Date") {
+                return { status: "skipped" };
+            }
+            if (type === "radio") {
+                const option = document.querySelector(
+                    `input[type="radio"][name="${escape(field.name)}"][value="${escape(value)}"]`
+                );
+                if (!option) return { status: "failed", error: `no option ${value}` };
+                if (!option.checked) option.click();
+                return option.checked ? { status: "filled" } : { status: "failed", error: "not checked" };
+            }
+            if (type === "checkbox") {
+                const boxes = document.querySelectorAll(`input[type="checkbox"][name="${escape(field.name)}"]`);
+                if (!boxes.length) return { status: "failed", error: "not found" };
+                const wanted = value.split(",").map((item) => item.trim());
+                for (const box of boxes) {
+                    const checked = boxes.length === 1 ? isTruthy(value) || wanted.includes(box.value) : wanted.includes(box.value);
+                    if (box.checked !== checked) box.click();
+                }
+                return { status: "filled" };
+            }
+            const element = find(field);
+            if (!element) return { status: "failed", error: "not found" };
+            setValue(element, value);
+            return element.value === value ? { status: "filled" } : { status: "failed", error: "value not kept" };
+        } catch (error) {
+            return { status: "failed", error: String(error) };
+        }
+    });
+}
+"""
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Checks every candidate inside `scope` in one go and returns {index} of the first visible match,
+# or null (an object, so that a match at index 0 still counts as truthy for wait_for_function).
+# Text candidates mirror Playwright's `tag:has-text("...")`: case-insensitive substring match.
+FIRST_VISIBLE_CANDIDATE_IN = """
+(scope, candidates) => {
+    const visible = (element) => {
+        const style = window.getComputedStyle(element);
+        return style.visibility !== "hidden" && style.display !== "none" && element.getClientRects().length > 0;
+    };
+    for (let index = 0; index < candidates.length; index++) {
+        const candidate = candidates[index];
+        let elements = [];
+        try {
+            elements = Array.from(scope.querySelectorAll(candidate.css || candidate.tag));
+        } catch (error) {
+            continue;
+        }
+        if (candidate.text) {
+            const text = candidate.text.toLowerCase();
+            elements = elements.filter((element) => (element.innerText || "").toLowerCase().includes(text));
+        }
+        if (elements.some(visible)) return { index };
+    }
+    return null;
+}
+"""
+FIRST_VISIBLE_CANDIDATE = f"(candidates) => ({FIRST_VISIBLE_CANDIDATE_IN})(document, candidates)"
+
+HAS_TEXT_SELECTOR = re.compile(r"""^([a-z]+):has-text\((['"])(.+)\2\)$""", re.IGNORECASE)
+
+HEURISTICS = {
+    "apply_now": [
+        '[data-ui="overview-apply-now"]',
+        'a[data-ui*="apply"]',
+        'button[data-ui*="apply"]',
+        'a:has-text("Apply for this job")',
+        'button:has-text("Apply for this job")',
+        'a:has-text("Apply now")',
+        'button:has-text("Apply now")',
+        'a:has-text("Apply")',
+        'button:has-text("Apply")',
+    ],
+    "accept_cookie": [
+        '[data-ui="cookie-consent-accept"]',
+        "#onetrust-accept-btn-handler",
+        'button:has-text("Accept all")',
+        'button:has-text("Allow all")',
+        'button:has-text("Accept")',
+        'button:has-text("I agree")',
+    ],
+    "next_step": [
+        'button[data-ui="next-step"]',
+        'button[data-ui*="next"]',
+        'button:has-text("Save and continue")',
+        'button:has-text("Continue")',
+        'button:has-text("Next")',
+    ],
+    "form": [
+        'form[data-ui="application-form"]',
+        'form[data-ui*="application"]',
+        'form:has(input[type="file"])',
+        'form:has(input[type="email"])',
+    ],
+}
+
+
+def to_candidate(selector: str) -> Dict[str, str]:
+    """CSS selectors are used as is; `tag:has-text("...")` is turned into a tag plus a text match."""
+    match = HAS_TEXT_SELECTOR.match(selector.strip())
+    if match:
+        return {"selector": selector, "tag": match.group(1), "text": match.group(3)}
+    return {"selector": selector, "css": selector}
+
+
+class SelectorResolver:
+    """
+    Finds the apply button, cookie button and form on a page, learning what works per domain.
+
+    Candidates are ranked (configured selector, then the domain's past winners by hit count,
+    then generic heuristics) and all of them are checked in a single page evaluation. The winner
+    is stored in a JSON index on disk, so a later visit to the same domain matches it directly.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("SELECTOR_INDEX_PATH", ".cache/selectors.json")
+        self.resolved = 0
+        self.unresolved = 0
+        self.learned_hits = 0
+        self._lock = threading.Lock()
+        self._index = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Error reading selector index: {e}")
+            return {}
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "w") as file:
+            json.dump(self._index, file, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+    def learned(self, domain: str, role: str) -> List[str]:
+        winners = self._index.get(domain, {}).get(role, {})
+        return sorted(winners, key=lambda selector: winners[selector]["hits"], reverse=True)
+
+    def candidates(self, domain: str, role: str, configured: Optional[str] = None) -> List[Dict[str, str]]:
+        ranked = ([configured] if configured else []) + self.learned(domain, role) + HEURISTICS.get(role, [])
+        unique = list(dict.fromkeys(ranked))
+        return [to_candidate(selector) for selector in unique]
+
+    def record(self, domain: str, role: str, selector: str) -> None:
+        with self._lock:
+            winners = self._index.setdefault(domain, {}).setdefault(role, {})
+            entry = winners.setdefault(selector, {"hits": 0})
+            entry["hits"] += 1
+            entry["last_used_at"] = time.time()
+            try:
+                self._save()
+            except OSError as e:
+                logging.error(f"Error saving selector index: {e}")
+
+    async def resolve(
+        self, page, domain: str, role: str, configured: Optional[str] = None, timeout: float = 0, root=None
+    ) -> Optional[str]:
+        """
+        Returns the best selector with a visible match, or None.
+
+        With a `timeout` (ms) the check is repeated in the page until something matches, so a
+        page that is still rendering costs one wait rather than one timeout per candidate.
+        With a `root` locator only matches inside that element count (checked once).
+        """
+        candidates = self.candidates(domain, role, configured)
+        try:
+            if root is not None:
+                match = await root.evaluate(FIRST_VISIBLE_CANDIDATE_IN, candidates)
+            elif timeout:
+                handle = await page.wait_for_function(FIRST_VISIBLE_CANDIDATE, arg=candidates, timeout=timeout)
+                match = await handle.json_value()
+            else:
+                match = await page.evaluate(FIRST_VISIBLE_CANDIDATE, candidates)
+        except Exception as e:
+            logging.info(f"No {role} selector matched on {domain}: {e}")
+            match = None
+
+        if not match:
+            self.unresolved += 1
+            return None
+        selector = candidates[match["index"]]["selector"]
+        self.resolved += 1
+        if selector in self.learned(domain, role):
+            self.learned_hits += 1
+        if selector != configured:
+            logging.info(f"Resolved {role} on {domain} to {selector}")
+        self.record(domain, role, selector)
+        return selector
+
+    def log_stats(self) -> None:
+        logging.info(
+            f"Selector resolver: {self.resolved} resolved ({self.learned_hits} from learned winners), "
+            f"{self.unresolved} unresolved"
+        )
@@ -1,10 +1,25 @@
+import asyncio
 import json
 import os
 import logging
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 from openaiapp.constants import LlmPromptTypes
-from openaiapp.service import OpenAIService
+from openaiapp.service import AsyncOpenAIService
+from scraping.answer_bank import AnswerBank, company_from_url
+from scraping.chunking import merge_fields, split_form_html
+from scraping.dom_index import DomIndex
+from scraping.extractor import FormFieldExtractor
+from scraping.field_validator import FieldValidator
+from scraping.form_cache import FormSchemaCache, form_fingerprint
+from scraping.html_pruner import log_pruning, prune_form_html
+from scraping.metadata_slicer import MetadataSlicer
+from scraping.profile_rules import ProfileRules
+from scraping.network import NetworkFilter
+from scraping.scripts import BULK_FILL_FIELDS
+from scraping.selector_resolver import SelectorResolver
+from scraping.storage_state import StorageStateCache, url_domain
+from tracing.tracer import traced
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -12,137 +27,572 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 load_dotenv()
 
 class ScrapService:
-    def __init__(self, headless=False):
+    def __init__(
+        self,
+        headless=False,
+        context=None,
+        openai_service=None,
+        form_cache=None,
+        network_filter=None,
+        pool=None,
+        storage_state_cache=None,
+        selector_resolver=None,
+        profile_rules=None,
+        answer_bank=None,
+        metadata_slicer=None,
+        artifacts=None,
+        field_validator=None,
+    ):
+        self.headless = headless
+        self.playwright = None
+        self.browser = None
+        self.context = context
+        self.pool = pool
+        self.lease = None
+        self.page = None
+        self.accept_cookie_selector = os.getenv("ACCEPTCOOKIE")
+        self.apply_now_selector = os.getenv("APPLYNOW")
+        self.form_selector = os.getenv("FORM")
+        self.openai_service = openai_service or AsyncOpenAIService()
+        self.field_extractor = FormFieldExtractor()
+        self.form_cache = form_cache or FormSchemaCache()
+        self.application_id = None
+        self.bulk_fill = os.getenv("BULK_FILL", "true").lower() == "true"
+        self.network_filter = network_filter or NetworkFilter()
+        self.storage_state_cache = storage_state_cache or StorageStateCache()
+        self.selector_resolver = selector_resolver or SelectorResolver()
+        self.domain = None
+        self.dom_index = None
+        self.profile_rules = profile_rules
+        self.answer_bank = answer_bank or AnswerBank()
+        self.company = None
+        self.metadata_slicer = metadata_slicer
+        self.slice_metadata = os.getenv("METADATA_SLICER", "true").lower() == "true"
+        self.extract_chunk_tokens = int(os.getenv("EXTRACT_CHUNK_TOKENS", "3000"))
+        # JobQueue of the job being run: LLM-extracted fields are kept per job for retries.
+        self.artifacts = artifacts
+        self.field_validator = field_validator or FieldValidator()
+        self.ready_timeout = int(os.getenv("NAVIGATION_READY_TIMEOUT", 15000))
+
+    @traced("scrap.start")
+    async def start(self):
+        """
+        Open a page. The context comes from, in order: the one handed in, a lease from the
+        browser pool, or a browser launched just for this service.
+        """
         logging.info("Initializing ScrapService...")
         try:
-            self.playwright = sync_playwright().start()
-            self.browser = self.playwright.chromium.launch(headless=headless)
-            self.context = self.browser.new_context(bypass_csp=True)
-            self.page = self.context.new_page()
-            self.accept_cookie_selector = os.getenv("ACCEPTCOOKIE")
-            self.apply_now_selector = os.getenv("APPLYNOW")
-            self.openai_service = OpenAIService()
+            if self.context is None and self.pool is not None:
+                self.lease = await self.pool.lease()
+                self.context = self.lease.context
+            elif self.context is None:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+                self.context = await self.browser.new_context(bypass_csp=True)
+                await self.network_filter.attach(self.context)
+            self.page = await self.context.new_page()
         except Exception as e:
             logging.error(f"Error initializing ScrapService: {e}")
-    
-    def open_url(self, url):
+        return self
+
+    @traced("scrap.open_url", lambda self, url: {"url": url})
+    async def open_url(self, url):
+        """Navigates without waiting for the full `load` event (see NAVIGATION_WAIT_UNTIL)."""
         try:
             logging.info(f"Opening URL: {url}")
-            self.page.goto(url)
+            await self.page.goto(url, wait_until=self.network_filter.wait_until)
         except Exception as e:
             logging.error(f"Failed to open URL {url}: {e}")
-    
-    def close(self):
+
+    async def close(self):
         logging.info("Closing browser...")
         try:
-            self.browser.close()
-            self.playwright.stop()
+            if self.browser:
+                await self.browser.close()
+                await self.playwright.stop()
+            elif self.lease:
+                await self.pool.release(self.lease)
+                self.lease = None
+                self.context = None
+            elif self.page:
+                await self.page.close()
         except Exception as e:
             logging.error(f"Error closing browser: {e}")
-    
-    def accept_cookies(self):
+
+    @traced("scrap.accept_cookies")
+    async def accept_cookies(self):
         try:
             logging.info("Checking for 'Accept Cookies' button...")
-            accept_button = self.page.locator(self.accept_cookie_selector)
-            if accept_button.is_visible():
-                accept_button.click()
+            selector = await self.selector_resolver.resolve(
+                self.page, self.domain, "accept_cookie", configured=self.accept_cookie_selector
+            )
+            if selector:
+                await self.page.locator(selector).first.click()
                 logging.info("Clicked 'Accept Cookies'.")
         except Exception as e:
             logging.error(f"Error accepting cookies: {e}")
-    
-    def click_apply_now(self, url):
+
+    async def _restore_storage_state(self) -> bool:
+        """
+        Moves to a fresh context created with the domain's saved storage state. A context handed
+        in by the caller is left alone. False when there is no state or it could not be applied.
+        """
+        state = self.storage_state_cache.load(self.domain)
+        if not state or (self.lease is None and self.browser is None):
+            return False
         try:
-            self.open_url(url)
-            self.accept_cookies()
+            if self.lease is not None:
+                lease = await self.pool.lease(storage_state=state)
+                await self.pool.release(self.lease)
+                self.lease, self.context = lease, lease.context
+            else:
+                context = await self.browser.new_context(bypass_csp=True, storage_state=state)
+                await self.network_filter.attach(context)
+                await self.context.close()
+                self.context = context
+            self.page = await self.context.new_page()
+            return True
+        except Exception as e:
+            logging.error(f"Error restoring storage state for {self.domain}: {e}")
+            return False
+
+    @traced("scrap.click_apply_now")
+    async def click_apply_now(self, url):
+        """
+        Opens the job page and clicks "Apply". When the domain's consent cookies were saved on an
+        earlier visit they are restored first and the cookie banner step is skipped.
+        """
+        try:
+            self.domain = url_domain(url)
+            self.company = company_from_url(url)
+            restored = await self._restore_storage_state()
+            await self.open_url(url)
+            apply_now_selector = await self.selector_resolver.resolve(
+                self.page, self.domain, "apply_now", configured=self.apply_now_selector, timeout=self.ready_timeout
+            )
+            if restored:
+                logging.info(f"Restored storage state for {self.domain}, skipping cookie banner.")
+                self.storage_state_cache.cookie_steps_skipped += 1
+            else:
+                await self.accept_cookies()
+                self.storage_state_cache.cookie_steps_run += 1
+
+            if apply_now_selector is None:
+                logging.error(f"'Apply Now' button not found on {url}.")
+                return False
+
             logging.info("Clicking 'Apply Now' button...")
-            apply_button = self.page.locator(self.apply_now_selector)
-            if apply_button.is_visible():
-                apply_button.click()
+            apply_button = self.page.locator(apply_now_selector).first
+            if restored and not await apply_button.is_visible():
+                # The saved state no longer gets past the banner; drop it and do it the long way.
+                self.storage_state_cache.invalidate(self.domain)
+                await self.accept_cookies()
+                restored = False
+            if await apply_button.is_visible():
+                await apply_button.click()
+                if not restored:
+                    await self.storage_state_cache.save(self.context, self.domain)
+                return True
+            return False
         except Exception as e:
             logging.error(f"Error clicking 'Apply Now': {e}")
-    
-    def get_form(self):
+            return False
+
+    @traced("scrap.get_form")
+    async def get_form(self):
+        """Returns the application form locator, or None when no form candidate shows up."""
         try:
             logging.info("Extracting form...")
-            form = self.page.locator(os.getenv("FORM"))
-            return form
+            form_selector = await self.selector_resolver.resolve(
+                self.page,
+                self.domain or url_domain(self.page.url),
+                "form",
+                configured=self.form_selector,
+                timeout=self.ready_timeout,
+            )
+            if form_selector is None:
+                return None
+            return self.page.locator(form_selector).first
         except Exception as e:
             logging.error(f"Error getting form: {e}")
             return None
-    
-    def get_input_fields(self, form):
+
+    @traced("scrap.prune_form")
+    async def prune_form(self, html_form):
+        """Strips the form HTML down to controls, identifiers and label text before it is prompted."""
+        try:
+            pruned_html_form = prune_form_html(html_form)
+            log_pruning(html_form, pruned_html_form)
+            return pruned_html_form
+        except Exception as e:
+            logging.error(f"Error pruning form: {e}")
+            return html_form
+
+    @traced("scrap.get_input_fields")
+    async def get_input_fields(self, form, allow_llm=True):
+        """
+        Returns the extracted fields as a JSON string of the form {"fields": [...]}.
+
+        Without `allow_llm`, only the schema cache and the local extractor are tried and None is
+        returned when neither knows the form.
+        """
         try:
             logging.info("Extracting input fields from form...")
-            response = self.openai_service.generate(
-                prompt_type=LlmPromptTypes.EXTRACT_INPUT_FIELDS,
-                prompt_variables={"html_form": str(form)}
+            fingerprint = form_fingerprint(str(form))
+            cached_fields = self.form_cache.get(fingerprint)
+            if cached_fields is not None:
+                logging.info(f"Form schema cache hit ({len(cached_fields)} input fields).")
+                return json.dumps({"fields": cached_fields})
+
+            extraction = self.field_extractor.extract(str(form))
+            if self.field_extractor.is_confident(extraction):
+                logging.info(f"Extracted {len(extraction.fields)} input fields locally.")
+                self.form_cache.put(fingerprint, extraction.fields)
+                return json.dumps({"fields": extraction.fields})
+
+            artifact_name = f"fields:{fingerprint}"
+            if self.artifacts is not None and self.application_id:
+                stored_fields = self.artifacts.load_artifact(self.application_id, artifact_name)
+                if stored_fields is not None:
+                    logging.info(f"Reusing {len(stored_fields)} input fields extracted on an earlier attempt.")
+                    return json.dumps({"fields": stored_fields})
+
+            if not allow_llm:
+                return None
+            logging.info(
+                f"Local extraction confidence {extraction.confidence:.2f} is too low "
+                f"({'; '.join(extraction.issues)}), falling back to LLM..."
             )
-            return response
+            chunks = split_form_html(str(form), self.extract_chunk_tokens)
+            if len(chunks) == 1:
+                input_fields = await self.extract_input_fields(str(form))
+                # No usable field at all is how the small model usually fails; the large one is tried once.
+                if not input_fields and self.openai_service.router.escalation_changes_model(
+                    LlmPromptTypes.EXTRACT_INPUT_FIELDS, {"html_form": str(form)}
+                ):
+                    logging.info("Extracted fields failed validation, extracting again on the larger model...")
+                    input_fields = await self.extract_input_fields(str(form), escalate=True)
+            else:
+                input_fields = await self.get_input_fields_chunked(chunks)
+            if not input_fields:
+                return None
+            self.form_cache.put(fingerprint, input_fields)
+            if self.artifacts is not None and self.application_id:
+                self.artifacts.save_artifact(self.application_id, artifact_name, input_fields)
+            return json.dumps({"fields": input_fields})
         except Exception as e:
             logging.error(f"Error extracting input fields: {e}")
             return None
-    
-    def get_input_values(self, input_fields, user_meta_data):
+
+    async def extract_input_fields(self, form, escalate=False):
+        """One EXTRACT_INPUT_FIELDS call; returns the validated fields or None when the answer is unusable."""
+        response = await self.openai_service.generate(
+            prompt_type=LlmPromptTypes.EXTRACT_INPUT_FIELDS,
+            prompt_variables={"html_form": form},
+            application_id=self.application_id,
+            escalate=escalate,
+        )
+        return self.field_validator.parse_fields(self.openai_service.get_response_text_from_response(response=response), prompt=form)
+
+    @traced("scrap.get_input_fields_chunked", lambda self, chunks: {"chunks": len(chunks)})
+    async def get_input_fields_chunked(self, chunks):
+        """
+        Extracts the chunks of a large form concurrently and returns their fields merged in
+        document order; a chunk whose answer is unusable contributes no fields.
+        """
+        logging.info(f"Form is large, extracting {len(chunks)} chunks concurrently...")
+        responses = await asyncio.gather(
+            *(
+                self.openai_service.generate(
+                    prompt_type=LlmPromptTypes.EXTRACT_INPUT_FIELDS,
+                    prompt_variables={"html_form": chunk},
+                    application_id=self.application_id,
+                )
+                for chunk in chunks
+            )
+        )
+        chunk_fields = [
+            self.field_validator.parse_fields(self.openai_service.get_response_text_from_response(response=response), prompt=chunk)
+            or []
+            for chunk, response in zip(chunks, responses)
+        ]
+        return merge_fields(chunk_fields)
+
+    def fill_locally(self, input_fields, user_meta_data):
+        """
+        Fills standard profile fields, then custom questions answered before (answer bank).
+        Returns the filled fields and the JSON text of the fields still needing the LLM, or
+        None when nothing is left.
+        """
+        try:
+            if self.profile_rules is None or self.profile_rules.user_meta_data is not user_meta_data:
+                self.profile_rules = ProfileRules(user_meta_data)
+            filled, remaining = self.profile_rules.apply(json.loads(input_fields)["fields"])
+            answered, remaining = self.answer_bank.apply(remaining, company=self.company)
+            return filled + answered, json.dumps({"fields": remaining}) if remaining else None
+        except Exception as e:
+            logging.error(f"Error filling fields locally: {e}")
+            return [], input_fields
+
+    def remember_answers(self, fields):
+        """Adds LLM answers to custom questions to the answer bank."""
+        for field in fields:
+            if self.profile_rules is not None and self.profile_rules.rule_for(field) is not None:
+                continue
+            try:
+                self.answer_bank.add(field, company=self.company)
+            except Exception as e:
+                logging.error(f"Error saving answer for '{field.get('label')}': {e}")
+
+    async def remember_answers_stream(self, fields):
+        """Passes streamed fields through, adding each one to the answer bank."""
+        async for field in fields:
+            self.remember_answers([field])
+            yield field
+
+    def user_meta_data_for(self, input_fields, user_meta_data):
+        """The profile JSON for the fill prompt, cut down to the sections these fields can need."""
+        if not self.slice_metadata:
+            return json.dumps(user_meta_data)
+        try:
+            if self.metadata_slicer is None or self.metadata_slicer.user_meta_data is not user_meta_data:
+                self.metadata_slicer = MetadataSlicer(user_meta_data)
+            return self.metadata_slicer.dumps(json.loads(input_fields)["fields"])
+        except Exception as e:
+            logging.error(f"Error slicing user metadata, sending all of it: {e}")
+            return json.dumps(user_meta_data)
+
+    @traced("scrap.get_input_values")
+    async def get_input_values(self, input_fields, user_meta_data):
         try:
             logging.info("Filling input fields based on user metadata...")
-            response = self.openai_service.generate(
+            response = await self.openai_service.generate(
                 prompt_type=LlmPromptTypes.FILL_VALUE_IN_FIELD,
-                prompt_variables={"input_fields": input_fields, "user_meta_data": json.dumps(user_meta_data)}
+                prompt_variables={
+                    "input_fields": input_fields,
+                    "user_meta_data": self.user_meta_data_for(input_fields, user_meta_data),
+                },
+                application_id=self.application_id,
             )
             return response
         except Exception as e:
             logging.error(f"Error getting input values: {e}")
             return None
-    
-    def fill_values(self, input_fields_and_values):
-        try:
-            for field in input_fields_and_values:
-                field_type = field["type"]
-                label = field["label"]
-                selector = f"[name='{field['name']}']" if "name" in field else f"#{field['id']}"
-                
-                try:
-                    if field_type in ["text", "email", "textarea"]:
-                        if label == "Date":
-                            date_input = self.page.locator(f"input[name='{field['name']}']")
-                            date_input.wait_for()
-                            date_input.fill(field["value"])
-                            date_input.press("Enter")
-                        self.page.fill(selector, field["value"])
-                except Exception as e:
-                    logging.error(f"Error filling text field '{label}': {e}")
-                    pass
-                
-                try:
-                    if field_type == "file":
-                        file_path = "/home/tejas/Desktop/job-apply-bot/resume.pdf"
-                        file_input = self.page.locator(f"input[data-ui='{field['data-ui']}']")
-                        file_input.set_input_files(file_path)
-                except Exception as e:
-                    logging.error(f"Error uploading file '{label}': {e}")
-                    pass
-                
-                try:
-                    if field_type == "radio":
-                        value = field["value"]
-                        locator = self.page.locator(f"input[name='{field['name']}'][value='{value}']")
-                        locator.wait_for(state="visible", timeout=5000)
-                        locator.click(force=True)
-                except Exception as e:
-                    logging.error(f"Error selecting radio button '{label}': {e}")
-                    pass
-                
-                try:
-                    if field_type == "tel":
-                        self.page.fill(selector, field["value"])
-                        self.page.press(selector, " ")
-                except Exception as e:
-                    logging.error(f"Error filling telephone field '{label}': {e}")
-                    pass
-            
+
+    def get_input_values_stream(self, input_fields, user_meta_data):
+        """Streams filled fields one by one so fill_values can start before the LLM has finished."""
+        logging.info("Streaming input values based on user metadata...")
+        return self.openai_service.generate_stream(
+            prompt_type=LlmPromptTypes.FILL_VALUE_IN_FIELD,
+            prompt_variables={
+                "input_fields": input_fields,
+                "user_meta_data": self.user_meta_data_for(input_fields, user_meta_data),
+            },
+            application_id=self.application_id,
+        )
+
+    async def validate_input_values(self, input_values_text, input_fields, user_meta_data):
+        """The fields of a fill answer, validated, with invalid or missing ones re-asked (see FieldValidator)."""
+        return await self.field_validator.parse_values(
+            self.openai_service,
+            input_values_text,
+            expected_fields=json.loads(input_fields)["fields"],
+            user_meta_data=self.user_meta_data_for(input_fields, user_meta_data),
+            application_id=self.application_id,
+        )
+
+    def validate_input_values_stream(self, fields, input_fields, user_meta_data):
+        """Streaming variant of validate_input_values: valid fields pass through as they arrive."""
+        return self.field_validator.validate_stream(
+            self.openai_service,
+            fields,
+            expected_fields=json.loads(input_fields)["fields"],
+            user_meta_data=self.user_meta_data_for(input_fields, user_meta_data),
+            application_id=self.application_id,
+        )
+
+    @traced("scrap.extract_and_fill_values")
+    async def extract_and_fill_values(self, form, user_meta_data):
+        """Detects and fills the form fields in a single LLM call; returns the {"fields": [...]} JSON text."""
+        try:
+            logging.info("Extracting and filling input fields in one call...")
+            response = await self.openai_service.generate(
+                prompt_type=LlmPromptTypes.EXTRACT_AND_FILL,
+                prompt_variables={"html_form": str(form), "user_meta_data": json.dumps(user_meta_data)},
+                application_id=self.application_id,
+            )
+            input_values = await self.field_validator.parse_values(
+                self.openai_service,
+                self.openai_service.get_response_text_from_response(response=response),
+                user_meta_data=json.dumps(user_meta_data),
+                application_id=self.application_id,
+            )
+            if not input_values:
+                return None
+            self.form_cache.put(form_fingerprint(str(form)), input_values)
+            return json.dumps({"fields": input_values})
+        except Exception as e:
+            logging.error(f"Error extracting and filling input fields: {e}")
+            return None
+
+    async def extract_and_fill_values_stream(self, form, user_meta_data):
+        """Streaming variant of extract_and_fill_values; caches the schema once the stream completes."""
+        logging.info("Streaming extracted and filled input fields in one call...")
+        fields = []
+        stream = self.openai_service.generate_stream(
+            prompt_type=LlmPromptTypes.EXTRACT_AND_FILL,
+            prompt_variables={"html_form": str(form), "user_meta_data": json.dumps(user_meta_data)},
+            application_id=self.application_id,
+        )
+        async for field in self.field_validator.validate_stream(
+            self.openai_service, stream, user_meta_data=json.dumps(user_meta_data), application_id=self.application_id
+        ):
+            fields.append(field)
+            yield field
+        if fields:
+            self.form_cache.put(form_fingerprint(str(form)), fields)
+
+    @traced("scrap.fill_field", lambda self, field: {"label": field.get("label"), "type": field.get("type")})
+    async def fill_field(self, field):
+        """Fills one field through its element handle in the DOM index (see fill_values)."""
+        field_type = field["type"]
+        label = field["label"]
+        element = self.dom_index.resolve(field) if self.dom_index else None
+        if element is None:
+            logging.error(f"Field '{label}' not found on the page.")
+            return
+
+        try:
+            if field_type in ["text", "email", "textarea", "number", "url", "date"]:
+                await element.fill(field["value"])
+                if label == "Date":
+                    await element.press("Enter")
+        except Exception as e:
+            logging.error(f"Error filling text field '{label}': {e}")
+            pass
+
+        try:
+            if field_type == "file":
+                file_path = os.getenv("RESUME_PATH", "/home/tejas/Desktop/job-apply-bot/resume.pdf")
+                await element.set_input_files(file_path)
+        except Exception as e:
+            logging.error(f"Error uploading file '{label}': {e}")
+            pass
+
+        try:
+            if field_type == "radio":
+                await element.click(force=True)
+        except Exception as e:
+            logging.error(f"Error selecting radio button '{label}': {e}")
+            pass
+
+        try:
+            if field_type == "select":
+                await element.select_option(field["value"])
+        except Exception as e:
+            logging.error(f"Error selecting option for '{label}': {e}")
+            pass
+
+        try:
+            if field_type == "checkbox":
+                # A group gets every listed box checked; a lone box is checked or cleared by the value.
+                values = [item.strip() for item in str(field["value"]).split(",")]
+                boxes = [self.dom_index.handles.get(f"option:{field.get('name')}={item}") for item in values]
+                boxes = [box for box in boxes if box is not None]
+                for box in boxes:
+                    await box.check(force=True)
+                if not boxes and str(field["value"]).lower() in ("true", "yes", "on", "1"):
+                    await element.check(force=True)
+                elif not boxes:
+                    await element.uncheck(force=True)
+        except Exception as e:
+            logging.error(f"Error checking checkbox '{label}': {e}")
+            pass
+
+        try:
+            if field_type == "tel":
+                await element.fill(field["value"])
+                await element.press(" ")
+        except Exception as e:
+            logging.error(f"Error filling telephone field '{label}': {e}")
+            pass
+
+    @traced("scrap.bulk_fill_fields", lambda self, fields: {"fields": len(fields)})
+    async def bulk_fill_fields(self, fields):
+        """
+        Fills fields with one injected script instead of several Playwright calls per field.
+        File uploads, date pickers and fields the script could not fill go through fill_field.
+        """
+        if not self.bulk_fill:
+            for field in fields:
+                await self.fill_field(field)
+            return
+
+        try:
+            results = await self.page.evaluate(BULK_FILL_FIELDS, fields)
+        except Exception as e:
+            logging.error(f"Error bulk filling fields, filling one by one: {e}")
+            results = [{"status": "failed", "error": str(e)}] * len(fields)
+
+        fallbacks = [(field, result) for field, result in zip(fields, results) if result["status"] != "filled"]
+        for field, result in fallbacks:
+            if result["status"] == "failed":
+                logging.info(f"Bulk fill failed for '{field.get('label')}' ({result.get('error')}), retrying...")
+            await self.fill_field(field)
+        logging.info(f"Bulk filled {len(fields) - len(fallbacks)} of {len(fields)} fields in one call.")
+
+    @traced("scrap.fill_values")
+    async def fill_values(self, input_fields_and_values, submit=True):
+        """
+        Fills every field and, with `submit`, submits the form. Accepts a list of fields or an
+        async iterator of them, in which case each field is filled as soon as it arrives.
+        """
+        try:
+            self.dom_index = await DomIndex.build(self.page)
+            logging.info(f"Indexed {len(self.dom_index)} form control keys.")
+
+            filled = 0
+            if hasattr(input_fields_and_values, "__aiter__"):
+                async for field in input_fields_and_values:
+                    if self.dom_index.missing([field], log=False):
+                        # An earlier answer may have revealed it ("Who referred you?" after "Yes").
+                        self.dom_index = await DomIndex.build(self.page)
+                        if self.dom_index.missing([field]):
+                            continue
+                    await self.bulk_fill_fields([field])
+                    filled += 1
+            else:
+                pending = list(input_fields_and_values)
+                while pending:
+                    missing = self.dom_index.missing(pending, log=False)
+                    present = [field for field in pending if not any(field is other for other in missing)]
+                    if not present:
+                        break
+                    await self.bulk_fill_fields(present)
+                    filled += len(present)
+                    pending = missing
+                    if pending:
+                        # Filling may have revealed some of them; scan again and fill what showed up.
+                        self.dom_index = await DomIndex.build(self.page)
+                self.dom_index.missing(pending)
+
+            if not filled:
+                logging.error("No fields to fill, not submitting the form.")
+                return False
+
             logging.info("✅ Form filled successfully!")
-            self.page.click("button[data-ui='apply-button']")
-            self.page.wait_for_selector('//label[contains(@class, "cb-lb")]/input[@type="checkbox"]', state="visible")
-            self.page.click('//label[contains(@class, "cb-lb")]/input[@type="checkbox"]')
+            return await self.submit_form() if submit else True
         except Exception as e:
             logging.error(f"Error filling form: {e}")
+            return False
+
+    @traced("scrap.submit_form")
+    async def submit_form(self):
+        try:
+            await self.page.click("button[data-ui='apply-button']")
+            await self.page.wait_for_selector('//label[contains(@class, "cb-lb")]/input[@type="checkbox"]', state="visible")
+            await self.page.click('//label[contains(@class, "cb-lb")]/input[@type="checkbox"]')
+            return True
+        except Exception as e:
+            logging.error(f"Error submitting form: {e}")
+            return False
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+def url_domain(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def _belongs_to(cookie_domain: str, domain: str) -> bool:
+    cookie_domain = cookie_domain.lstrip(".").lower()
+    host = domain.split(":")[0]
+    return host == cookie_domain or host.endswith("." + cookie_domain)
+
+
+class StorageStateCache:
+    """
+    Playwright `storage_state` (cookies and localStorage) saved per domain, one JSON file each.
+
+    After the first visit to a domain its consent cookies are saved, and later contexts are
+    created with them (`browser.new_context(storage_state=...)`) so the cookie banner never shows. A file older than `ttl_seconds`
+    or one that turns out not to work is deleted and the cookie step runs again.
+    """
+
+    def __init__(self, directory: str = None, ttl_seconds: float = None):
+        self.directory = directory or os.getenv("STORAGE_STATE_DIR", ".cache/storage_state")
+        self.ttl_seconds = ttl_seconds or float(os.getenv("STORAGE_STATE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.enabled = os.getenv("STORAGE_STATE_CACHE", "true").lower() == "true"
+        self.cookie_steps_run = 0
+        self.cookie_steps_skipped = 0
+        self.invalidations = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, domain: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^a-z0-9.-]", "_", domain.lower()) + ".json")
+
+    def load(self, domain: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        path = self.path_for(domain)
+        if not os.path.exists(path):
+            return None
+        if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+            self.invalidate(domain)
+            return None
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Error reading storage state for {domain}: {e}")
+            self.invalidate(domain)
+            return None
+
+    async def save(self, context, domain: str) -> None:
+        """Stores the part of the context's storage state that belongs to `domain`."""
+        if not self.enabled:
+            return
+        try:
+            state = await context.storage_state()
+            state = {
+                "cookies": [cookie for cookie in state.get("cookies", []) if _belongs_to(cookie["domain"], domain)],
+                "origins": [origin for origin in state.get("origins", []) if url_domain(origin["origin"]) == domain],
+            }
+            path = self.path_for(domain)
+            with open(path + ".tmp", "w") as file:
+                json.dump(state, file)
+            os.replace(path + ".tmp", path)
+            logging.info(f"Saved storage state for {domain} ({len(state['cookies'])} cookies).")
+        except Exception as e:
+            logging.error(f"Error saving storage state for {domain}: {e}")
+
+    def invalidate(self, domain: str) -> None:
+        self.invalidations += 1
+        try:
+            os.remove(self.path_for(domain))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        visits = self.cookie_steps_run + self.cookie_steps_skipped
+        return {
+            "cookie_steps_run": self.cookie_steps_run,
+            "cookie_steps_skipped": self.cookie_steps_skipped,
+            "skip_rate": self.cookie_steps_skipped / visits if visits else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logging.info(
+            f"Storage state cache: cookie step skipped {stats['cookie_steps_skipped']} times, "
+            f"run {stats['cookie_steps_run']} times (skip rate {stats['skip_rate']:.0%}, "
+            f"{stats['invalidations']} invalidated)"
+        )
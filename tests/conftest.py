@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+# The OpenAI client and the model router read these at construction; no test calls the API.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("DEFAULT_OPENAI_MODEL_NAME", "GPT_4O_MINI")
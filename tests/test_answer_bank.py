@@ -0,0 +1,84 @@
+import pytest
+
+from scraping.answer_bank import AnswerBank, company_from_url
+
+YES_NO = [{"value": "true", "label": "Yes"}, {"value": "false", "label": "No"}]
+VISA = "Are you authorized to work in the U.S. without a sponsored visa?"
+PYTHON = "Do you have at least 3 years of experience with Python?"
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = AnswerBank(path=str(tmp_path / "answers.sqlite3"))
+    yield bank
+    bank.close()
+
+
+def radio(label, value=None, options=YES_NO):
+    field = {"type": "radio", "label": label, "options": options}
+    if value is not None:
+        field["value"] = value
+    return field
+
+
+@pytest.mark.parametrize(
+    "stored, question, reusable",
+    [
+        (VISA, "Are you authorised to work in the U.S. without a sponsored visa?", True),
+        (VISA, "Are you authorized to work in the UK without a sponsored visa?", False),
+        (VISA, "Are you NOT authorized to work in the U.S. without a sponsored visa?", False),
+        (VISA, "Aren't you authorized to work in the U.S. without a sponsored visa?", False),
+        (PYTHON, "Do you have at least 5 years of experience with Python?", False),
+        (PYTHON, "Do you have at least 3 years' experience with Python?", True),
+    ],
+)
+def test_near_duplicates_share_an_answer_only_when_nothing_discriminating_differs(bank, stored, question, reusable):
+    bank.add(radio(stored, "true"))
+
+    assert (bank.lookup(radio(question)) is not None) == reusable
+
+
+def test_answer_is_mapped_onto_the_new_form_options(bank):
+    bank.add(radio(VISA, "true"))
+
+    answer = bank.lookup(radio(VISA, options=[{"value": "y", "label": "Yes"}, {"value": "n", "label": "No"}]))
+
+    assert answer == "y"
+    assert bank.hits == 1
+
+
+def test_company_name_is_templated_out(bank):
+    bank.add(radio("Have you previously worked for Acme?", "false"), company="Acme")
+
+    assert bank.lookup(radio("Have you previously worked for Globex?"), company="Globex") == "false"
+    assert company_from_url("https://apply.workable.com/acme/j/123/") == "Acme"
+
+
+@pytest.mark.parametrize(
+    "field",
+    [
+        {"type": "text", "label": "Date", "value": "2023-10-01"},
+        {"type": "date", "label": "Available from", "value": "2023-10-01"},
+        {"type": "textarea", "label": "Why do you want to work here?", "value": "Because..."},
+        {"type": "text", "label": "Who referred you?", "value": "Jane"},
+        {"type": "select", "label": "Start date", "options": YES_NO, "value": "true"},
+    ],
+)
+def test_free_text_and_dates_are_never_banked(bank, field):
+    bank.add(field)
+
+    assert len(bank) == 0
+    assert bank.lookup({key: value for key, value in field.items() if key != "value"}) is None
+
+
+def test_answers_survive_a_reload(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    bank = AnswerBank(path=path)
+    bank.add(radio(VISA, "true"))
+    bank.close()
+
+    reloaded = AnswerBank(path=path)
+    try:
+        assert reloaded.lookup(radio(VISA)) == "true"
+    finally:
+        reloaded.close()
@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+from scraping.browser_pool import BrowserPool, BrowserSlot
+
+
+class FakeContext:
+    def __init__(self, reset_gate=None):
+        self.pages = []
+        self.closed = False
+        self.reset_gate = reset_gate
+
+    async def storage_state(self):
+        return {"origins": []}
+
+    async def clear_cookies(self):
+        if self.reset_gate is not None:
+            await self.reset_gate.wait()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, reset_gate=None):
+        self.connected = True
+        self.reset_gate = reset_gate
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        context = FakeContext(self.reset_gate)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    # No memory sampling: the tests decide which browser retires.
+    monkeypatch.setattr(BrowserPool, "_browser_memory_mb", staticmethod(lambda: 0.0))
+
+    def make(reset_gate=None):
+        pool = BrowserPool(size=1, warm_contexts=0)
+
+        async def launch():
+            pool.browsers_launched += 1
+            return BrowserSlot(browser=FakeBrowser(reset_gate))
+
+        pool._launch = launch
+        return pool
+
+    return make
+
+
+async def started(pool):
+    pool.slots = [await pool._launch()]
+    await pool._warm(pool.warm_contexts)
+    return pool
+
+
+def test_released_context_is_reused(make_pool):
+    async def main(pool):
+        await started(pool)
+        first = await pool.lease()
+        await pool.release(first)
+        second = await pool.lease()
+        return first, second
+
+    pool = make_pool()
+    first, second = asyncio.run(main(pool))
+    assert second is first
+    assert pool.stats()["idle"] == 0
+
+
+def test_storage_state_context_is_closed_on_release(make_pool):
+    async def main(pool):
+        await started(pool)
+        lease = await pool.lease(storage_state={"cookies": [], "origins": []})
+        await pool.release(lease)
+        return lease
+
+    pool = make_pool()
+    lease = asyncio.run(main(pool))
+    assert lease.single_use
+    assert lease.context.closed
+    assert pool.stats()["idle"] == 0
+
+
+def test_lease_does_not_wait_for_a_reset(make_pool):
+    async def main(pool, gate):
+        await started(pool)
+        first = await pool.lease()
+        releasing = asyncio.create_task(pool.release(first))
+        await asyncio.sleep(0)
+        # The first context is still being reset; a new lease must not queue behind it.
+        second = await asyncio.wait_for(pool.lease(), timeout=1)
+        gate.set()
+        await releasing
+        return first, second
+
+    async def run():
+        gate = asyncio.Event()
+        return await main(make_pool(reset_gate=gate), gate)
+
+    first, second = asyncio.run(run())
+    assert second is not first
+    assert not first.context.closed
+
+
+def test_lease_does_not_wait_for_a_relaunch(make_pool):
+    async def main():
+        gate = asyncio.Event()
+        pool = await started(make_pool())
+        first = await pool.lease()
+        old_slot = first.slot
+        old_slot.retiring = True
+        # The replacement browser launches only once the gate opens.
+        pool._launch = _gated_launch(pool, gate)
+        releasing = asyncio.create_task(pool.release(first))
+        await asyncio.sleep(0)
+        assert old_slot not in pool.slots
+        pool.slots.append(BrowserSlot(browser=FakeBrowser()))
+        second = await asyncio.wait_for(pool.lease(), timeout=1)
+        gate.set()
+        await releasing
+        return pool, first, second, old_slot
+
+    pool, first, second, old_slot = asyncio.run(main())
+    assert first.context.closed
+    assert not old_slot.browser.is_connected()
+    assert second.slot is not old_slot
+    assert pool.browsers_recycled == 1
+    assert len(pool.slots) == 2
+
+
+def _gated_launch(pool, gate):
+    async def launch():
+        await gate.wait()
+        pool.browsers_launched += 1
+        return BrowserSlot(browser=FakeBrowser())
+
+    return launch
+
+
+def test_context_reset_while_browser_retired_is_dropped(make_pool):
+    async def main(pool, gate):
+        await started(pool)
+        lease = await pool.lease()
+        releasing = asyncio.create_task(pool.release(lease))
+        await asyncio.sleep(0)
+        lease.slot.retiring = True
+        gate.set()
+        await releasing
+        return lease
+
+    async def run():
+        gate = asyncio.Event()
+        pool = make_pool(reset_gate=gate)
+        return pool, await main(pool, gate)
+
+    pool, lease = asyncio.run(run())
+    assert lease.context.closed
+    assert lease.slot not in pool.slots
+    assert pool.stats()["idle"] == 0
@@ -0,0 +1,101 @@
+import glob
+import os
+
+import pytest
+
+from scraping.chunking import field_key, merge_fields, split_form_html
+from scraping.extractor import FormFieldExtractor
+from scraping.html_pruner import prune_form_html
+
+FORMS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "samples", "forms", "*.html")))
+YES_NO = [{"value": "true", "label": "Yes"}, {"value": "false", "label": "No"}]
+
+
+def extract_chunked(html_form, max_tokens):
+    extractor = FormFieldExtractor()
+    return merge_fields([extractor.extract(chunk).fields for chunk in split_form_html(html_form, max_tokens)])
+
+
+@pytest.mark.parametrize("path", FORMS, ids=os.path.basename)
+def test_chunked_extraction_matches_whole_form(path):
+    with open(path, "r") as file:
+        html_form = prune_form_html(file.read())
+    # A small chunk size forces many boundaries.
+    assert len(split_form_html(html_form, 150)) > 1
+    assert extract_chunked(html_form, 150) == FormFieldExtractor().extract(html_form).fields
+
+
+def test_merge_unites_a_radio_group_split_across_chunks():
+    first = [
+        {"type": "text", "name": "name", "label": "Name"},
+        {"type": "radio", "name": "relocate", "label": "Willing to relocate?", "options": YES_NO[:1]},
+    ]
+    second = [
+        {"type": "radio", "name": "relocate", "label": "", "required": True, "options": YES_NO},
+        {"type": "email", "name": "email", "label": "Email"},
+    ]
+
+    merged = merge_fields([first, second])
+
+    assert [field_key(field) for field in merged] == [("name", "name"), ("group", "relocate"), ("name", "email")]
+    relocate = merged[1]
+    assert relocate["label"] == "Willing to relocate?"
+    assert relocate["options"] == YES_NO
+    assert relocate["required"] is True
+
+
+def test_merge_keeps_distinct_fields_and_does_not_mutate_input():
+    first = [{"type": "text", "id": "first_name", "label": "First name"}]
+    second = [{"type": "text", "id": "last_name", "label": "Last name"}, {"type": "text", "label": "No identifier"}]
+
+    merged = merge_fields([first, second, [{"type": "text", "label": "No identifier"}]])
+
+    assert [field["label"] for field in merged] == ["First name", "Last name", "No identifier", "No identifier"]
+    assert first == [{"type": "text", "id": "first_name", "label": "First name"}]
+
+
+def test_radio_group_cut_by_a_chunk_boundary_is_extracted_once():
+    options = "".join(
+        f'<div><input type="radio" id="years_{index}" name="years" value="{index}">'
+        f'<label for="years_{index}">{index} to {index + 1} years of professional experience</label></div>'
+        for index in range(8)
+    )
+    html_form = (
+        '<form><label for="email">Email</label><input id="email" name="email" type="email">'
+        f"<div><p>Years of experience?</p>{options}</div></form>"
+    )
+    assert len(split_form_html(html_form, 60)) > 1
+
+    fields = extract_chunked(html_form, 60)
+
+    years = [field for field in fields if field.get("name") == "years"]
+    assert len(years) == 1
+    assert [option["value"] for option in years[0]["options"]] == [str(index) for index in range(8)]
+
+
+def test_sections_are_never_cut():
+    radios = "".join(
+        f'<input type="radio" name="q{question}" value="{value}" id="q{question}_{value}">'
+        f'<label for="q{question}_{value}">A fairly long option label number {value}</label>'
+        for question in range(3)
+        for value in range(6)
+    )
+    html_form = f"<form><fieldset><legend>Questions</legend>{radios}</fieldset><input name='after' type='text'></form>"
+
+    chunks = split_form_html(html_form, 40)
+
+    assert sum("<fieldset>" in chunk for chunk in chunks) == 1
+    assert all(chunk.startswith("<form>") and chunk.endswith("</form>") for chunk in chunks)
+
+
+def test_label_only_blocks_travel_with_the_next_control():
+    html_form = (
+        "<form>" + "".join(
+            f"<div><label for='f{index}'>Question {index}</label></div><div><input id='f{index}' name='f{index}'></div>"
+            for index in range(6)
+        ) + "</form>"
+    )
+
+    for chunk in split_form_html(html_form, 20):
+        for index in range(6):
+            assert (f"Question {index}<" in chunk) == (f'id="f{index}"' in chunk)
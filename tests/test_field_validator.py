@@ -0,0 +1,152 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from scraping.field_validator import FieldValidator, normalize_date, repair_json, validate_field
+
+YES_NO = [{"value": "true", "label": "Yes"}, {"value": "false", "label": "No"}]
+EMAIL = {"type": "email", "name": "email", "label": "Email"}
+RELOCATE = {"type": "radio", "name": "relocate", "label": "Willing to relocate?", "options": YES_NO}
+
+
+class FakeOpenAIService:
+    """Answers REPAIR_FIELD_VALUES calls with a fixed response and records what was asked."""
+
+    def __init__(self, response_text, total_tokens=50):
+        self.response_text = response_text
+        self.total_tokens = total_tokens
+        self.calls = []
+
+    async def generate(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=self.total_tokens))
+
+    def get_response_text_from_response(self, response):
+        return self.response_text
+
+
+def fields_json(*fields):
+    return json.dumps({"fields": list(fields)})
+
+
+@pytest.mark.parametrize(
+    "text, repaired",
+    [
+        ('{"fields": [{"name": "a"}]}', False),
+        ('```json\n{"fields": [{"name": "a"}]}\n```', True),
+        ('{"fields": [{"name": "a"},]}', True),
+        ('{"fields": [{"name": "a"}, {"name": "b", "lab', True),
+    ],
+)
+def test_repair_json(text, repaired):
+    data, was_repaired = repair_json(text)
+
+    assert data["fields"][0] == {"name": "a"}
+    assert was_repaired is repaired
+
+
+def test_repair_json_gives_up_on_prose():
+    assert repair_json("Sorry, I can't help with that.") == (None, False)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("2023-10-01", "2023-10-01"), ("10/01/2023", "2023-10-01"), ("October 1, 2023", "2023-10-01"), ("soon", None)],
+)
+def test_normalize_date(value, expected):
+    assert normalize_date(value) == expected
+
+
+def test_validate_field_repairs_option_labels_aliases_and_structure():
+    check = validate_field({"type": "Radio", "name": "relocate", "label": "changed", "value": "Yes"}, RELOCATE)
+
+    assert check.valid and check.repaired
+    assert check.field["value"] == "true"
+    assert check.field["label"] == "Willing to relocate?"
+
+    check = validate_field({"type": "dropdown", "name": "country", "label": "Country", "value": "US"})
+    assert check.valid and check.field["type"] == "select"
+
+
+@pytest.mark.parametrize(
+    "field, problem",
+    [
+        ({"type": "radio", "name": "relocate", "value": "Maybe"}, "not one of the options"),
+        ({"type": "email", "name": "email", "value": "nobody"}, "not an email address"),
+        ({"type": "text", "label": "Date", "name": "date", "value": "soon"}, "YYYY-MM-DD"),
+        ({"type": "slider", "name": "level", "value": "3"}, "unsupported type"),
+        ({"type": "text", "label": "Name", "value": "Ada"}, "no data-ui, id or name"),
+    ],
+)
+def test_validate_field_reports_what_it_cannot_repair(field, problem):
+    expected = RELOCATE if field.get("name") == "relocate" else None
+
+    check = validate_field(field, expected)
+
+    assert not check.valid
+    assert any(problem in message for message in check.problems)
+
+
+def test_parse_fields_counts_savings_only_for_repairs():
+    validator = FieldValidator(reask=False)
+
+    assert validator.parse_fields(fields_json(EMAIL, {"label": "no identifier"}), prompt="<form>") == [EMAIL]
+    assert validator.fields_dropped == 1
+    assert validator.tokens_saved == 0
+
+    assert validator.parse_fields("```json\n" + fields_json(EMAIL) + "\n```", prompt="<form>") == [EMAIL]
+    assert validator.json_repaired == 1
+    assert validator.tokens_saved > 0
+
+
+def test_parse_fields_rejects_unusable_responses():
+    validator = FieldValidator()
+
+    assert validator.parse_fields("no JSON here") is None
+    assert validator.unparseable == 1
+
+
+def test_parse_values_reasks_invalid_and_missing_fields():
+    expected = [EMAIL, RELOCATE]
+    service = FakeOpenAIService(fields_json(dict(RELOCATE, value="false")), total_tokens=40)
+    validator = FieldValidator(reask=True)
+
+    fields = asyncio.run(validator.parse_values(service, fields_json(dict(EMAIL, value="ada@example.com")), expected))
+
+    assert [field["value"] for field in fields] == ["ada@example.com", "false"]
+    assert len(service.calls) == 1 and service.calls[0]["escalate"] is True
+    asked = json.loads(service.calls[0]["prompt_variables"]["invalid_fields"])["fields"]
+    assert [field["name"] for field in asked] == ["relocate"]
+    assert validator.fields_recovered == 1
+    assert validator.reask_tokens == 40
+
+
+def test_parse_values_drops_what_the_reask_cannot_fix():
+    service = FakeOpenAIService(fields_json(dict(RELOCATE, value="Maybe")), total_tokens=40)
+    validator = FieldValidator(reask=True)
+
+    fields = asyncio.run(validator.parse_values(service, fields_json(dict(RELOCATE, value="Maybe")), [RELOCATE]))
+
+    assert fields == []
+    assert validator.fields_dropped == 1
+    # Nothing was recovered, so only the re-ask's cost is counted.
+    assert validator.tokens_saved == -40
+
+
+def test_validate_stream_yields_valid_fields_and_reasks_the_rest():
+    async def stream():
+        yield dict(EMAIL, value="ada@example.com")
+        yield dict(RELOCATE, value="Maybe")
+
+    async def collect(validator, service):
+        return [field async for field in validator.validate_stream(service, stream(), [EMAIL, RELOCATE])]
+
+    service = FakeOpenAIService(fields_json(dict(RELOCATE, value="Yes")))
+    validator = FieldValidator(reask=True)
+
+    fields = asyncio.run(collect(validator, service))
+
+    assert [field["value"] for field in fields] == ["ada@example.com", "true"]
+    assert validator.fields_recovered == 1
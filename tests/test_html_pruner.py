@@ -0,0 +1,41 @@
+import glob
+import os
+
+import pytest
+
+from openaiapp.tokens import estimate_tokens
+from scraping.extractor import FormFieldExtractor
+from scraping.html_pruner import prune_form_html
+
+FORMS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "samples", "forms", "*.html")))
+
+
+@pytest.mark.parametrize("path", FORMS, ids=os.path.basename)
+def test_pruning_keeps_extracted_fields(path):
+    with open(path, "r") as file:
+        original = file.read()
+    pruned = prune_form_html(original)
+
+    extractor = FormFieldExtractor()
+    assert extractor.extract(pruned).fields == extractor.extract(original).fields
+    assert estimate_tokens(pruned) < estimate_tokens(original)
+
+
+def test_pruning_drops_scaffolding_but_keeps_controls():
+    html_form = """
+    <form data-ui="application-form" class="x-form">
+        <script>track()</script><style>.a {}</style>
+        <div><div class="wrapper" style="color: red"><svg><path d="M0"/></svg>
+            <label for="email">Email</label>
+            <input id="email" name="email" type="email" class="input" data-testid="email">
+        </div></div>
+        <div style="display: none"><span>Tooltip</span></div>
+        <div style="display: none"><input name="hidden_step" type="text"></div>
+    </form>
+    """
+    pruned = prune_form_html(html_form)
+
+    for dropped in ("<script", "<style", "<svg", "Tooltip", "class=", "data-testid"):
+        assert dropped not in pruned
+    assert 'id="email"' in pruned and 'name="email"' in pruned and ">Email<" in pruned
+    assert 'name="hidden_step"' in pruned
@@ -0,0 +1,117 @@
+import pytest
+
+from scraping.job_queue import (
+    FAILED,
+    FILLED,
+    NAVIGATING,
+    QUEUED,
+    REVIEW,
+    SUBMITTED,
+    SUBMITTING,
+    JobQueue,
+    normalize_url,
+)
+
+URL = "https://apply.workable.com/acme/j/ABC123/"
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # No backoff, so a failed job is due again immediately.
+    queue = JobQueue(path=str(tmp_path / "jobs.sqlite3"), max_attempts=2, backoff_base=1e-9, backoff_max=1e-9)
+    yield queue
+    queue.close()
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Apply.Workable.com/acme/j/ABC123/apply/?utm=x#top") == "https://apply.workable.com/acme/j/ABC123"
+
+
+def test_enqueue_skips_duplicates_and_applied_urls(queue):
+    assert queue.enqueue([URL, URL + "apply", URL + "?ref=1"]) == 1
+
+    job = queue.claim("worker")
+    queue.complete(job)
+
+    assert queue.is_applied(URL + "apply/")
+    assert queue.enqueue([URL]) == 0
+    assert queue.duplicates == 1
+
+
+def test_claim_is_exclusive_until_the_job_is_finished(queue):
+    queue.enqueue([URL])
+
+    job = queue.claim("first")
+
+    assert job.state == NAVIGATING and job.attempts == 1
+    assert queue.claim("second") is None
+    queue.complete(job)
+    assert queue.counts()[SUBMITTED] == 1
+    assert queue.claim("second") is None
+
+
+def test_failed_jobs_are_retried_then_marked_failed(queue):
+    queue.enqueue([URL])
+
+    queue.fail(queue.claim("worker"), "form not found")
+    retry = queue.claim("worker")
+
+    assert retry.attempts == 2 and retry.last_error == "form not found"
+    queue.fail(retry, "form not found")
+    assert queue.claim("worker") is None
+    assert [job.url for job in queue.failed_jobs()] == [URL]
+
+    assert queue.retry_failed() == 1
+    assert queue.counts()[QUEUED] == 1
+
+
+def test_a_failure_after_the_submit_click_goes_to_review(queue):
+    queue.enqueue([URL])
+    job = queue.claim("worker")
+    queue.advance(URL, FILLED)
+    queue.advance(URL, SUBMITTING)
+
+    queue.fail(job, "confirmation never showed")
+
+    assert queue.claim("worker") is None
+    assert [job.url for job in queue.failed_jobs(REVIEW)] == [URL]
+    assert queue.failed_jobs(FAILED) == []
+    assert queue.is_applied(URL)
+    assert queue.reviews == 1
+
+
+def test_a_worker_dying_while_submitting_sends_the_job_to_review(tmp_path):
+    queue = JobQueue(path=str(tmp_path / "jobs.sqlite3"), lease_seconds=1e-9)
+    try:
+        queue.enqueue([URL])
+        queue.claim("dead worker")
+        queue.advance(URL, SUBMITTING)
+
+        assert queue.claim("next worker") is None
+        assert queue.counts()[REVIEW] == 1
+    finally:
+        queue.close()
+
+
+def test_finished_jobs_do_not_change_state(queue):
+    queue.enqueue([URL])
+    queue.complete(queue.claim("worker"))
+
+    queue.advance(URL, FILLED)
+
+    assert queue.counts()[SUBMITTED] == 1
+
+
+def test_artifacts_and_checkpoints_are_dropped_on_completion(queue):
+    queue.enqueue([URL])
+    job = queue.claim("worker")
+    queue.save_artifact(URL, "fields:abc", [{"name": "email"}])
+    queue.save(URL, 0, ["email"], [{"name": "email", "value": "ada@example.com"}])
+
+    assert queue.load_artifact(URL, "fields:abc") == [{"name": "email"}]
+    assert queue.load(URL) == {0: {"signature": ["email"], "fields": [{"name": "email", "value": "ada@example.com"}]}}
+
+    queue.complete(job)
+
+    assert queue.load_artifact(URL, "fields:abc") is None
+    assert queue.load(URL) == {}
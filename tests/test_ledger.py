@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from openaiapp.ledger import JsonlUsageSink, SqliteUsageSink, UsageLedger, summarize
+
+
+def record_calls(ledger):
+    ledger.record(prompt_type="EXTRACT_INPUT_FIELDS", model="gpt-4o-mini", prompt_tokens=100, completion_tokens=20,
+                  total_cost=0.001, latency=1.5, application_id="job-1", route="small form")
+    ledger.record(prompt_type="FILL_VALUE_IN_FIELD", model="gpt-4o", prompt_tokens=300, completion_tokens=50, retries=2,
+                  total_cost=0.01, latency=2.5, application_id="job-1", route="escalated")
+    ledger.record(prompt_type="FILL_VALUE_IN_FIELD", model="gpt-4o-mini", application_id="job-2", status="failed", error="429")
+
+
+@pytest.mark.parametrize("sink_class, name", [(JsonlUsageSink, "usage.jsonl"), (SqliteUsageSink, "usage.sqlite3")])
+def test_sinks_round_trip_and_summarize(tmp_path, sink_class, name):
+    ledger = UsageLedger(sink=sink_class(str(tmp_path / name)))
+    record_calls(ledger)
+
+    summary = summarize(ledger.sink.read(), by="application")
+
+    assert summary["job-1"]["calls"] == 2
+    assert summary["job-1"]["retries"] == 2
+    assert summary["job-1"]["prompt_tokens"] == 400
+    assert summary["job-1"]["total_cost"] == pytest.approx(0.011)
+    assert summary["job-2"]["failed"] == 1
+    assert set(summarize(ledger.sink.read(), by="route")) == {"gpt-4o-mini (small form)", "gpt-4o (escalated)", "gpt-4o-mini (-)"}
+    assert "total" in ledger.report(by="model")
+
+
+def test_sqlite_migration_adds_typed_columns(tmp_path):
+    path = str(tmp_path / "usage.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE llm_usage (timestamp REAL NOT NULL, prompt_type TEXT NOT NULL, model TEXT NOT NULL, "
+                       "prompt_tokens INTEGER, completion_tokens INTEGER, total_tokens INTEGER, input_cost REAL, "
+                       "output_cost REAL, total_cost REAL, latency REAL)")
+    connection.execute("INSERT INTO llm_usage VALUES (1, 'EXTRACT_INPUT_FIELDS', 'gpt-4o-mini', 10, 5, 15, 0, 0, 0.5, 1.0)")
+    connection.commit()
+    connection.close()
+
+    sink = SqliteUsageSink(path)
+    UsageLedger(sink=sink).record(prompt_type="FILL_VALUE_IN_FIELD", model="gpt-4o-mini", retries=3, total_cost=0.25)
+
+    types = {row[1]: row[2] for row in sink._connection.execute("PRAGMA table_info(llm_usage)")}
+    assert types["retries"] == "INTEGER" and types["route"] == "TEXT"
+    stored = sink._connection.execute("SELECT typeof(retries) FROM llm_usage ORDER BY timestamp").fetchall()
+    assert stored == [("integer",), ("integer",)]
+    summary = summarize(sink.read(), by="model")["gpt-4o-mini"]
+    assert summary["retries"] == 3
+    assert summary["total_cost"] == pytest.approx(0.75)
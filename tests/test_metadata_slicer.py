@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.common import find_field, load_samples
+from scraping.extractor import FormFieldExtractor
+from scraping.metadata_slicer import MetadataSlicer, _leaves
+from scraping.profile_rules import ProfileRules
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+SAMPLES = load_samples(os.path.join(ROOT, "samples", "forms", "*.html"))
+
+
+@pytest.fixture(scope="module")
+def user_meta_data():
+    with open(os.path.join(ROOT, "user_metadata.json"), "r") as file:
+        return json.load(file)
+
+
+@pytest.mark.parametrize("sample", SAMPLES, ids=lambda sample: sample["name"])
+def test_slice_keeps_every_expected_profile_value(sample, user_meta_data):
+    fields = FormFieldExtractor().extract(sample["html_form"]).fields
+    _, remaining = ProfileRules(user_meta_data).apply(fields)
+    sliced = MetadataSlicer(user_meta_data).slice(remaining)
+
+    full_leaves, sliced_leaves = _leaves(user_meta_data), _leaves(sliced)
+    for identifier, value in sample["expected"].items():
+        if find_field(remaining, identifier) is None:
+            continue
+        value = " ".join(str(value).lower().split())
+        if any(value in leaf for leaf in full_leaves):
+            assert any(value in leaf for leaf in sliced_leaves), f"'{identifier}' needs '{value}'"
+
+
+def test_slice_picks_sections_by_keyword():
+    profile = {
+        "contact_information": {"country": "US"},
+        "user_salary": {"expected": "100k"},
+        "education": [{"degree": "BSc"}],
+        "hobbies": ["chess"],
+        "empty": {},
+    }
+    slicer = MetadataSlicer(profile)
+
+    sections = slicer.sections_for([{"type": "radio", "label": "Do you require visa sponsorship?"}])
+
+    # Sections SECTION_KEYWORDS does not know are always sent; empty ones never are.
+    assert sections == ["contact_information", "hobbies"]
+    assert slicer.sections_for([{"type": "text", "label": "Expected salary"}]) == ["user_salary", "hobbies"]
+
+
+def test_free_text_fields_get_the_career_sections():
+    profile = {"name": {"first": "Ada"}, "experience": [{"company": "X"}], "user_salary": {"expected": "100k"}}
+
+    sections = MetadataSlicer(profile).sections_for([{"type": "textarea", "label": "Why do you want to join us?"}])
+
+    assert sections == ["name", "experience"]
+
+
+def test_dumps_counts_tokens_saved():
+    profile = {"contact_information": {"email": "ada@example.com"}, "experience": [{"company": "X" * 200}]}
+    slicer = MetadataSlicer(profile)
+
+    sliced = json.loads(slicer.dumps([{"type": "email", "label": "Email"}]))
+
+    assert list(sliced) == ["contact_information"]
+    assert slicer.tokens_sent < slicer.tokens_full == slicer.full_tokens
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import openai
+import pytest
+
+from openaiapp.exceptions import LLMException, StatusCodes
+from openaiapp.fake_server import FakeOpenAIServer
+from openaiapp.scheduler import RateLimitScheduler
+
+MODEL = {"model_name": "gpt-4o-mini", "rpm": 10_000, "tpm": 10_000_000}
+RETRY_AFTER = 0.3
+
+
+@pytest.fixture
+def fake_server(request):
+    server = FakeOpenAIServer(retry_after=RETRY_AFTER, **getattr(request, "param", {})).start()
+    yield server
+    server.stop()
+
+
+def run_calls(server, count, scheduler):
+    """Sends `count` concurrent completions through the scheduler; returns (results, seconds taken)."""
+
+    async def main():
+        client = openai.AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+
+        async def call():
+            return await client.chat.completions.create(model=MODEL["model_name"], messages=[{"role": "user", "content": "hi"}])
+
+        try:
+            return await asyncio.gather(*(scheduler.submit(MODEL, 10, call) for _ in range(count)))
+        finally:
+            await client.close()
+
+    started_at = time.monotonic()
+    results = asyncio.run(main())
+    return results, time.monotonic() - started_at
+
+
+@pytest.mark.parametrize("fake_server", [{"rate_limit_first": 2}], indirect=True)
+def test_429s_are_retried_after_retry_after(fake_server):
+    scheduler = RateLimitScheduler(max_retries=5, backoff_base=0.01, backoff_max=0.01)
+
+    [(response, retries)], elapsed = run_calls(fake_server, 1, scheduler)
+
+    assert response.choices[0].message.content == '{"fields": []}'
+    assert retries == 2
+    assert fake_server.rate_limited == 2 and len(fake_server.requests) == 3
+    # Each 429 waits at least its Retry-After before the next attempt.
+    assert elapsed >= 2 * RETRY_AFTER
+
+
+@pytest.mark.parametrize("fake_server", [{"rate_limit_every": 3}], indirect=True)
+def test_every_concurrent_call_eventually_succeeds(fake_server):
+    scheduler = RateLimitScheduler(max_retries=5, backoff_base=0.01, backoff_max=0.01)
+
+    results, elapsed = run_calls(fake_server, 8, scheduler)
+
+    assert len(results) == 8
+    assert all(response.choices[0].message.content == '{"fields": []}' for response, _ in results)
+    assert sum(retries for _, retries in results) == fake_server.rate_limited > 0
+    assert len(fake_server.requests) == 8 + fake_server.rate_limited
+    # A 429 pauses the whole model queue for its Retry-After.
+    assert elapsed >= RETRY_AFTER
+
+
+@pytest.mark.parametrize("fake_server", [{"rate_limit_first": 10}], indirect=True)
+def test_gives_up_with_429_after_max_retries(fake_server):
+    scheduler = RateLimitScheduler(max_retries=1, backoff_base=0.01, backoff_max=0.01)
+
+    with pytest.raises(LLMException) as error:
+        run_calls(fake_server, 1, scheduler)
+
+    assert error.value.status_code == StatusCodes.TOO_MANY_REQUESTS
+    assert len(fake_server.requests) == 2
+
+
+@pytest.mark.parametrize("fake_server", [{"rate_limit_first": 10}], indirect=True)
+def test_service_keeps_the_429_status_and_records_the_failure(fake_server, monkeypatch):
+    from openaiapp.clients import close_async_clients
+    from openaiapp.constants import LlmPromptTypes
+    from openaiapp.ledger import UsageLedger
+    from openaiapp.service import AsyncOpenAIService
+
+    class MemorySink:
+        def __init__(self):
+            self.records = []
+
+        def write(self, record):
+            self.records.append(record)
+
+    monkeypatch.setenv("OPENAI_BASE_URL", fake_server.base_url)
+    sink = MemorySink()
+    service = AsyncOpenAIService(
+        ledger=UsageLedger(sink=sink), scheduler=RateLimitScheduler(max_retries=1, backoff_base=0.01, backoff_max=0.01)
+    )
+
+    async def main():
+        try:
+            await service.generate(LlmPromptTypes.EXTRACT_INPUT_FIELDS, {"html_form": "<form></form>"})
+        finally:
+            await close_async_clients()
+
+    with pytest.raises(LLMException) as error:
+        asyncio.run(main())
+
+    assert error.value.status_code == StatusCodes.TOO_MANY_REQUESTS
+    assert [record.status for record in sink.records] == ["failed"]
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_job: contextvars.ContextVar = contextvars.ContextVar("trace_job", default=None)
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """One timed section; written as a Chrome trace "complete" (X) event when it ends."""
+
+    __slots__ = ("tracer", "name", "attributes", "started_at", "tid", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.started_at = 0.0
+        self.tid = 0
+        self._token = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.tid = self.tracer._track()
+        self._token = _current.set(self)
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        ended_at = time.perf_counter()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # An async generator closed from another task (see traced_stream).
+            pass
+        if exc is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._add(self, ended_at)
+        return False
+
+
+class _NoopSpan:
+    """Returned while tracing is off: entering, leaving and `set` do nothing."""
+
+    __slots__ = ()
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Collects spans from every concurrent job and exports them as Chrome trace JSON, which
+    chrome://tracing and ui.perfetto.dev open directly.
+
+    Each job (see `set_job`) gets its own track, and a task a job spawns (concurrent chunk
+    extraction, next-step prefetch) gets a track of its own under the job's name, so overlapping
+    work and time spent queued behind other jobs show up side by side. Tracing is off unless
+    TRACE_PATH is set; disabled spans cost one attribute check.
+    """
+
+    def __init__(self, path: str = None, enabled: bool = None):
+        self.path = path or os.getenv("TRACE_PATH")
+        self.enabled = bool(self.path) if enabled is None else enabled
+        self.origin = time.perf_counter()
+        self._events: List[Dict[str, Any]] = []
+        self._tracks: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def _track(self) -> int:
+        """Track id of the current (job, task), named after the job on first use."""
+        job = _job.get()
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = (job, id(task) if task is not None else threading.get_ident())
+        with self._lock:
+            tid = self._tracks.get(key)
+            if tid is None:
+                tid = self._tracks[key] = len(self._tracks) + 1
+                tasks_of_job = sum(1 for other in self._tracks if other[0] == job)
+                label = job or "main"
+                if tasks_of_job > 1:
+                    label += f" (task {tasks_of_job})"
+                self._events.append(
+                    {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": label}}
+                )
+            return tid
+
+    def _add(self, span: Span, ended_at: float) -> None:
+        args = {key: value if isinstance(value, (int, float, bool, str)) or value is None else str(value)
+                for key, value in span.attributes.items()}
+        job = _job.get()
+        if job is not None:
+            args["job"] = job
+        event = {
+            "name": span.name,
+            "cat": span.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": (span.started_at - self.origin) * 1e6,
+            "dur": (ended_at - span.started_at) * 1e6,
+            "pid": os.getpid(),
+            "tid": span.tid,
+            "args": args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._events)
+
+    def export(self, path: str = None) -> Optional[str]:
+        """Writes the collected spans to `path` (TRACE_PATH by default); returns the path written."""
+        path = path or self.path
+        if not self.enabled or not path:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, file)
+        logging.info(f"Trace with {len(self._events)} events written to {path} (open it in ui.perfetto.dev).")
+        return path
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attributes):
+    """`with span("stage", key=value):` on the global tracer."""
+    return tracer.span(name, **attributes)
+
+
+def annotate(**attributes) -> None:
+    """Adds attributes (tokens, retries...) to the innermost open span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def set_job(job_id: Optional[str]) -> None:
+    """Tags spans of the current task, and of tasks it starts later, with `job_id`."""
+    _job.set(job_id)
+
+
+def traced(name: str, attributes: Callable[..., Dict[str, Any]] = None):
+    """
+    Decorator for async methods: runs the call inside `span(name)`. `attributes` receives
+    the call's arguments and returns the span's attributes.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await method(*args, **kwargs)
+            with Span(tracer, name, attributes(*args, **kwargs) if attributes else {}):
+                return await method(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_sync(name: str, attributes: Callable[..., Dict[str, Any]] = None):
+    """`traced` for plain functions and methods."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return method(*args, **kwargs)
+            with Span(tracer, name, attributes(*args, **kwargs) if attributes else {}):
+                return method(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_stream(name: str, attributes: Callable[..., Dict[str, Any]] = None):
+    """`traced` for async generators: the span lasts until the last item is yielded."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                async for item in method(*args, **kwargs):
+                    yield item
+                return
+            with Span(tracer, name, attributes(*args, **kwargs) if attributes else {}) as current:
+                items = 0
+                async for item in method(*args, **kwargs):
+                    items += 1
+                    yield item
+                current.set(items=items)
+
+        return wrapper
+
+    return decorator
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(path: str) -> str:
+    """Per span name: count, p50, p95 and total milliseconds, slowest total first."""
+    with open(path, "r") as file:
+        events = json.load(file)["traceEvents"]
+    durations = defaultdict(list)
+    for event in events:
+        if event.get("ph") == "X":
+            durations[event["name"]].append(event["dur"] / 1000)
+    header = f"{'span':<36} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>10}"
+    lines = [header, "-" * len(header)]
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        lines.append(
+            f"{name:<36} {len(values):>6} {_percentile(values, 0.5):>9.1f} {_percentile(values, 0.95):>9.1f} {sum(values):>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a trace written with TRACE_PATH.")
+    parser.add_argument("path", help="Chrome trace JSON file.")
+    args = parser.parse_args()
+    print(summarize(args.path))